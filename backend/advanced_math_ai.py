@@ -7,12 +7,24 @@ import json
 import os
 import logging
 import re
+import time
 from typing import Tuple, List, Dict, Any
 import sympy as sp
 from sympy.parsing.sympy_parser import parse_expr
 
+from utils.distillation import STUDENT_DIRNAME
+from utils.metrics import FAST_BUCKETS, registry
+from utils.model_bundle import BUNDLE_FILENAME, ModelBundle
+from utils.output_heads import CUSTOM_OBJECTS, make_top_k_scorer
+
 logger = logging.getLogger(__name__)
 
+MODEL_STAGE_SECONDS = registry.histogram('model_inference_stage_seconds', 'Time spent in each stage of a prediction',
+                                         ['stage'], FAST_BUCKETS)
+_TOKENIZE_SECONDS = MODEL_STAGE_SECONDS.labels('tokenize')
+_SCORE_SECONDS = MODEL_STAGE_SECONDS.labels('score')
+_EXPLAIN_SECONDS = MODEL_STAGE_SECONDS.labels('explain')
+
 class AdvancedMathAI:
     """Advanced mathematical AI model with actual TensorFlow implementation"""
     
@@ -21,10 +33,24 @@ class AdvancedMathAI:
         self.tokenizer = None
         self.label_encoder = None
         self.config = None
+        self.bundle = None
         self.is_loaded = False
+        self._scorers = {}
     
     def load_model(self, model_dir: str = 'models') -> bool:
         """Load trained model and artifacts"""
+        if os.getenv('SERVING_MODEL', 'teacher').lower() == 'student':
+            student_path = os.path.join(model_dir, STUDENT_DIRNAME, BUNDLE_FILENAME)
+            if os.path.exists(student_path) and self.load_bundle(student_path):
+                return True
+            logger.warning(f"SERVING_MODEL=student but {student_path} could not be loaded; using the full model")
+        
+        bundle_path = os.path.join(model_dir, BUNDLE_FILENAME)
+        if os.path.exists(bundle_path):
+            if self.load_bundle(bundle_path):
+                return True
+            logger.warning("Falling back to the legacy model files")
+        
         try:
             model_path = os.path.join(model_dir, 'math_model.h5')
             tokenizer_path = os.path.join(model_dir, 'tokenizer.pkl')
@@ -36,7 +62,8 @@ class AdvancedMathAI:
                 return False
             
             # Load model
-            self.model = load_model(model_path)
+            self.model = load_model(model_path, custom_objects=CUSTOM_OBJECTS)
+            self._scorers = {}
             
             # Load tokenizer
             with open(tokenizer_path, 'rb') as f:
@@ -59,6 +86,37 @@ class AdvancedMathAI:
             self.is_loaded = False
             return False
     
+    def load_bundle(self, bundle_path: str) -> bool:
+        """Load model and artifacts from a memory-mapped bundle
+
+        Nothing is replaced unless the whole bundle loads, so a bad bundle
+        leaves any model already loaded in service.
+        """
+        try:
+            verify = os.getenv('MODEL_BUNDLE_VERIFY', 'true').lower() == 'true'
+            bundle = ModelBundle(bundle_path, verify=verify)
+            
+            # Keras/TensorFlow errors (e.g. weight shape mismatches) surface here too
+            model = bundle.build_model(custom_objects=CUSTOM_OBJECTS)
+            tokenizer = bundle.tokenizer()
+            label_encoder = bundle.label_encoder()
+            config = bundle.model_config
+            
+        except Exception as e:
+            logger.error(f"Error loading model bundle {bundle_path}: {str(e)}")
+            return False
+        
+        self.model = model
+        self._scorers = {}
+        self.tokenizer = tokenizer
+        self.label_encoder = label_encoder
+        self.config = config
+        self.bundle = bundle
+        
+        self.is_loaded = True
+        logger.info(f"Model bundle loaded from {bundle_path}")
+        return True
+    
     def preprocess_input(self, problem_text: str) -> np.ndarray:
         """Preprocess input text for prediction"""
         # Clean and normalize text
@@ -78,26 +136,35 @@ class AdvancedMathAI:
             return "Model not trained yet. Please train the model first.", 0.0
         
         try:
-            # Preprocess input
-            X = self.preprocess_input(problem_text)
-            
-            # Predict
-            predictions = self.model.predict(X, verbose=0)
-            predicted_idx = np.argmax(predictions[0])
-            confidence = np.max(predictions[0])
-            
-            # Decode prediction
-            solution = self.label_encoder.inverse_transform([predicted_idx])[0]
-            
-            return solution, float(confidence)
+            return self.predict_top_k(problem_text, k=1)[0]
             
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
             return f"Prediction error: {str(e)}", 0.0
     
+    def predict_top_k(self, problem_text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k candidate solutions with their probabilities, best first"""
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded")
+        
+        scorer = self._scorers.get(k)
+        if scorer is None:
+            from_logits = self.config.get('output_activation') == 'logits'
+            scorer = self._scorers[k] = make_top_k_scorer(self.model, k, from_logits)
+        
+        started = time.perf_counter()
+        X = self.preprocess_input(problem_text)
+        tokenized = time.perf_counter()
+        indices, probabilities = scorer(tf.constant(X))
+        solutions = self.label_encoder.inverse_transform(indices.numpy()[0])
+        _TOKENIZE_SECONDS.observe(tokenized - started)
+        _SCORE_SECONDS.observe(time.perf_counter() - tokenized)
+        return [(solution, float(p)) for solution, p in zip(solutions, probabilities.numpy()[0])]
+    
     def predict_with_explanation(self, problem_text: str) -> Dict[str, Any]:
         """Predict solution with detailed explanation"""
         solution, confidence = self.predict(problem_text)
+        started = time.perf_counter()
         
         # Generate step-by-step explanation
         explanation = self.generate_explanation(problem_text, solution)
@@ -108,7 +175,7 @@ class AdvancedMathAI:
         # Generate detailed steps
         steps = self.generate_detailed_steps(problem_text, solution)
         
-        return {
+        result = {
             "solution": solution,
             "confidence": confidence,
             "explanation": explanation,
@@ -117,6 +184,8 @@ class AdvancedMathAI:
             "variables": self.extract_variables(problem_text),
             "processed_problem": self.preprocess_problem_text(problem_text)
         }
+        _EXPLAIN_SECONDS.observe(time.perf_counter() - started)
+        return result
     
     def preprocess_problem_text(self, problem_text: str) -> str:
         """Preprocess problem text for display"""
@@ -241,22 +310,38 @@ class AdvancedMathAI:
             "max_sequence_length": self.config.get('max_sequence_length', 0),
             "embedding_dim": self.config.get('embedding_dim', 0),
             "architecture": self.config.get('model_architecture', 'unknown'),
+            "output_head": self.config.get('output_head', 'softmax'),
             "classes": len(self.label_encoder.classes_) if self.label_encoder else 0,
             "training_date": self.config.get('training_date', 'unknown')
         }
     
-    def batch_predict(self, problems: List[str]) -> List[Dict[str, Any]]:
-        """Predict solutions for multiple problems"""
+    def batch_predict(self, problems: List[str], explain=None, abort_on=()) -> List[Dict[str, Any]]:
+        """Predict solutions for multiple problems
+        
+        `explain` stands in for predict_with_explanation (e.g. one shared with
+        concurrent requests); a problem repeated in the batch is solved once.
+        Exceptions of the `abort_on` types stop the batch and propagate; other
+        errors are reported in that problem's entry.
+        """
+        explain = explain or self.predict_with_explanation
+        solved = {}
         results = []
         for problem in problems:
             try:
-                result = self.predict_with_explanation(problem)
-                results.append({
+                if problem not in solved:
+                    solved[problem] = explain(problem)
+                result = solved[problem]
+                entry = {
                     "problem": problem,
                     "solution": result["solution"],
                     "confidence": result["confidence"],
                     "concepts": result["concepts"]
-                })
+                }
+                if result.get("degraded"):
+                    entry["degraded"] = True
+                results.append(entry)
+            except abort_on:
+                raise
             except Exception as e:
                 results.append({
                     "problem": problem,
@@ -1,10 +1,20 @@
-from flask import Flask, request, jsonify, session
+import os
+
+# Socket.IO server mode: threading (default) or eventlet, which holds many idle
+# connections cheaply. eventlet has to patch the standard library before anything else loads.
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, request, jsonify, session, g
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room, ConnectionRefusedError
 from datetime import datetime, timedelta
 import psycopg2
+import atexit
+import base64
 import json
-import os
 import logging
 import time
 import jwt
@@ -12,21 +22,37 @@ from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
 from urllib.parse import urlparse
 import sys
+import tempfile
+import threading
+import uuid
 from pathlib import Path
 
 # Add the backend directory to Python path
 sys.path.append(str(Path(__file__).parent))
 
+from utils.admission import AdmissionController, AdmissionError, OverloadedError, RateLimitedError
+from utils.broadcast import Broadcaster
+from utils.bulk_import import BulkImporter, FORMATS, STATUSES, detect_format
+from utils.database_manager import DatabaseManager
+from utils.health import HealthProber
+from utils.inference_executor import InferenceExecutor
+from utils.json_columns import concept_condition, ensure_concept_index, json_object_sql
+from utils.metrics import CONTENT_TYPE, SLOW_BUCKETS, registry
+from utils.retention import SolutionArchiver
+from utils.shared_state import node_name, shared_backends_from_env
+from utils.single_flight import FlightTimeoutError, SingleFlight
+from utils.token_cache import RevocationStore, TokenVerifier
+from utils.ttl_cache import TTLCache
+from utils.user_stats import UserStats
+from utils.write_behind import WriteBehindWriter
+
 try:
-    from utils.database_manager import DatabaseManager
     from utils.math_processor import MathProcessor
     from utils.model_validator import ModelValidator
     from advanced_math_ai import math_ai
 except ImportError as e:
     print(f"Import warning: {e}")
     # Create mock classes for initial deployment
-    class DatabaseManager:
-        def get_connection(self): return None
     class MathProcessor:
         def normalize_math_expression(self, x): return x
         def extract_math_concepts(self, x): return []
@@ -38,6 +64,7 @@ except ImportError as e:
         def predict(self, x): return "Model not loaded", 0.0
         def predict_with_explanation(self, x): 
             return {"solution": "Model not loaded", "explanation": [], "concepts": [], "confidence": 0.0}
+        def batch_predict(self, problems, explain=None, abort_on=()): return []
         def get_model_info(self): return {"status": "not_loaded"}
     math_ai = MathAI()
 
@@ -57,21 +84,342 @@ if os.getenv('CORS_ORIGINS'):
     cors_origins.extend(os.getenv('CORS_ORIGINS').split(','))
 
 CORS(app, origins=cors_origins)
-socketio = SocketIO(app, cors_allowed_origins=cors_origins, async_mode='threading')
+socketio = SocketIO(app, cors_allowed_origins=cors_origins, async_mode=SOCKETIO_ASYNC_MODE)
 
 # Initialize utilities
 db_manager = DatabaseManager()
 math_processor = MathProcessor()
 model_validator = ModelValidator()
 
-# Training status tracking
-training_status = {
+# Socket.IO session id -> user id, for connections that passed auth
+socket_users = {}
+
+# Per-user counters, updated alongside the rows they count
+user_stats = UserStats(db_manager)
+
+# Solve requests are logged off the request path, in batched inserts
+solution_log = WriteBehindWriter.from_env(
+    db_manager, 'solution_requests',
+    ('user_id', 'problem_text', 'solution_data', 'processing_time', 'created_at'),
+    on_batch=user_stats.record_solutions
+)
+
+# Old solve logs are archived by scripts/archive_solution_requests.py; daily totals stay queryable
+solution_archiver = SolutionArchiver.from_env(db_manager)
+
+# Row totals per filter combination, so paging doesn't COUNT(*) the table each request
+training_data_counts = TTLCache(maxsize=64, ttl=float(os.getenv('TRAINING_DATA_COUNT_TTL', 30)))
+
+# Metrics served at /metrics; model stage and database timings are recorded where they happen
+HTTP_REQUESTS = registry.counter('http_requests_total', 'HTTP requests by route and status',
+                                 ['method', 'route', 'status'])
+HTTP_REQUEST_SECONDS = registry.histogram('http_request_duration_seconds', 'HTTP request latency by route',
+                                          ['method', 'route'])
+SOCKETIO_CONNECTS = registry.counter('socketio_connects_total', 'Accepted Socket.IO connections')
+SOCKETIO_EMITTED = registry.counter('socketio_messages_emitted_total', 'Socket.IO messages sent to clients',
+                                    ['event'])
+TRAINING_SECONDS = registry.histogram('training_duration_seconds', 'Duration of training runs',
+                                      ['outcome'], SLOW_BUCKETS)
+_CHAT_RESPONSES = SOCKETIO_EMITTED.labels('chat_response')
+_CHAT_ERRORS = SOCKETIO_EMITTED.labels('chat_error')
+_CHAT_DROPS = SOCKETIO_EMITTED.labels('chat_dropped')
+
+# Training status, the active model version and Socket.IO events are shared by every
+# worker process; a training run holds a lease so only one worker trains at a time
+shared_state, event_bus = shared_backends_from_env(db_manager)
+
+# Verified JWT claims are cached until the token expires; logout revokes. Revocations are
+# stored alongside the shared state and announced on the event bus, so every worker honours them
+token_verifier = TokenVerifier(
+    app.config['JWT_SECRET_KEY'],
+    maxsize=int(os.getenv('AUTH_CACHE_SIZE', 10000)),
+    max_ttl=float(os.getenv('AUTH_CACHE_TTL', 300)),
+    store=RevocationStore(db_manager) if shared_state.shared else None
+)
+TRAINING_LEASE_SECONDS = float(os.getenv('TRAINING_LEASE_SECONDS', 300))
+IDLE_TRAINING_STATUS = {
     'is_training': False,
     'progress': 0,
     'message': '',
     'training_id': None
 }
 
+# Model version this worker has loaded; compared with the shared active version
+model_state = {'version': None}
+_model_reload_lock = threading.Lock()
+
+def load_active_model():
+    """(Re)load the model and record which shared version it is"""
+    if not _model_reload_lock.acquire(blocking=False):
+        return False
+    try:
+        active = shared_state.get('model_version') or {}
+        loaded = math_ai.load_model()
+        if loaded:
+            model_state['version'] = active.get('version')
+            logger.info(f"Model version {model_state['version']} loaded")
+        return loaded
+    finally:
+        _model_reload_lock.release()
+
+# Training events only go to clients that joined this room ('' = every client)
+TRAINING_EVENTS_ROOM = os.getenv('TRAINING_EVENTS_ROOM', 'training') or None
+
+# training_data_added arrives as periodic digests and training_progress is rate-limited
+broadcaster = Broadcaster.from_env(event_bus.publish)
+
+# Socket.IO messages this worker sent to clients for published events
+fan_out_counts = {'events': 0, 'messages': 0}
+_fan_out_lock = threading.Lock()
+
+# Published events handled inside the workers and never sent to Socket.IO clients
+INTERNAL_EVENTS = {'token_revoked'}
+
+def _fan_out(event, payload, room):
+    """Runs in every worker for every published event"""
+    if event in INTERNAL_EVENTS:
+        return
+    recipients = len(socketio.server.manager.rooms.get('/', {}).get(room, {}))
+    with _fan_out_lock:
+        fan_out_counts['events'] += 1
+        fan_out_counts['messages'] += recipients
+    if recipients:
+        socketio.emit(event, payload, to=room)
+        SOCKETIO_EMITTED.labels(event).inc(recipients)
+    if event == 'model_updated' and payload.get('version') != model_state['version']:
+        threading.Thread(target=load_active_model, daemon=True).start()
+
+def _apply_revocation(event, payload, room):
+    """A token revoked by logout in any worker stops being served from this one's cache"""
+    if event == 'token_revoked':
+        token_verifier.deny(payload['digest'], payload['expires_at'])
+
+event_bus.subscribe(_fan_out)
+event_bus.subscribe(_apply_revocation)
+
+# Model inference for solve and chat is admitted through one controller: bounded
+# concurrency, a short wait queue with a deadline, and per-user rate limits
+admission = AdmissionController.from_env()
+
+def admission_error_response(error):
+    """429/503 with Retry-After for a request the admission controller turned away"""
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+def rule_based_solution(problem_text, start_time, degraded=False):
+    """Answer without the model: before it is trained, or when shedding load in degraded mode"""
+    concepts = math_processor.extract_math_concepts(problem_text)
+    if degraded:
+        steps = [
+            "Server is busy. Using rule-based processing.",
+            "Identified concepts: " + ", ".join(concepts)
+        ]
+        final_answer = "Try again shortly for an AI-powered solution"
+    else:
+        steps = [
+            "AI model not yet trained. Using rule-based processing.",
+            "Identified concepts: " + ", ".join(concepts),
+            "Please train the model for AI-powered solutions"
+        ]
+        final_answer = "Model training required for accurate solutions"
+    return {
+        "steps": steps,
+        "final_answer": final_answer,
+        "concepts": concepts,
+        "confidence": 0.0,
+        "processing_time": time.time() - start_time
+    }
+
+# Under eventlet only the model call itself goes to a real OS thread (tpool). Admission
+# slots and single-flight waits use green primitives, which must stay on the hub
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    from eventlet import tpool
+    run_model = tpool.execute
+else:
+    def run_model(fn, *args):
+        return fn(*args)
+
+# Identical problems in flight at the same moment (solve, batch or chat) share one model run
+solve_flights = SingleFlight(timeout=float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 10)))
+
+def problem_key(problem_text):
+    """Problems that normalize to the same text get the same answer"""
+    return ' '.join(math_processor.normalize_math_expression(problem_text).split())
+
+def explain_problem(problem_text):
+    """Model answer with explanation, or None when shed in degraded mode
+
+    Raises AdmissionError when the request can't be admitted, including
+    when an identical request it is waiting on takes too long.
+    """
+    def run():
+        with admission.slot() as admitted:
+            return run_model(math_ai.predict_with_explanation, problem_text) if admitted else None
+    try:
+        return solve_flights.do(problem_key(problem_text), run)
+    except FlightTimeoutError as e:
+        raise OverloadedError(str(e), 1)
+
+def _chat_inference(problem):
+    if not math_ai.is_loaded:
+        return "AI model not yet trained. Please train the model first.", 0.0
+    result = explain_problem(problem)
+    if result is None:
+        concepts = math_processor.extract_math_concepts(problem)
+        return f"Server is busy, please try again shortly. Identified concepts: {', '.join(concepts)}", 0.0
+    return result["solution"], result["confidence"]
+
+def _chat_result(sid, request_ids, problem, result, error):
+    if isinstance(error, AdmissionError):
+        for request_id in request_ids:
+            socketio.emit('chat_error', {'request_id': request_id, 'error': str(error),
+                                         'retry_after': error.retry_after}, to=sid)
+        _CHAT_ERRORS.inc(len(request_ids))
+        return
+    if error is not None:
+        logger.error(f"Chat error: {str(error)}")
+        for request_id in request_ids:
+            socketio.emit('chat_error', {'request_id': request_id, 'error': 'Failed to process message'}, to=sid)
+        _CHAT_ERRORS.inc(len(request_ids))
+        return
+    solution, confidence = result
+    for request_id in request_ids:
+        socketio.emit('chat_response', {
+            'request_id': request_id,
+            'problem': problem,
+            'solution': solution,
+            'confidence': confidence,
+            'timestamp': datetime.now().isoformat()
+        }, to=sid)
+    _CHAT_RESPONSES.inc(len(request_ids))
+
+def _chat_dropped(sid, request_ids):
+    for request_id in request_ids:
+        socketio.emit('chat_dropped', {'request_id': request_id, 'reason': 'Too many pending messages'}, to=sid)
+    _CHAT_DROPS.inc(len(request_ids))
+
+# Chat predictions run off the Socket.IO handlers, one at a time per client behind a
+# short queue; under eventlet in green threads, with the model call itself in run_model
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    chat_executor = InferenceExecutor.from_env(_chat_inference, _chat_result, _chat_dropped,
+                                               spawn=socketio.start_background_task)
+else:
+    chat_executor = InferenceExecutor.from_env(_chat_inference, _chat_result, _chat_dropped)
+
+def _check_database():
+    pool = db_manager.pool_stats()
+    with db_manager.connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT 1")
+        c.fetchone()
+        c.close()
+    return True, {'backend': pool.get('backend')}
+
+def _check_database_pool():
+    pool = db_manager.pool_stats()
+    saturation = pool['in_use'] / pool['max_size'] if pool.get('max_size') else 0.0
+    limit = float(os.getenv('HEALTH_POOL_SATURATION', 0.9))
+    return saturation < limit, {'in_use': pool.get('in_use'), 'max_size': pool.get('max_size'),
+                                'saturation': round(saturation, 2), 'timeouts': pool.get('timeouts')}
+
+def _check_model():
+    loaded = math_ai.is_loaded
+    # An untrained instance still answers with rule-based processing unless the model is required
+    required = os.getenv('HEALTH_REQUIRE_MODEL', 'false').lower() == 'true'
+    return loaded or not required, {
+        'loaded': loaded,
+        'version': model_state['version'],
+        'info': math_ai.get_model_info() if hasattr(math_ai, 'get_model_info') else {"status": "unknown"}
+    }
+
+def _check_queues():
+    stats = admission.stats()
+    saturated = stats['max_queue'] > 0 and stats['queue_depth'] >= stats['max_queue']
+    return not saturated, {
+        'admission_active': stats['active'],
+        'admission_queue': stats['queue_depth'],
+        'admission_max_queue': stats['max_queue'],
+        'chat_queued': chat_executor.stats()['queued'],
+        'solution_log_queued': solution_log.stats().get('queued', 0)
+    }
+
+# Readiness comes from this snapshot; health endpoints never touch the database themselves
+health_prober = HealthProber.from_env({
+    'database': _check_database,
+    'database_pool': _check_database_pool,
+    'model': _check_model,
+    'queues': _check_queues
+})
+
+# Values other components already keep are read when /metrics is scraped, not recorded per event
+def _cache_stats():
+    return {'auth': token_verifier.stats(), 'training_data_counts': training_data_counts.stats()}
+
+def _cache_lookups():
+    lookups = {}
+    for cache, stats in _cache_stats().items():
+        lookups[(cache, 'hit')] = stats['hits']
+        lookups[(cache, 'miss')] = stats['misses']
+    return lookups
+
+def _admission_outcomes():
+    stats = admission.stats()
+    return {(outcome,): stats[outcome]
+            for outcome in ('admitted', 'degraded', 'shed_queue_full', 'shed_timeout', 'rate_limited')}
+
+def _db_pool_connections():
+    pool = db_manager.pool_stats()
+    return {('in_use',): pool.get('in_use'), ('idle',): pool.get('idle')}
+
+registry.callback('cache_requests_total', 'Cache lookups by result', _cache_lookups, 'counter', ['cache', 'result'])
+registry.callback('cache_hit_ratio', 'Fraction of cache lookups that were hits',
+                  lambda: {(cache,): stats['hit_rate'] for cache, stats in _cache_stats().items()}, labelnames=['cache'])
+registry.callback('socketio_connections', 'Connected Socket.IO clients', lambda: len(socket_users))
+registry.callback('training_room_subscribers', 'Socket.IO clients subscribed to training events',
+                  lambda: len(socketio.server.manager.rooms.get('/', {}).get(TRAINING_EVENTS_ROOM, {})))
+registry.callback('admission_requests_total', 'Inference admission outcomes', _admission_outcomes, 'counter',
+                  ['outcome'])
+registry.callback('admission_active', 'Requests holding an inference slot', lambda: admission.stats()['active'])
+registry.callback('admission_queue_depth', 'Requests waiting for an inference slot',
+                  lambda: admission.stats()['queue_depth'])
+registry.callback('single_flight_calls_total', 'Model calls run or coalesced onto an identical one',
+                  lambda: {(result,): solve_flights.stats()[result] for result in ('executions', 'coalesced')},
+                  'counter', ['result'])
+registry.callback('chat_queue_depth', 'Chat messages waiting for the model', lambda: chat_executor.stats()['queued'])
+registry.callback('solution_log_queue_depth', 'Solve logs waiting to be written',
+                  lambda: solution_log.stats().get('queued', 0))
+registry.callback('db_pool_connections', 'Primary pool connections by state', _db_pool_connections,
+                  labelnames=['state'])
+registry.callback('model_loaded', 'Whether the model is loaded (1) or answers are rule-based (0)',
+                  lambda: int(math_ai.is_loaded))
+
+@app.before_request
+def _start_background_services():
+    event_bus.start()
+    health_prober.start()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The route pattern, not the path, so ids in URLs don't make new series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.labels(request.method, route, response.status_code).inc()
+        HTTP_REQUEST_SECONDS.labels(request.method, route).observe(time.perf_counter() - started)
+    return response
+
+@atexit.register
+def _shutdown():
+    health_prober.close()
+    chat_executor.close()
+    broadcaster.close()
+    event_bus.close()
+    solution_log.close()
+    if hasattr(db_manager, 'close'):
+        db_manager.close()
+
 # Authentication decorator
 def token_required(f):
     @wraps(f)
@@ -83,7 +431,7 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+            data = token_verifier.verify(token)
             current_user = data['user_id']
         except Exception as e:
             logger.error(f"Token validation error: {e}")
@@ -98,14 +446,10 @@ def health_check():
     try:
         model_status = "ready" if math_ai.is_loaded else "not_loaded"
         
-        # Test database connection
-        db_status = "connected"
-        try:
-            conn = db_manager.get_connection()
-            if conn:
-                conn.close()
-        except Exception as e:
-            db_status = f"error: {str(e)}"
+        # Database status from the prober's last round, not a connection per call
+        snapshot = health_prober.snapshot()
+        database = snapshot['checks'].get('database', {'ok': False, 'error': 'not checked yet'})
+        db_status = "connected" if database['ok'] else f"error: {database.get('error')}"
         
         return jsonify({
             "status": "healthy",
@@ -116,12 +460,53 @@ def health_check():
                 "model": model_status,
                 "websocket": "connected"
             },
-            "model_info": math_ai.get_model_info() if hasattr(math_ai, 'get_model_info') else {"status": "unknown"}
+            "database_pool": db_manager.pool_stats(),
+            "solution_log": solution_log.stats(),
+            "auth_cache": token_verifier.stats(),
+            "chat_inference": chat_executor.stats(),
+            "admission": admission.stats(),
+            "single_flight": solve_flights.stats(),
+            "broadcasts": {
+                "events": broadcaster.stats(),
+                "fan_out": dict(fan_out_counts),
+                "training_subscribers": len(socketio.server.manager.rooms.get('/', {}).get(TRAINING_EVENTS_ROOM, {}))
+            },
+            "shared_state": {
+                "shared": shared_state.shared,
+                "events": event_bus.stats(),
+                "model_version": model_state['version']
+            },
+            "readiness": {
+                "ready": snapshot['ready'],
+                "reasons": snapshot['reasons'],
+                "checked_at": snapshot['checked_at']
+            },
+            "model_info": snapshot['checks'].get('model', {}).get('info', {"status": "unknown"})
         })
     except Exception as e:
         logger.error(f"Health check error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness():
+    """Liveness: the process is up and serving requests; checks nothing else"""
+    return jsonify({"status": "alive", "timestamp": datetime.now().isoformat()})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """Readiness: whether to route traffic here, from the background prober's snapshot"""
+    snapshot = health_prober.snapshot()
+    return jsonify(dict(snapshot, status="ready" if snapshot['ready'] else "not_ready")), \
+        200 if snapshot['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({"error": "Unauthorized"}), 401
+    return app.response_class(registry.render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """User registration"""
@@ -135,26 +520,25 @@ def register():
         if not all(field in data for field in required_fields):
             return jsonify({"error": "Missing required fields"}), 400
         
-        # Check if user exists
-        conn = db_manager.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT id FROM users WHERE email = %s OR username = %s", 
-                 (data['email'], data['username']))
-        existing_user = c.fetchone()
-        
-        if existing_user:
-            conn.close()
-            return jsonify({"error": "User already exists"}), 409
-        
-        # Create user
-        hashed_password = generate_password_hash(data['password'])
-        c.execute('''INSERT INTO users (username, email, password_hash, created_at)
-                    VALUES (%s, %s, %s, %s) RETURNING id''',
-                 (data['username'], data['email'], hashed_password, datetime.now()))
-        
-        user_id = c.fetchone()[0]
-        conn.commit()
-        conn.close()
+        with db_manager.connection() as conn:
+            c = conn.cursor()
+            
+            # Check if user exists
+            c.execute("SELECT id FROM users WHERE email = %s OR username = %s", 
+                     (data['email'], data['username']))
+            existing_user = c.fetchone()
+            
+            if existing_user:
+                return jsonify({"error": "User already exists"}), 409
+            
+            # Create user
+            hashed_password = generate_password_hash(data['password'])
+            c.execute('''INSERT INTO users (username, email, password_hash, created_at)
+                        VALUES (%s, %s, %s, %s) RETURNING id''',
+                     (data['username'], data['email'], hashed_password, datetime.now()))
+            
+            user_id = c.fetchone()[0]
+            conn.commit()
         
         # Generate token
         token = jwt.encode({
@@ -190,11 +574,10 @@ def login():
         if not all(field in data for field in required_fields):
             return jsonify({"error": "Missing required fields"}), 400
         
-        conn = db_manager.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT id, username, email, password_hash FROM users WHERE email = %s", (data['email'],))
-        user = c.fetchone()
-        conn.close()
+        with db_manager.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, username, email, password_hash FROM users WHERE email = %s", (data['email'],))
+            user = c.fetchone()
         
         if not user or not check_password_hash(user[3], data['password']):
             return jsonify({"error": "Invalid credentials"}), 401
@@ -220,6 +603,16 @@ def login():
         logger.error(f"Login error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    """Revoke the presented token"""
+    token = request.headers.get('Authorization', '')
+    digest, expires_at = token_verifier.revoke(token[7:] if token.startswith('Bearer ') else token)
+    # Other workers drop the token from their verification caches too
+    event_bus.publish('token_revoked', {'digest': digest, 'expires_at': expires_at})
+    return jsonify({"success": True, "message": "Logged out"})
+
 @app.route('/api/solve', methods=['POST'])
 @token_required
 def solve_problem(current_user):
@@ -236,26 +629,15 @@ def solve_problem(current_user):
         
         start_time = time.time()
         
-        if not math_ai.is_loaded:
-            # Fallback to rule-based processing
-            processed_text = math_processor.normalize_math_expression(problem_text)
-            concepts = math_processor.extract_math_concepts(problem_text)
-            
-            solution = {
-                "steps": [
-                    "AI model not yet trained. Using rule-based processing.",
-                    "Identified concepts: " + ", ".join(concepts),
-                    "Please train the model for AI-powered solutions"
-                ],
-                "final_answer": "Model training required for accurate solutions",
-                "concepts": concepts,
-                "confidence": 0.0,
-                "processing_time": time.time() - start_time
-            }
-        else:
+        try:
+            admission.check_rate(current_user)
+            result = explain_problem(problem_text) if math_ai.is_loaded else None
+        except AdmissionError as e:
+            return admission_error_response(e)
+        degraded = math_ai.is_loaded and result is None
+        
+        if result is not None:
             # Use actual AI model
-            result = math_ai.predict_with_explanation(problem_text)
-            
             solution = {
                 "steps": result["explanation"],
                 "final_answer": result["solution"],
@@ -263,19 +645,16 @@ def solve_problem(current_user):
                 "confidence": result["confidence"],
                 "processing_time": time.time() - start_time
             }
+        else:
+            # Fallback to rule-based processing (no model yet, or shedding load)
+            solution = rule_based_solution(problem_text, start_time, degraded=degraded)
         
-        # Log the solution request
-        try:
-            conn = db_manager.get_connection()
-            c = conn.cursor()
-            c.execute('''INSERT INTO solution_requests 
-                        (user_id, problem_text, solution_data, processing_time)
-                        VALUES (%s, %s, %s, %s)''',
-                     (current_user, problem_text, json.dumps(solution), solution['processing_time']))
-            conn.commit()
-            conn.close()
-        except Exception as db_error:
-            logger.warning(f"Could not log solution to database: {db_error}")
+        # Log the solution request; created_at is taken now (UTC, like CURRENT_TIMESTAMP),
+        # not when the batch is flushed
+        if not solution_log.submit((current_user, problem_text, json.dumps(solution),
+                                    solution['processing_time'], datetime.utcnow())):
+            logger.debug("Solution log queue full; request not logged")
+        db_manager.record_write(current_user)
         
         return jsonify({
             "success": True,
@@ -283,7 +662,8 @@ def solve_problem(current_user):
             "metadata": {
                 "timestamp": datetime.now().isoformat(),
                 "model_version": "2.0.0",
-                "model_loaded": math_ai.is_loaded
+                "model_loaded": math_ai.is_loaded,
+                "degraded": degraded
             }
         })
         
@@ -291,6 +671,54 @@ def solve_problem(current_user):
         logger.error(f"Error solving problem: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/solve/batch', methods=['POST'])
+@token_required
+def solve_batch(current_user):
+    """Solve several problems in one request"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+        
+        problems = [str(problem).strip() for problem in data.get('problems', []) if str(problem).strip()]
+        if not problems:
+            return jsonify({"error": "No problems provided"}), 400
+        max_problems = int(os.getenv('BATCH_MAX_PROBLEMS', 50))
+        if len(problems) > max_problems:
+            return jsonify({"error": f"At most {max_problems} problems per batch"}), 400
+        
+        try:
+            admission.check_rate(current_user)
+        except AdmissionError as e:
+            return admission_error_response(e)
+        
+        shed = []
+        
+        def explain(problem_text):
+            # Once one problem is shed, answer the rest without queueing for a slot again
+            result = None if shed else explain_problem(problem_text)
+            if result is None:
+                shed.append(problem_text)
+                fallback = rule_based_solution(problem_text, time.time(), degraded=True)
+                return {"solution": fallback["final_answer"], "confidence": 0.0,
+                        "concepts": fallback["concepts"], "degraded": True}
+            return result
+        
+        # Without ADMISSION_DEGRADE, the first problem turned away fails the whole batch
+        try:
+            results = math_ai.batch_predict(problems, explain=explain, abort_on=(AdmissionError,))
+        except AdmissionError as e:
+            return admission_error_response(e)
+        
+        return jsonify({
+            "success": True,
+            "results": results
+        })
+        
+    except Exception as e:
+        logger.error(f"Error solving batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/train', methods=['POST'])
 @token_required
 def add_training_data(current_user):
@@ -309,30 +737,32 @@ def add_training_data(current_user):
         if not model_validator.validate_training_data(data['problem_text'], data['solution_text']):
             return jsonify({"error": "Invalid training data"}), 400
         
-        conn = db_manager.get_connection()
-        c = conn.cursor()
-        
-        c.execute('''INSERT INTO training_data 
-                    (problem_text, solution_text, step_by_step_explanation, 
-                     mathematical_concepts, difficulty_level, contributed_by, user_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id''',
-                 (data['problem_text'], data['solution_text'],
-                  data.get('step_by_step_explanation', ''),
-                  json.dumps(data['mathematical_concepts']),
-                  data.get('difficulty_level', 'Intermediate'),
-                  data.get('contributed_by', 'Anonymous'),
-                  current_user))
-        
-        training_id = c.fetchone()[0]
-        conn.commit()
-        conn.close()
+        with db_manager.connection() as conn:
+            c = conn.cursor()
+            
+            c.execute('''INSERT INTO training_data 
+                        (problem_text, solution_text, step_by_step_explanation, 
+                         mathematical_concepts, difficulty_level, contributed_by, user_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id''',
+                     (data['problem_text'], data['solution_text'],
+                      data.get('step_by_step_explanation', ''),
+                      json.dumps(data['mathematical_concepts']),
+                      data.get('difficulty_level', 'Intermediate'),
+                      data.get('contributed_by', 'Anonymous'),
+                      current_user))
+            
+            training_id = c.fetchone()[0]
+            user_stats.record_contributions(c, current_user)
+            conn.commit()
+        db_manager.record_write(current_user)
+        training_data_counts.clear()
         
         # Notify via WebSocket
-        socketio.emit('training_data_added', {
+        broadcaster.digest('training_data_digest', {
             'id': training_id,
             'problem_text': data['problem_text'],
             'contributor': data.get('contributed_by', 'Anonymous')
-        })
+        }, room=TRAINING_EVENTS_ROOM)
         
         return jsonify({
             "success": True,
@@ -344,96 +774,304 @@ def add_training_data(current_user):
         logger.error(f"Error adding training data: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+TRAINING_DATA_FILTERS = {
+    'validation_status': ('pending', 'approved', 'rejected'),
+    'difficulty_level': ('Beginner', 'Intermediate', 'Advanced'),
+}
+
+# Rows are rendered to JSON by the database and passed through as-is
+TRAINING_DATA_JSON = json_object_sql([
+    ('id', 'id', 'value'),
+    ('problem_text', 'problem_text', 'value'),
+    ('solution_text', 'solution_text', 'value'),
+    ('mathematical_concepts', 'mathematical_concepts', 'json'),
+    ('difficulty_level', 'difficulty_level', 'value'),
+    ('contributed_by', 'contributed_by', 'value'),
+    ('created_at', 'created_at', 'value'),
+    ('validation_status', 'validation_status', 'value'),
+], getattr(db_manager, 'is_postgres', False))
+
+PROBLEM_JSON = json_object_sql([
+    ('id', 'id', 'value'),
+    ('title', 'title', 'value'),
+    ('description', 'description', 'value'),
+    ('difficulty', 'difficulty', 'value'),
+    ('topic', 'topic', 'value'),
+    ('solution_steps', 'solution_steps', 'json'),
+    ('final_answer', 'final_answer', 'value'),
+    ('mathematical_concepts', 'mathematical_concepts', 'json'),
+    ('verified', 'verified', 'bool'),
+    ('created_at', 'created_at', 'value'),
+], getattr(db_manager, 'is_postgres', False))
+
+def json_rows_response(rows_json, **fields):
+    """JSON response with a `data` list of pre-rendered row documents"""
+    body = json.dumps(fields)
+    body = '{"data": [' + ', '.join(rows_json) + ']' + (', ' + body[1:] if fields else '}')
+    return app.response_class(body, mimetype='application/json')
+
+def concept_filter(table, conditions, params):
+    """Add the ?concept= filter, if any, to a WHERE clause being built"""
+    concept = request.args.get('concept', '').strip()
+    if concept:
+        ensure_concept_index(db_manager)
+        sql, values = concept_condition(table, getattr(db_manager, 'is_postgres', False), concept)
+        conditions.append(sql)
+        params.extend(values)
+
+def encode_cursor(created_at, row_id):
+    """Opaque keyset cursor for the (created_at, id) position of a row"""
+    # Keep SQLite's stored text as-is so the cursor compares the same way the column does
+    value = created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return created_at, int(row_id)
+
+def count_training_data(c, where_sql, params):
+    """Row total for a filter set, from a short-lived cache or a cheap estimate"""
+    key = (where_sql, tuple(params))
+    cached = training_data_counts.get(key)
+    if cached is not None:
+        return cached
+    
+    total, estimate = None, False
+    if not params and getattr(db_manager, 'is_postgres', False):
+        # Planner statistics instead of a full scan; -1 until the table has been analyzed
+        c.execute("SELECT reltuples::BIGINT FROM pg_class WHERE relname = 'training_data'")
+        row = c.fetchone()
+        if row and row[0] >= 0:
+            total, estimate = int(row[0]), True
+    if total is None:
+        c.execute(f"SELECT COUNT(*) FROM training_data{where_sql}", params)
+        total = c.fetchone()[0]
+    
+    training_data_counts.set(key, (total, estimate))
+    return total, estimate
+
 @app.route('/api/training-data', methods=['GET'])
 @token_required
 def get_training_data(current_user):
-    """Get training data with pagination"""
+    """Get training data, newest first, with keyset (cursor) or page pagination"""
     try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        cursor = request.args.get('cursor')
         page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        offset = (page - 1) * limit
         
-        conn = db_manager.get_connection()
-        c = conn.cursor()
+        conditions, params = [], []
+        for column, allowed in TRAINING_DATA_FILTERS.items():
+            value = request.args.get(column)
+            if value:
+                if value not in allowed:
+                    return jsonify({"error": f"Invalid {column}"}), 400
+                conditions.append(f"{column} = %s")
+                params.append(value)
+        concept_filter('training_data', conditions, params)
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
         
-        # Get total count
-        c.execute("SELECT COUNT(*) FROM training_data")
-        total = c.fetchone()[0]
+        page_conditions, page_params = list(conditions), list(params)
+        offset_sql = ""
+        if cursor:
+            try:
+                created_at, row_id = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({"error": "Invalid cursor"}), 400
+            # Row-value comparison walks idx_training_data_created_id from the cursor onwards
+            page_conditions.append("(created_at, id) < (%s, %s)")
+            page_params.extend([created_at, row_id])
+        elif page > 1:
+            # Page numbers are kept for existing clients; deep pages should use the cursor
+            offset_sql = " OFFSET %s"
+        page_where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
         
-        # Get data
-        c.execute('''SELECT id, problem_text, solution_text, mathematical_concepts, 
-                    difficulty_level, contributed_by, created_at, validation_status
-                    FROM training_data 
-                    ORDER BY created_at DESC 
-                    LIMIT %s OFFSET %s''', (limit, offset))
-        
-        data = []
-        for row in c.fetchall():
-            data.append({
-                "id": row[0],
-                "problem_text": row[1],
-                "solution_text": row[2],
-                "mathematical_concepts": json.loads(row[3]) if row[3] else [],
-                "difficulty_level": row[4],
-                "contributed_by": row[5],
-                "created_at": row[6].isoformat() if hasattr(row[6], 'isoformat') else str(row[6]),
-                "validation_status": row[7]
-            })
-        
-        conn.close()
+        with db_manager.read_connection(current_user) as conn:
+            c = conn.cursor()
+            total, total_is_estimate = count_training_data(c, where_sql, params)
+            
+            # One extra row tells us whether another page follows
+            c.execute(f'''SELECT id, created_at, {TRAINING_DATA_JSON}
+                        FROM training_data{page_where}
+                        ORDER BY created_at DESC, id DESC 
+                        LIMIT %s{offset_sql}''',
+                     page_params + [limit + 1] + ([(page - 1) * limit] if offset_sql else []))
+            rows = c.fetchall()
         
-        return jsonify({
-            "data": data,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
-        })
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
+        pagination = {
+            "limit": limit,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "pages": (total + limit - 1) // limit,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+        }
+        if not cursor:
+            pagination["page"] = page
+        
+        return json_rows_response([row[2] for row in rows], pagination=pagination)
+        
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
     except Exception as e:
         logger.error(f"Error fetching training data: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/problems', methods=['GET'])
+def get_problems():
+    """List problems, newest first, filtered by ?concept=, ?difficulty= and ?topic="""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        after = request.args.get('cursor')
+        
+        conditions, params = [], []
+        difficulty = request.args.get('difficulty')
+        if difficulty:
+            if difficulty not in TRAINING_DATA_FILTERS['difficulty_level']:
+                return jsonify({"error": "Invalid difficulty"}), 400
+            conditions.append("difficulty = %s")
+            params.append(difficulty)
+        topic = request.args.get('topic')
+        if topic:
+            conditions.append("topic = %s")
+            params.append(topic)
+        concept_filter('problems', conditions, params)
+        if after:
+            conditions.append("id < %s")
+            params.append(int(after))
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with db_manager.read_connection() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT id, {PROBLEM_JSON} FROM problems{where_sql} ORDER BY id DESC LIMIT %s",
+                      params + [limit + 1])
+            rows = c.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return json_rows_response([row[1] for row in rows], pagination={
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": str(rows[-1][0]) if has_more else None
+        })
+        
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    except Exception as e:
+        logger.error(f"Error fetching problems: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/training-data/import', methods=['POST'])
+@token_required
+def import_training_data(current_user):
+    """Bulk-import an uploaded JSON, JSONL or CSV file in the background"""
+    try:
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({"error": "No file provided"}), 400
+        
+        try:
+            fmt = request.form.get('format') or detect_format(upload.filename)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        status = request.form.get('validation_status', 'pending')
+        strict = request.form.get('strict', 'false').lower() == 'true'
+        contributed_by = request.form.get('contributed_by', 'Bulk Import')
+        if fmt not in FORMATS or status not in STATUSES:
+            return jsonify({"error": "Invalid format or validation_status"}), 400
+        
+        # The upload stream is gone once this request returns, so keep a copy on disk
+        fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+        import_id = uuid.uuid4().hex
+        
+        def import_thread():
+            try:
+                with open(path, encoding='utf-8', newline='') as f:
+                    summary = BulkImporter(db_manager, strict=strict, user_stats=user_stats).run(
+                        f, fmt, contributed_by=contributed_by, user_id=current_user,
+                        validation_status=status
+                    )
+                db_manager.record_write(current_user)
+                training_data_counts.clear()
+                broadcaster.publish('training_data_imported', dict(summary, import_id=import_id, success=True),
+                                    room=TRAINING_EVENTS_ROOM)
+            except Exception as e:
+                logger.error(f"Bulk import {import_id} failed: {str(e)}")
+                broadcaster.publish('training_data_imported', {'import_id': import_id, 'success': False,
+                                                               'error': str(e)}, room=TRAINING_EVENTS_ROOM)
+            finally:
+                os.remove(path)
+        
+        thread = threading.Thread(target=import_thread, daemon=True)
+        thread.start()
+        
+        return jsonify({
+            "success": True,
+            "message": "Import started; a training_data_imported event reports the result",
+            "import_id": import_id
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error starting import: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/retrain', methods=['POST'])
 @token_required
 def retrain_model(current_user):
     """Trigger model retraining"""
     try:
-        if training_status['is_training']:
+        training_id = f"train_{int(datetime.now().timestamp())}"
+        owner = f"{node_name()}/{training_id}"
+        status = {
+            'is_training': True,
+            'progress': 0,
+            'message': 'Starting training...',
+            'training_id': training_id
+        }
+        # The lease is shared by all workers, so a second request anywhere gets 409
+        if not shared_state.acquire('training_status', owner, status, ttl=TRAINING_LEASE_SECONDS):
             return jsonify({"error": "Training already in progress"}), 409
         
+        def update_status(**changes):
+            status.update(changes)
+            if not shared_state.set('training_status', status, owner=owner, ttl=TRAINING_LEASE_SECONDS):
+                logger.warning(f"Lost the training lease for {training_id}")
+        
         # Start training in background thread
         def training_thread():
-            global training_status
-            training_status['is_training'] = True
-            training_status['progress'] = 0
-            training_status['message'] = 'Starting training...'
-            training_status['training_id'] = f"train_{int(datetime.now().timestamp())}"
-            
-            socketio.emit('training_started', training_status)
+            broadcaster.publish('training_started', status, room=TRAINING_EVENTS_ROOM)
+            started = time.monotonic()
+            outcome = 'failed'
             
             try:
                 # For cloud deployment, we'll use a simpler approach
                 # since subprocess might not work well
-                training_status['message'] = 'Training in cloud environment...'
-                training_status['progress'] = 50
-                socketio.emit('training_progress', training_status)
+                update_status(message='Training in cloud environment...', progress=50)
+                broadcaster.throttle('training_progress', status, room=TRAINING_EVENTS_ROOM)
                 
                 # Simulate training completion for cloud deployment
                 time.sleep(5)  # Simulate training time
                 
-                training_status['message'] = 'Training completed successfully!'
-                training_status['progress'] = 100
-                socketio.emit('training_completed', training_status)
+                update_status(message='Training completed successfully!', progress=100)
+                # Every worker reloads once the new version is active
+                shared_state.set('model_version', {'version': training_id,
+                                                   'activated_at': datetime.now().isoformat()})
+                broadcaster.publish('training_completed', status, room=TRAINING_EVENTS_ROOM)
+                broadcaster.publish('model_updated', {'version': training_id}, room=TRAINING_EVENTS_ROOM)
+                outcome = 'completed'
                 
             except Exception as e:
                 logger.error(f"Training error: {str(e)}")
-                training_status['message'] = f'Training error: {str(e)}'
-                socketio.emit('training_failed', training_status)
+                status['message'] = f'Training error: {str(e)}'
+                broadcaster.publish('training_failed', status, room=TRAINING_EVENTS_ROOM)
             finally:
-                training_status['is_training'] = False
+                TRAINING_SECONDS.labels(outcome).observe(time.monotonic() - started)
+                status['is_training'] = False
+                shared_state.release('training_status', owner, status)
         
         # Start thread
         thread = threading.Thread(target=training_thread)
@@ -443,7 +1081,7 @@ def retrain_model(current_user):
         return jsonify({
             "success": True,
             "message": "Model training started",
-            "training_id": training_status['training_id']
+            "training_id": training_id
         })
         
     except Exception as e:
@@ -453,37 +1091,101 @@ def retrain_model(current_user):
 @app.route('/api/training/status', methods=['GET'])
 def get_training_status():
     """Get current training status"""
-    return jsonify(training_status)
+    try:
+        status, owner = shared_state.lease('training_status', IDLE_TRAINING_STATUS)
+        if status.get('is_training') and owner is None:
+            # The worker that was training stopped renewing its lease
+            status = dict(status, is_training=False, message='Training interrupted')
+        return jsonify(status)
+    except Exception as e:
+        logger.error(f"Error getting training status: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/users/me/stats', methods=['GET'])
+@token_required
+def get_user_stats(current_user):
+    """Activity counters for the current user"""
+    try:
+        stats = user_stats.get(current_user)
+        if stats is None:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting user stats: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/stats/solutions', methods=['GET'])
+@token_required
+def get_solution_stats(current_user):
+    """Daily solve counts for the current user, including archived requests"""
+    try:
+        days = min(max(request.args.get('days', 30, type=int), 1), 366)
+        since = (datetime.utcnow() - timedelta(days=days - 1)).date()
+        return jsonify({
+            "days": days,
+            "daily": solution_archiver.daily_totals(since, user_id=current_user)
+        })
+    except Exception as e:
+        logger.error(f"Error getting solution stats: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
 
 # WebSocket events
 @socketio.on('connect')
-def handle_connect():
-    logger.info('Client connected')
+def handle_connect(auth=None):
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    user_id = None
+    if token:
+        try:
+            user_id = token_verifier.verify(token)['user_id']
+        except Exception as e:
+            logger.warning(f"Socket.IO connection rejected: {e}")
+            raise ConnectionRefusedError('Token is invalid')
+    elif os.getenv('SOCKETIO_ALLOW_ANONYMOUS', 'false').lower() != 'true':
+        raise ConnectionRefusedError('Token is missing')
+    event_bus.start()
+    socket_users[request.sid] = user_id
+    SOCKETIO_CONNECTS.inc()
+    logger.info(f'Client connected (user {user_id})')
     emit('connected', {'message': 'Connected to Math Mentor AI'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    socket_users.pop(request.sid, None)
+    chat_executor.discard(request.sid)
     logger.info('Client disconnected')
 
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join event rooms, e.g. {'rooms': ['training']} on the training page"""
+    rooms = [room for room in (data or {}).get('rooms', []) if room and room == TRAINING_EVENTS_ROOM]
+    for room in rooms:
+        join_room(room)
+    return {'rooms': rooms}
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    rooms = [room for room in (data or {}).get('rooms', []) if room and room == TRAINING_EVENTS_ROOM]
+    for room in rooms:
+        leave_room(room)
+    return {'rooms': rooms}
+
 @socketio.on('chat_message')
 def handle_chat_message(data):
-    """Handle real-time chat messages"""
+    """Queue a chat message for the model; the answer arrives as chat_response"""
     try:
-        problem = data.get('problem', '')
-        if problem:
-            # Use AI to solve and respond
-            if math_ai.is_loaded:
-                solution, confidence = math_ai.predict(problem)
-            else:
-                solution = "AI model not yet trained. Please train the model first."
-                confidence = 0.0
-                
-            emit('chat_response', {
-                'problem': problem,
-                'solution': solution,
-                'confidence': confidence,
-                'timestamp': datetime.now().isoformat()
-            })
+        problem = (data or {}).get('problem', '')
+        if not problem:
+            return None
+        # Clients may pass their own request_id to match responses to messages
+        request_id = str(data.get('request_id') or uuid.uuid4().hex)
+        try:
+            admission.check_rate(socket_users.get(request.sid) or request.sid)
+        except RateLimitedError as e:
+            emit('chat_error', {'request_id': request_id, 'error': str(e), 'retry_after': e.retry_after})
+            return {'request_id': request_id, 'status': 'rate_limited', 'retry_after': e.retry_after}
+        key = problem_key(problem)
+        status = chat_executor.submit(request.sid, key, problem, request_id)
+        return {'request_id': request_id, 'status': status}
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         emit('chat_error', {'error': 'Failed to process message'})
@@ -491,7 +1193,7 @@ def handle_chat_message(data):
 if __name__ == '__main__':
     # Try to load AI model
     try:
-        math_ai.load_model()
+        load_active_model()
         logger.info("AI model loaded successfully")
     except Exception as e:
         logger.warning(f"Could not load AI model: {e}")
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Parallel hyperparameter sweep for MathAITrainer
+
+Tokenizes the training data once into a cached, memory-mapped dataset, then
+trains one trial per worker process with a capped TensorFlow thread count.
+Trials that fall below the median of their peers after a grace period are
+stopped early. Results are ranked by validation accuracy, inference latency
+and model size.
+
+    python hyperparameter_sweep.py --config sweep.json --workers 3 --epochs 20
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger('hyperparameter_sweep')
+
+DEFAULT_GRID = {
+    'embedding_dim': [64, 128],
+    'lstm_units': [[64, 32], [128, 64]],
+    'max_sequence_length': [64, 128],
+    'batch_size': [32, 64],
+}
+DEFAULT_EARLY_STOP = {'patience': 5, 'grace_epochs': 3, 'min_peers': 2}
+
+
+def expand_grid(grid, max_trials=None, seed=42):
+    """Cartesian product of the grid, sampled down to max_trials if needed"""
+    keys = sorted(grid)
+    trials = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if max_trials and len(trials) > max_trials:
+        trials = random.Random(seed).sample(trials, max_trials)
+    return trials
+
+
+def prepare_dataset(db_path, cache_root, max_sequence_length, seed, validation_split=0.2):
+    """Tokenize once at the longest sequence length and cache as .npy files
+
+    Shorter trials keep the last N columns, which matches pad_sequences'
+    default 'pre' truncation, so every trial shares the same arrays.
+    """
+    from sklearn.model_selection import train_test_split
+    from train_ai import MathAITrainer
+
+    trainer = MathAITrainer(hyperparameters={'max_sequence_length': max_sequence_length})
+    problems, solutions, _ = trainer.load_training_data(db_path)
+    if not problems:
+        raise RuntimeError('No valid training data available for the sweep')
+
+    key = hashlib.sha1(json.dumps({
+        'ids': trainer.sample_ids,
+        'max_sequence_length': max_sequence_length,
+        'vocab_size': trainer.vocab_size,
+        'seed': seed,
+        'validation_split': validation_split,
+    }).encode()).hexdigest()[:16]
+    dataset_dir = os.path.join(cache_root, f'dataset-{key}')
+    meta_path = os.path.join(dataset_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        logger.info(f"Reusing cached sweep dataset {dataset_dir}")
+        return dataset_dir
+
+    X, y = trainer.prepare_data(problems, solutions)
+    train_idx, val_idx = train_test_split(
+        np.arange(len(y)), test_size=validation_split, random_state=seed, stratify=y
+    )
+    os.makedirs(dataset_dir, exist_ok=True)
+    for name, array in (('X', X), ('y', y), ('train_idx', train_idx), ('val_idx', val_idx)):
+        np.save(os.path.join(dataset_dir, f'{name}.npy'), array)
+    with open(meta_path, 'w') as f:
+        json.dump({'num_classes': int(len(trainer.label_encoder.classes_)),
+                   'num_samples': int(len(y)),
+                   'max_sequence_length': max_sequence_length}, f)
+    logger.info(f"Cached sweep dataset in {dataset_dir}")
+    return dataset_dir
+
+
+def _init_worker(threads):
+    """Cap TensorFlow's thread pools before the runtime is initialized in this worker"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(trial_id, params, dataset_dir, sweep_dir, epochs, early_stop, progress, seed):
+    """Train a single configuration and save its model; runs inside a worker process"""
+    import tensorflow as tf
+    from train_ai import MathAITrainer
+
+    class MedianStopping(tf.keras.callbacks.Callback):
+        """Stop when the best val_accuracy so far is below the median of peers at the same epoch"""
+
+        def __init__(self):
+            super().__init__()
+            self.best = 0.0
+            self.pruned_at = None
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.best = max(self.best, float((logs or {}).get('val_accuracy', 0.0)))
+            # Manager dict values must be reassigned, not mutated in place
+            progress[trial_id] = list(progress.get(trial_id, [])) + [self.best]
+            if epoch + 1 < early_stop['grace_epochs']:
+                return
+            peers = [curve[epoch] for tid, curve in progress.items()
+                     if tid != trial_id and len(curve) > epoch]
+            if len(peers) >= early_stop['min_peers'] and self.best < statistics.median(peers):
+                self.pruned_at = epoch + 1
+                self.model.stop_training = True
+
+    started = time.perf_counter()
+    X = np.load(os.path.join(dataset_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(dataset_dir, 'y.npy'), mmap_mode='r')
+    train_idx = np.load(os.path.join(dataset_dir, 'train_idx.npy'))
+    val_idx = np.load(os.path.join(dataset_dir, 'val_idx.npy'))
+    with open(os.path.join(dataset_dir, 'meta.json')) as f:
+        meta = json.load(f)
+
+    seq_len = params.get('max_sequence_length', meta['max_sequence_length'])
+    X_train, y_train = X[train_idx, -seq_len:], y[train_idx]
+    X_val, y_val = X[val_idx, -seq_len:], y[val_idx]
+
+    tf.keras.utils.set_random_seed(seed)
+    trainer = MathAITrainer(hyperparameters=dict(params, max_sequence_length=seq_len))
+    model = trainer.build_model(meta['num_classes'])
+    median_stopping = MedianStopping()
+    history = model.fit(
+        X_train, y_train,
+        epochs=epochs,
+        batch_size=trainer.batch_size,
+        validation_data=(X_val, y_val),
+        callbacks=[
+            tf.keras.callbacks.EarlyStopping(patience=early_stop['patience'], monitor='val_loss',
+                                             restore_best_weights=True),
+            median_stopping,
+        ],
+        verbose=0
+    )
+    train_seconds = time.perf_counter() - started
+
+    val_loss, val_accuracy = model.evaluate(X_val, y_val, verbose=0)
+    model_path = os.path.join(sweep_dir, f'trial-{trial_id}.keras')
+    model.save(model_path)
+
+    return {
+        'trial_id': trial_id,
+        'params': params,
+        'status': 'pruned' if median_stopping.pruned_at else 'completed',
+        'epochs_run': len(history.history.get('loss', [])),
+        'val_accuracy': float(val_accuracy),
+        'val_loss': float(val_loss),
+        'parameters': int(model.count_params()),
+        'size_mb': sum(w.nbytes for w in model.get_weights()) / (1024 * 1024),
+        'train_seconds': train_seconds,
+        'model_path': model_path,
+        'max_sequence_length': seq_len,
+    }
+
+
+def measure_latency(results, dataset_dir, requests=50, warmup=3):
+    """Single-request latency of each trained trial, measured serially
+
+    Runs after training so trials are not timed while competing for CPU with
+    each other.
+    """
+    import tensorflow as tf
+    from utils.output_heads import CUSTOM_OBJECTS
+
+    X = np.load(os.path.join(dataset_dir, 'X.npy'), mmap_mode='r')
+    val_idx = np.load(os.path.join(dataset_dir, 'val_idx.npy'))
+    rows = np.asarray(X[val_idx[:requests]])
+    measured = {}
+    for r in results:
+        model = tf.keras.models.load_model(r['model_path'], custom_objects=CUSTOM_OBJECTS)
+        seq_len = r['max_sequence_length']
+        latencies = []
+        for i in range(len(rows) + warmup):
+            row = rows[i % len(rows):i % len(rows) + 1, -seq_len:]
+            start = time.perf_counter()
+            model(row, training=False)
+            latencies.append(time.perf_counter() - start)
+        latencies = sorted(latencies[warmup:])
+        measured[r['trial_id']] = {
+            'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+            'latency_p95_ms': latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        }
+        tf.keras.backend.clear_session()
+    return measured
+
+
+def rank_results(results):
+    """Best accuracy first, then lower latency, then smaller models"""
+    ok = [r for r in results if 'error' not in r]
+    failed = [r for r in results if 'error' in r]
+    ok.sort(key=lambda r: (-round(r['val_accuracy'], 4), r['latency_p50_ms'], r['size_mb']))
+    for rank, r in enumerate(ok, start=1):
+        r['rank'] = rank
+    return ok + failed
+
+
+def format_table(results):
+    lines = ['| rank | trial | val_acc | p50 ms | p95 ms | params | size MB | epochs | status | params |',
+             '|---:|---:|---:|---:|---:|---:|---:|---:|---|---|']
+    for r in results:
+        if 'error' in r:
+            lines.append(f"| - | {r['trial_id']} | - | - | - | - | - | - | error | {json.dumps(r['params'])} |")
+            continue
+        lines.append(
+            f"| {r['rank']} | {r['trial_id']} | {r['val_accuracy']:.4f} | {r['latency_p50_ms']:.2f} | "
+            f"{r['latency_p95_ms']:.2f} | {r['parameters']:,} | {r['size_mb']:.2f} | {r['epochs_run']} | "
+            f"{r['status']} | {json.dumps(r['params'])} |"
+        )
+    return '\n'.join(lines)
+
+
+def run_sweep(config, db_path='../database/math_tutor.db', output_root=None):
+    """Run every trial in `config` and write ranked results; returns the ranked list"""
+    model_dir = os.getenv('MODEL_PATH', 'models')
+    output_root = output_root or os.path.join(model_dir, 'sweeps')
+    seed = int(config.get('seed', os.getenv('TRAINING_SEED', 42)))
+    trials = config.get('trials') or expand_grid(config.get('grid', DEFAULT_GRID),
+                                                 config.get('max_trials'), seed)
+    workers = int(config.get('workers', 2))
+    threads = int(config.get('threads_per_worker') or max(1, (os.cpu_count() or 1) // workers))
+    epochs = int(config.get('epochs', os.getenv('TRAINING_EPOCHS', 20)))
+    early_stop = dict(DEFAULT_EARLY_STOP, **config.get('early_stop', {}))
+
+    max_len = max(t.get('max_sequence_length', int(os.getenv('MAX_SEQUENCE_LENGTH', 128))) for t in trials)
+    dataset_dir = prepare_dataset(db_path, os.path.join(output_root, 'cache'), max_len, seed)
+
+    sweep_id = f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    sweep_dir = os.path.join(output_root, sweep_id)
+    os.makedirs(sweep_dir, exist_ok=True)
+    logger.info(f"{sweep_id}: {len(trials)} trials on {workers} workers x {threads} threads")
+
+    results = []
+    with multiprocessing.get_context('spawn').Manager() as manager:
+        progress = manager.dict()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = {
+                pool.submit(run_trial, i, params, dataset_dir, sweep_dir, epochs, early_stop, progress, seed):
+                    (i, params)
+                for i, params in enumerate(trials)
+            }
+            for future in as_completed(futures):
+                trial_id, params = futures[future]
+                try:
+                    result = future.result()
+                    logger.info(f"Trial {trial_id} {result['status']} after {result['epochs_run']} epochs: "
+                                f"val_acc={result['val_accuracy']:.4f} params={result['parameters']:,}")
+                except Exception as e:
+                    logger.error(f"Trial {trial_id} failed: {e}")
+                    result = {'trial_id': trial_id, 'params': params, 'error': str(e)}
+                results.append(result)
+
+    trained = [r for r in results if 'error' not in r]
+    if trained:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            latencies = pool.submit(measure_latency, trained, dataset_dir).result()
+        for r in trained:
+            r.update(latencies[r['trial_id']])
+
+    ranked = rank_results(results)
+    with open(os.path.join(sweep_dir, 'results.json'), 'w') as f:
+        json.dump({'sweep_id': sweep_id, 'config': config, 'workers': workers,
+                   'threads_per_worker': threads, 'results': ranked}, f, indent=2)
+    table = format_table(ranked)
+    with open(os.path.join(sweep_dir, 'results.md'), 'w') as f:
+        f.write(table + '\n')
+    logger.info(f"Sweep results written to {sweep_dir}\n{table}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', help='JSON file with "grid" or "trials" plus sweep options')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads-per-worker', type=int)
+    parser.add_argument('--epochs', type=int)
+    parser.add_argument('--max-trials', type=int)
+    parser.add_argument('--db-path', default='../database/math_tutor.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    for key in ('workers', 'threads_per_worker', 'epochs', 'max_trials'):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    try:
+        run_sweep(config, db_path=args.db_path)
+    except Exception as e:
+        logger.error(f"Sweep failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
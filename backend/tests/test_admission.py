@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from utils.admission import AdmissionController, OverloadedError, RateLimitedError
+
+
+def hold_slot(controller):
+    """Take a slot on another thread; returns (release event, thread)"""
+    entered, release = threading.Event(), threading.Event()
+
+    def run():
+        with controller.slot():
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert entered.wait(5)
+    return release, thread
+
+
+def test_waiter_is_admitted_when_a_slot_frees():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5, rate=0)
+    release, thread = hold_slot(controller)
+    threading.Timer(0.05, release.set).start()
+    with controller.slot() as admitted:
+        assert admitted is True
+    thread.join()
+    stats = controller.stats()
+    assert stats['queued'] == 1 and stats['shed'] == 0 and stats['active'] == 0
+
+
+def test_queued_request_is_shed_at_its_deadline():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.1, rate=0)
+    release, thread = hold_slot(controller)
+    started = time.monotonic()
+    try:
+        with pytest.raises(OverloadedError) as info:
+            with controller.slot():
+                pass
+    finally:
+        release.set()
+        thread.join()
+    assert 0.1 <= time.monotonic() - started < 1.0
+    assert info.value.status == 503 and info.value.retry_after >= 1
+    stats = controller.stats()
+    assert stats['shed_timeout'] == 1 and stats['queue_depth'] == 0
+
+
+def test_full_queue_is_rejected_at_once_with_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5, rate=0)
+    release, thread = hold_slot(controller)
+    started = time.monotonic()
+    try:
+        with pytest.raises(OverloadedError) as info:
+            with controller.slot():
+                pass
+    finally:
+        release.set()
+        thread.join()
+    assert time.monotonic() - started < 0.5
+    assert info.value.status == 503 and info.value.retry_after >= 1
+    assert controller.stats()['shed_queue_full'] == 1
+
+
+def test_degrade_mode_admits_without_a_slot():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, rate=0, degrade=True)
+    release, thread = hold_slot(controller)
+    try:
+        with controller.slot() as admitted:
+            assert admitted is False
+    finally:
+        release.set()
+        thread.join()
+    stats = controller.stats()
+    assert stats['degraded'] == 1 and stats['active'] == 0
+
+
+def test_empty_bucket_is_rate_limited_with_retry_after():
+    controller = AdmissionController(rate=1.0, burst=2)
+    controller.check_rate('user')
+    controller.check_rate('user')
+    with pytest.raises(RateLimitedError) as info:
+        controller.check_rate('user')
+    assert info.value.status == 429 and info.value.retry_after >= 1
+    # Buckets are per user
+    controller.check_rate('other')
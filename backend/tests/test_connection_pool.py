@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.database_manager import ConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def sqlite_pool(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False),
+                          min_size=0, max_size=1, timeout=0.1, name='test')
+    yield pool
+    pool.close_all()
+
+
+def test_acquire_times_out_when_the_pool_is_full(sqlite_pool):
+    conn = sqlite_pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        sqlite_pool.acquire()
+    assert 0.1 <= time.monotonic() - started < 1.0
+    sqlite_pool.release(conn)
+    stats = sqlite_pool.stats()
+    assert stats['timeouts'] == 1 and stats['in_use'] == 0
+
+
+def test_zero_timeout_does_not_wait(sqlite_pool):
+    conn = sqlite_pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        sqlite_pool.acquire(timeout=0)
+    assert time.monotonic() - started < 0.05
+    sqlite_pool.release(conn)
+
+
+def test_release_wakes_a_waiting_borrower(sqlite_pool):
+    conn = sqlite_pool.acquire()
+    threading.Timer(0.02, sqlite_pool.release, args=(conn,)).start()
+    again = sqlite_pool.acquire(timeout=5)
+    assert again is conn
+    sqlite_pool.release(again)
+
+
+def test_release_rolls_back_uncommitted_work(sqlite_pool):
+    conn = sqlite_pool.acquire()
+    conn.execute("INSERT INTO items (name) VALUES ('left open')")
+    assert conn.in_transaction
+    sqlite_pool.release(conn)
+
+    conn = sqlite_pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    sqlite_pool.release(conn)
+
+
+def test_connection_that_fails_rollback_is_discarded():
+    class BrokenConnection:
+        closed = 0
+
+        def rollback(self):
+            raise RuntimeError('connection lost')
+
+        def close(self):
+            self.closed = 1
+
+    pool = ConnectionPool(BrokenConnection, min_size=0, max_size=1, timeout=0.1, name='test')
+    conn = pool.acquire()
+    pool.release(conn)
+    assert conn.closed
+    stats = pool.stats()
+    assert stats['discarded'] == 1 and stats['size'] == 0 and stats['idle'] == 0
+    assert pool.acquire() is not conn
@@ -0,0 +1,90 @@
+import pytest
+
+from utils.inference_executor import InferenceExecutor
+
+
+class Recorder:
+    """Collects callbacks; `spawn` records drain tasks so tests run them explicitly"""
+
+    def __init__(self):
+        self.handled, self.results, self.drops, self.tasks = [], [], [], []
+
+    def handler(self, payload):
+        self.handled.append(payload)
+        if payload == 'boom':
+            raise ValueError('model failed')
+        return payload.upper()
+
+    def on_result(self, client_id, request_ids, payload, result, error):
+        self.results.append((client_id, request_ids, result, error))
+
+    def on_drop(self, client_id, request_ids):
+        self.drops.append((client_id, request_ids))
+
+    def spawn(self, fn, *args):
+        self.tasks.append((fn, args))
+
+    def run_tasks(self):
+        while self.tasks:
+            fn, args = self.tasks.pop(0)
+            fn(*args)
+
+
+def executor(recorder, **kwargs):
+    return InferenceExecutor(recorder.handler, recorder.on_result, recorder.on_drop,
+                             spawn=recorder.spawn, **kwargs)
+
+
+def test_drop_oldest_discards_the_stalest_job():
+    recorder = Recorder()
+    ex = executor(recorder, max_pending=2, policy='drop_oldest')
+    assert [ex.submit('c', key, key, f'r-{key}') for key in ('a', 'b', 'c')] == ['queued'] * 3
+    assert recorder.drops == [('c', ['r-a'])]
+    recorder.run_tasks()
+    assert recorder.handled == ['b', 'c']
+    assert [request_ids for _, request_ids, _, _ in recorder.results] == [['r-b'], ['r-c']]
+    assert ex.stats()['dropped'] == 1
+
+
+def test_reject_refuses_the_new_job():
+    recorder = Recorder()
+    ex = executor(recorder, max_pending=2, policy='reject')
+    assert [ex.submit('c', key, key, f'r-{key}') for key in ('a', 'b', 'c')] == ['queued', 'queued', 'rejected']
+    assert recorder.drops == [('c', ['r-c'])]
+    recorder.run_tasks()
+    assert recorder.handled == ['a', 'b']
+
+
+def test_limits_are_per_client():
+    recorder = Recorder()
+    ex = executor(recorder, max_pending=1, policy='reject')
+    assert ex.submit('c1', 'a', 'a', 'r1') == 'queued'
+    assert ex.submit('c2', 'a', 'a', 'r2') == 'queued'
+    assert recorder.drops == []
+    recorder.run_tasks()
+    assert sorted(client for client, _, _, _ in recorder.results) == ['c1', 'c2']
+
+
+def test_duplicate_key_is_coalesced_into_the_queued_job():
+    recorder = Recorder()
+    ex = executor(recorder, max_pending=1, policy='reject')
+    assert ex.submit('c', 'a', 'a', 'r1') == 'queued'
+    assert ex.submit('c', 'a', 'a', 'r2') == 'coalesced'
+    recorder.run_tasks()
+    assert recorder.handled == ['a']
+    assert recorder.results == [('c', ['r1', 'r2'], 'A', None)]
+
+
+def test_handler_error_is_passed_to_on_result():
+    recorder = Recorder()
+    ex = executor(recorder)
+    ex.submit('c', 'boom', 'boom', 'r1')
+    recorder.run_tasks()
+    (_, request_ids, result, error), = recorder.results
+    assert request_ids == ['r1'] and result is None and isinstance(error, ValueError)
+    assert ex.stats()['failed'] == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        InferenceExecutor(lambda payload: payload, lambda *args: None, policy='lifo')
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import FlightTimeoutError, SingleFlight
+
+
+def start_leader(flight, key, fn):
+    """Run flight.do(key, fn) on a thread; returns (thread, outcome dict)"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = flight.do(key, fn)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_waiter_shares_the_leaders_result():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def leader_fn():
+        calls.append('leader')
+        release.wait(5)
+        return {'answer': 42}
+
+    thread, outcome = start_leader(flight, 'k', leader_fn)
+    wait_for(lambda: flight.stats()['in_flight'] == 1)
+    waiter, waited = start_leader(flight, 'k', lambda: calls.append('waiter'))
+    wait_for(lambda: flight.stats()['waiting'] == 1)
+    release.set()
+    thread.join()
+    waiter.join()
+    assert calls == ['leader']
+    assert waited['result'] is outcome['result']
+    stats = flight.stats()
+    assert stats['executions'] == 1 and stats['coalesced'] == 1 and stats['in_flight'] == 0
+
+
+def test_leader_error_reaches_waiters():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+    error = ValueError('model failed')
+
+    def leader_fn():
+        release.wait(5)
+        raise error
+
+    thread, outcome = start_leader(flight, 'k', leader_fn)
+    wait_for(lambda: flight.stats()['in_flight'] == 1)
+    waiter, waited = start_leader(flight, 'k', lambda: 'not run')
+    wait_for(lambda: flight.stats()['waiting'] == 1)
+    release.set()
+    thread.join()
+    waiter.join()
+    assert outcome['error'] is error and waited['error'] is error
+    assert flight.stats()['errors'] == 1
+    # Nothing is cached: the next call runs again
+    assert flight.do('k', lambda: 'fresh') == 'fresh'
+
+
+def test_waiter_times_out_and_the_leader_carries_on():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def leader_fn():
+        release.wait(5)
+        return 'done'
+
+    thread, outcome = start_leader(flight, 'k', leader_fn)
+    wait_for(lambda: flight.stats()['in_flight'] == 1)
+    started = time.monotonic()
+    with pytest.raises(FlightTimeoutError):
+        flight.do('k', lambda: 'not run', timeout=0.05)
+    assert time.monotonic() - started < 1.0
+    release.set()
+    thread.join()
+    assert outcome['result'] == 'done'
+    assert flight.stats()['timeouts'] == 1
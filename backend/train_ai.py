@@ -12,19 +12,26 @@ import numpy as np
 import json
 from datetime import datetime
 import tensorflow as tf
-from tensorflow.keras.models import Sequential, load_model
+from tensorflow.keras.models import load_model
 from tensorflow.keras.layers import Dense, LSTM, Embedding, Bidirectional, Dropout, Attention
 from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.metrics import confusion_matrix
 import pickle
 import re
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from utils.distillation import STUDENT_DIRNAME, distill, distillation_report
+from utils.model_bundle import BUNDLE_FILENAME, write_bundle
+from utils.output_heads import build_classifier
+from utils.streaming_eval import evaluate_in_chunks
+from utils.training_checkpoint import TrainingCheckpointer
+from utils.training_profiler import TrainingProfiler, parse_epoch_range
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,18 +43,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def default_hyperparameters():
+    """Model and training hyperparameters, overridable through the environment"""
+    return {
+        'max_sequence_length': int(os.getenv('MAX_SEQUENCE_LENGTH', 128)),
+        'embedding_dim': int(os.getenv('EMBEDDING_DIM', 128)),
+        'lstm_units': _int_list(os.getenv('LSTM_UNITS', '128,64')),
+        'lstm_dropout': [0.4, 0.3],
+        'dense_units': _int_list(os.getenv('DENSE_UNITS', '256,128')),
+        'dense_dropout': [0.3, 0.2],
+        'learning_rate': float(os.getenv('LEARNING_RATE', 0.001)),
+        'batch_size': int(os.getenv('BATCH_SIZE', 32)),
+        # 'sampled' trains with sampled softmax, for very large solution-class counts
+        'output_head': os.getenv('OUTPUT_HEAD', 'softmax'),
+        'num_sampled': int(os.getenv('SAMPLED_SOFTMAX_NEGATIVES', 64)),
+    }
+
+
 class MathAITrainer:
     """Handles the complete AI training pipeline"""
     
-    def __init__(self):
+    def __init__(self, resume_state=None, hyperparameters=None):
         self.tokenizer = None
         self.label_encoder = None
         self.model = None
-        self.max_sequence_length = int(os.getenv('MAX_SEQUENCE_LENGTH', 128))
         self.vocab_size = int(os.getenv('VOCAB_SIZE', 10000))
-        self.embedding_dim = int(os.getenv('EMBEDDING_DIM', 128))
         self.model_dir = os.getenv('MODEL_PATH', 'models')
         
+        # A resumed run keeps its training_id, seeds, hyperparameters and sample set
+        self.resume_state = resume_state
+        self.hyperparameters = default_hyperparameters()
+        self.hyperparameters.update((resume_state or {}).get('hyperparameters', {}))
+        self.hyperparameters.update(hyperparameters or {})
+        for name, value in self.hyperparameters.items():
+            setattr(self, name, value)
+        
+        if resume_state:
+            self.training_id = resume_state['training_id']
+            self.seed = resume_state['seed']
+        else:
+            self.training_id = f"train_{int(datetime.now().timestamp())}"
+            self.seed = int(os.getenv('TRAINING_SEED', 42))
+        self.sample_ids = None
+        self.epoch_history = []
+        self.profiler = TrainingProfiler(self.training_id)
+        self.checkpointer = TrainingCheckpointer.from_env(self.model_dir, self.training_id)
+        self.checkpoint_callback = None
+        self.split = None
+        self.test = None
+        self.evaluation = {}
+        
     def preprocess_text(self, text):
         """Preprocess mathematical text"""
         if not text:
@@ -90,17 +140,27 @@ class MathAITrainer:
         
         return text
     
-    def load_training_data(self, db_path):
+    def load_training_data(self, db_path, sample_ids=None):
         """Load and prepare training data from database"""
         try:
-            conn = sqlite3.connect(db_path)
-            query = """
-            SELECT id, problem_text, solution_text, mathematical_concepts 
-            FROM training_data 
-            WHERE used_in_training = FALSE AND validation_status = 'approved'
-            """
-            df = pd.read_sql_query(query, conn)
-            conn.close()
+            with self.profiler.phase('load_data'):
+                conn = sqlite3.connect(db_path)
+                query = """
+                SELECT id, problem_text, solution_text, mathematical_concepts 
+                FROM training_data 
+                WHERE used_in_training = FALSE AND validation_status = 'approved'
+                ORDER BY id
+                """
+                df = pd.read_sql_query(query, conn)
+                conn.close()
+            
+            # A resumed run must train on exactly the rows it started with
+            if sample_ids is not None:
+                df = df[df['id'].isin(sample_ids)]
+                if len(df) != len(sample_ids):
+                    logger.error(f"Cannot resume: {len(sample_ids) - len(df)} training samples "
+                                 "from the original run are no longer available")
+                    return None, None, None
             
             if len(df) < 10:
                 logger.warning(f"Insufficient training data: {len(df)} samples")
@@ -108,16 +168,18 @@ class MathAITrainer:
             
             logger.info(f"Loaded {len(df)} training samples")
             
-            # Preprocess problems and solutions
-            problems = [self.preprocess_text(problem) for problem in df['problem_text']]
-            solutions = [self.preprocess_text(solution) for solution in df['solution_text']]
-            
-            # Remove empty or invalid samples
-            valid_indices = [i for i, (p, s) in enumerate(zip(problems, solutions)) 
-                           if p and s and len(p) > 5 and len(s) > 2]
-            problems = [problems[i] for i in valid_indices]
-            solutions = [solutions[i] for i in valid_indices]
-            df = df.iloc[valid_indices]
+            with self.profiler.phase('preprocess'):
+                # Preprocess problems and solutions
+                problems = [self.preprocess_text(problem) for problem in df['problem_text']]
+                solutions = [self.preprocess_text(solution) for solution in df['solution_text']]
+                
+                # Remove empty or invalid samples
+                valid_indices = [i for i, (p, s) in enumerate(zip(problems, solutions)) 
+                               if p and s and len(p) > 5 and len(s) > 2]
+                problems = [problems[i] for i in valid_indices]
+                solutions = [solutions[i] for i in valid_indices]
+                df = df.iloc[valid_indices]
+            self.sample_ids = df['id'].tolist()
             
             logger.info(f"After cleaning: {len(problems)} valid samples")
             
@@ -130,20 +192,22 @@ class MathAITrainer:
     def prepare_data(self, problems, solutions):
         """Prepare data for training"""
         # Tokenize problems
-        self.tokenizer = Tokenizer(
-            num_words=self.vocab_size,
-            oov_token='<OOV>',
-            filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
-        )
-        self.tokenizer.fit_on_texts(problems)
-        
-        # Convert problems to sequences
-        sequences = self.tokenizer.texts_to_sequences(problems)
-        X = pad_sequences(sequences, maxlen=self.max_sequence_length)
+        with self.profiler.phase('tokenizer_fit'):
+            self.tokenizer = Tokenizer(
+                num_words=self.vocab_size,
+                oov_token='<OOV>',
+                filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+            )
+            self.tokenizer.fit_on_texts(problems)
         
-        # Encode solutions (treating each unique solution as a class)
-        self.label_encoder = LabelEncoder()
-        y = self.label_encoder.fit_transform(solutions)
+        with self.profiler.phase('vectorize'):
+            # Convert problems to sequences
+            sequences = self.tokenizer.texts_to_sequences(problems)
+            X = pad_sequences(sequences, maxlen=self.max_sequence_length)
+            
+            # Encode solutions (treating each unique solution as a class)
+            self.label_encoder = LabelEncoder()
+            y = self.label_encoder.fit_transform(solutions)
         
         logger.info(f"Vocabulary size: {len(self.tokenizer.word_index)}")
         logger.info(f"Number of classes: {len(self.label_encoder.classes_)}")
@@ -153,28 +217,31 @@ class MathAITrainer:
     
     def build_model(self, num_classes):
         """Build the neural network model"""
-        model = Sequential([
+        # Dropout lists shorter than their layer lists reuse their last rate
+        def rate(rates, i):
+            return rates[min(i, len(rates) - 1)] if rates else 0.0
+        
+        layers = [
             Embedding(
                 input_dim=self.vocab_size,
                 output_dim=self.embedding_dim,
                 input_length=self.max_sequence_length,
                 mask_zero=True
-            ),
-            Bidirectional(LSTM(128, return_sequences=True)),
-            Dropout(0.4),
-            Bidirectional(LSTM(64)),
-            Dropout(0.3),
-            Dense(256, activation='relu'),
-            Dropout(0.3),
-            Dense(128, activation='relu'),
-            Dropout(0.2),
-            Dense(num_classes, activation='softmax')
-        ])
-        
-        optimizer = Adam(learning_rate=0.001)
+            )
+        ]
+        for i, units in enumerate(self.lstm_units):
+            last = i == len(self.lstm_units) - 1
+            layers.append(Bidirectional(LSTM(units, return_sequences=not last)))
+            layers.append(Dropout(rate(self.lstm_dropout, i)))
+        for i, units in enumerate(self.dense_units):
+            layers.append(Dense(units, activation='relu'))
+            layers.append(Dropout(rate(self.dense_dropout, i)))
+        model, loss = build_classifier(layers, num_classes, self.output_head, self.num_sampled)
+        
+        optimizer = Adam(learning_rate=self.learning_rate)
         model.compile(
             optimizer=optimizer,
-            loss='sparse_categorical_crossentropy',
+            loss=loss,
             metrics=['accuracy']
         )
         
@@ -182,33 +249,60 @@ class MathAITrainer:
         
         return model
     
-    def train_model(self, X, y, validation_split=0.2):
-        """Train the model"""
+    def train_model(self, X, y, validation_split=0.2, test_split=None):
+        """Train the model
+        
+        A seeded `test_split` share is set aside first as the benchmark set.
+        Neither fit() nor its callbacks see it; `validation_split` is taken from
+        the remaining rows and drives early stopping and LR scheduling.
+        """
+        if test_split is None:
+            test_split = (self.resume_state or {}).get('test_split', float(os.getenv('TEST_SPLIT', 0.1)))
+        
         # Split data
+        X_fit, X_test, y_fit, y_test = train_test_split(
+            X, y, test_size=test_split, random_state=self.seed, stratify=y
+        )
         X_train, X_val, y_train, y_val = train_test_split(
-            X, y, test_size=validation_split, random_state=42, stratify=y
+            X_fit, y_fit, test_size=validation_split, random_state=self.seed, stratify=y_fit
         )
+        self.split = (X_train, X_val, y_train, y_val)
+        self.test = (X_test, y_test)
         
         logger.info(f"Training samples: {X_train.shape[0]}")
         logger.info(f"Validation samples: {X_val.shape[0]}")
+        logger.info(f"Test samples: {X_test.shape[0]}")
+        
+        epochs = int(os.getenv('TRAINING_EPOCHS', 100))
+        initial_epoch = self.resume_state['epoch'] if self.resume_state else 0
+        # Reseed per resume point so a resumed run does not replay epoch 0's shuffles
+        tf.keras.utils.set_random_seed(self.seed + initial_epoch)
         
         # Build model
         self.model = self.build_model(len(np.unique(y)))
+        if self.resume_state:
+            self.checkpointer.restore(self.model, self.resume_state)
+            if self.resume_state.get('fit_finished'):
+                logger.info("Resumed run had already finished fitting; skipping to evaluation")
+                self.epoch_history = self.resume_state.get('history', [])
+                return None
         
         # Callbacks
+        early_stopping = tf.keras.callbacks.EarlyStopping(
+            patience=10,
+            restore_best_weights=True,
+            monitor='val_loss',
+            verbose=1
+        )
+        reduce_lr = tf.keras.callbacks.ReduceLROnPlateau(
+            factor=0.2,
+            patience=5,
+            min_lr=1e-6,
+            verbose=1
+        )
         callbacks = [
-            tf.keras.callbacks.EarlyStopping(
-                patience=10,
-                restore_best_weights=True,
-                monitor='val_loss',
-                verbose=1
-            ),
-            tf.keras.callbacks.ReduceLROnPlateau(
-                factor=0.2,
-                patience=5,
-                min_lr=1e-6,
-                verbose=1
-            ),
+            early_stopping,
+            reduce_lr,
             tf.keras.callbacks.ModelCheckpoint(
                 filepath=os.path.join(self.model_dir, 'best_model.h5'),
                 save_best_only=True,
@@ -216,67 +310,75 @@ class MathAITrainer:
                 verbose=1
             )
         ]
+        callbacks.extend(self.profiler.keras_callbacks(
+            trace_epochs=parse_epoch_range(os.getenv('PROFILE_EPOCHS')),
+            trace_dir=os.getenv('PROFILE_DIR')
+        ))
+        # Must stay last: on resume it restores the counters of the callbacks above
+        self.checkpoint_callback = self.checkpointer.callback(
+            base_state={
+                'seed': self.seed,
+                'hyperparameters': self.hyperparameters,
+                'validation_split': validation_split,
+                'test_split': test_split,
+                'epochs': epochs,
+                'sample_ids': self.sample_ids,
+            },
+            tracked_callbacks=[early_stopping, reduce_lr],
+            resume_state=self.resume_state
+        )
+        callbacks.append(self.checkpoint_callback)
         
         # Train
-        logger.info("Starting model training...")
-        history = self.model.fit(
-            X_train, y_train,
-            epochs=int(os.getenv('TRAINING_EPOCHS', 100)),
-            batch_size=int(os.getenv('BATCH_SIZE', 32)),
-            validation_data=(X_val, y_val),
-            callbacks=callbacks,
-            verbose=1
-        )
+        if initial_epoch:
+            logger.info(f"Resuming model training from epoch {initial_epoch}...")
+        else:
+            logger.info("Starting model training...")
+        with self.profiler.phase('fit'):
+            history = self.model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                initial_epoch=initial_epoch,
+                batch_size=self.batch_size,
+                validation_data=(X_val, y_val),
+                callbacks=callbacks,
+                verbose=1
+            )
+        self.epoch_history = self.checkpoint_callback.history
         
         return history
     
     def evaluate_model(self, X, y):
-        """Evaluate model performance"""
+        """Evaluate model performance on held-out data, in fixed-size chunks"""
         if self.model is None:
             return None
         
-        # Predict
-        y_pred = self.model.predict(X, verbose=0)
-        y_pred_classes = np.argmax(y_pred, axis=1)
-        
-        # Calculate metrics
-        accuracy = accuracy_score(y, y_pred_classes)
-        
-        # Detailed classification report
-        if len(np.unique(y)) > 1:
-            try:
-                report = classification_report(y, y_pred_classes, 
-                                             target_names=[str(cls) for cls in self.label_encoder.classes_], 
-                                             output_dict=True)
-                logger.info(f"Overall accuracy: {accuracy:.4f}")
-                logger.info(f"Precision: {report['weighted avg']['precision']:.4f}")
-                logger.info(f"Recall: {report['weighted avg']['recall']:.4f}")
-                logger.info(f"F1-score: {report['weighted avg']['f1-score']:.4f}")
-            except:
-                logger.info(f"Accuracy: {accuracy:.4f}")
-        
-        return accuracy
+        self.evaluation = evaluate_in_chunks(
+            self.model, X, y,
+            num_classes=len(self.label_encoder.classes_),
+            chunk_size=int(os.getenv('EVAL_CHUNK_SIZE', 1024)),
+            from_logits=self.output_head == 'sampled',
+            latency_requests=int(os.getenv('EVAL_LATENCY_REQUESTS', 200))
+        )
+        
+        logger.info(f"Held-out samples: {self.evaluation['samples']}")
+        logger.info(f"Overall accuracy: {self.evaluation['accuracy']:.4f}")
+        logger.info(f"Precision: {self.evaluation['precision']:.4f}")
+        logger.info(f"Recall: {self.evaluation['recall']:.4f}")
+        logger.info(f"F1-score: {self.evaluation['f1_score']:.4f}")
+        if 'latency_p50_ms' in self.evaluation:
+            logger.info(f"Inference latency per row: p50 {self.evaluation['latency_p50_ms']:.2f} ms, "
+                        f"p99 {self.evaluation['latency_p99_ms']:.2f} ms")
+        
+        return self.evaluation['accuracy']
     
     def save_model(self):
         """Save model and artifacts"""
         os.makedirs(self.model_dir, exist_ok=True)
         
-        # Save model
-        model_path = os.path.join(self.model_dir, 'math_model.h5')
-        self.model.save(model_path)
-        logger.info(f"Model saved to {model_path}")
-        
-        # Save tokenizer
-        tokenizer_path = os.path.join(self.model_dir, 'tokenizer.pkl')
-        with open(tokenizer_path, 'wb') as f:
-            pickle.dump(self.tokenizer, f)
-        logger.info(f"Tokenizer saved to {tokenizer_path}")
-        
-        # Save label encoder
-        label_encoder_path = os.path.join(self.model_dir, 'label_encoder.pkl')
-        with open(label_encoder_path, 'wb') as f:
-            pickle.dump(self.label_encoder, f)
-        logger.info(f"Label encoder saved to {label_encoder_path}")
+        # Legacy h5/pickle artifacts are only written when explicitly requested
+        if os.getenv('SAVE_LEGACY_ARTIFACTS', 'false').lower() == 'true':
+            self.save_legacy_artifacts()
         
         # Save model config
         config = {
@@ -284,6 +386,9 @@ class MathAITrainer:
             'vocab_size': self.vocab_size,
             'embedding_dim': self.embedding_dim,
             'model_architecture': 'Bidirectional_LSTM',
+            'output_head': self.output_head,
+            'output_activation': 'logits' if self.output_head == 'sampled' else 'softmax',
+            'hyperparameters': self.hyperparameters,
             'training_date': datetime.now().isoformat(),
             'num_classes': len(self.label_encoder.classes_),
             'vocabulary_size': len(self.tokenizer.word_index)
@@ -294,18 +399,111 @@ class MathAITrainer:
             json.dump(config, f, indent=2)
         logger.info(f"Model config saved to {config_path}")
         
+        # Save weights, vocabulary, labels and config as a single bundle
+        write_bundle(os.path.join(self.model_dir, BUNDLE_FILENAME),
+                     self.model, self.tokenizer, self.label_encoder, config)
+        
         # Save training report
         report = {
             'training_completed': datetime.now().isoformat(),
             'num_samples': X.shape[0] if hasattr(self, 'X') else 0,
             'num_classes': len(self.label_encoder.classes_),
-            'vocabulary_size': len(self.tokenizer.word_index)
+            'vocabulary_size': len(self.tokenizer.word_index),
+            'evaluation': self.evaluation,
+            'profile': 'training_profile.json'
         }
         
         report_path = os.path.join(self.model_dir, 'training_report.json')
         with open(report_path, 'w') as f:
             json.dump(report, f, indent=2)
     
+    def distill_student(self):
+        """Distill the trained model into a small student saved as an alternate serving bundle"""
+        X_train, X_val, y_train, y_val = self.split
+        teacher_logits = self.output_head == 'sampled'
+        architecture = os.getenv('STUDENT_ARCHITECTURE', 'conv1d')
+        temperature = float(os.getenv('DISTILL_TEMPERATURE', 4.0))
+        alpha = float(os.getenv('DISTILL_ALPHA', 0.1))
+        # Sized from the teacher by default, so a small tuned teacher gets a smaller student
+        embedding_dim = int(os.getenv('STUDENT_EMBEDDING_DIM', max(8, self.embedding_dim // 2)))
+        width = int(os.getenv('STUDENT_WIDTH', max(16, self.dense_units[-1])))
+        
+        logger.info(f"Distilling {architecture} student (T={temperature}, alpha={alpha}, "
+                    f"embedding_dim={embedding_dim}, width={width})...")
+        student = distill(
+            self.model, X_train, y_train, X_val, y_val,
+            num_classes=len(self.label_encoder.classes_),
+            vocab_size=self.vocab_size,
+            teacher_logits=teacher_logits,
+            architecture=architecture,
+            epochs=int(os.getenv('STUDENT_EPOCHS', 30)),
+            batch_size=self.batch_size,
+            temperature=temperature,
+            alpha=alpha,
+            learning_rate=self.learning_rate,
+            embedding_dim=embedding_dim,
+            width=width
+        )
+        
+        # Both models were early-stopped on X_val, so score them on the seeded test split
+        # that neither fit() saw
+        X_test, y_test = self.test
+        report = distillation_report(self.model, student, X_test, y_test,
+                                     len(self.label_encoder.classes_), teacher_logits,
+                                     requests=int(os.getenv('DISTILL_BENCHMARK_REQUESTS', 200)))
+        report.update({
+            'training_id': self.training_id,
+            'architecture': architecture,
+            'temperature': temperature,
+            'alpha': alpha,
+            'embedding_dim': embedding_dim,
+            'width': width,
+            'created_at': datetime.now().isoformat(),
+        })
+        
+        student_dir = os.path.join(self.model_dir, STUDENT_DIRNAME)
+        config = {
+            'max_sequence_length': self.max_sequence_length,
+            'vocab_size': self.vocab_size,
+            'embedding_dim': student.layers[0].output_dim,
+            'model_architecture': f'{architecture}_student',
+            'output_head': 'softmax',
+            'output_activation': 'logits',
+            'distilled_from': self.training_id,
+            'training_date': datetime.now().isoformat(),
+            'num_classes': len(self.label_encoder.classes_),
+            'vocabulary_size': len(self.tokenizer.word_index)
+        }
+        write_bundle(os.path.join(student_dir, BUNDLE_FILENAME),
+                     student, self.tokenizer, self.label_encoder, config)
+        report_path = os.path.join(student_dir, 'distillation_report.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        logger.info(f"Student accuracy {report['student']['accuracy']:.4f} vs teacher "
+                    f"{report['teacher']['accuracy']:.4f} (loss {report['accuracy_loss']:+.4f})")
+        logger.info(f"Latency p50 {report['teacher']['p50_ms']:.2f} -> {report['student']['p50_ms']:.2f} ms "
+                    f"({report['p50_speedup']:.1f}x), p99 {report['teacher']['p99_ms']:.2f} -> "
+                    f"{report['student']['p99_ms']:.2f} ms ({report['p99_speedup']:.1f}x)")
+        logger.info(f"Distillation report saved to {report_path}")
+        return report
+    
+    def save_legacy_artifacts(self):
+        """Save the h5 model and pickled tokenizer/label encoder"""
+        model_path = os.path.join(self.model_dir, 'math_model.h5')
+        self.model.save(model_path)
+        logger.info(f"Model saved to {model_path}")
+        
+        tokenizer_path = os.path.join(self.model_dir, 'tokenizer.pkl')
+        with open(tokenizer_path, 'wb') as f:
+            pickle.dump(self.tokenizer, f)
+        logger.info(f"Tokenizer saved to {tokenizer_path}")
+        
+        label_encoder_path = os.path.join(self.model_dir, 'label_encoder.pkl')
+        with open(label_encoder_path, 'wb') as f:
+            pickle.dump(self.label_encoder, f)
+        logger.info(f"Label encoder saved to {label_encoder_path}")
+    
     def update_database(self, db_path, df, accuracy, training_duration):
         """Update database after training"""
         try:
@@ -324,12 +522,32 @@ class MathAITrainer:
                             VALUES (?, ?, ?, ?, ?)''',
                             ('math_solver', '2.0.0', accuracy, len(df), training_duration))
             
-            # Update training progress table
+            # Update training progress table, including epochs from before a resume
+            cursor.executemany('''INSERT INTO training_progress 
+                            (training_id, epoch, accuracy, loss, val_accuracy, val_loss)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                            [(self.training_id, entry['epoch'], entry.get('accuracy'), entry.get('loss'),
+                              entry.get('val_accuracy'), entry.get('val_loss'))
+                             for entry in self.epoch_history])
             cursor.execute('''INSERT INTO training_progress 
                             (training_id, epoch, accuracy, loss, val_accuracy, val_loss)
                             VALUES (?, ?, ?, ?, ?, ?)''',
-                            (f"train_{int(datetime.now().timestamp())}", 
-                             'final', accuracy, 0, accuracy, 0))
+                            (self.training_id, 'final', accuracy, 0, accuracy, 0))
+            
+            # Record a training summary row so regressions can be tracked over time
+            self._ensure_metric_columns(cursor)
+            # inference_time is the median single-row latency in milliseconds
+            evaluation = self.evaluation
+            cursor.execute('''INSERT INTO model_metrics
+                            (model_version, test_accuracy, precision, recall, f1_score,
+                             inference_time, inference_p99_ms, evaluated_samples,
+                             training_duration, peak_memory_mb, phase_timings)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                            ('2.0.0', accuracy, evaluation.get('precision'), evaluation.get('recall'),
+                             evaluation.get('f1_score'), evaluation.get('latency_p50_ms'),
+                             evaluation.get('latency_p99_ms'), evaluation.get('samples'),
+                             training_duration, self.profiler.report()['peak_rss_mb'],
+                             json.dumps(self.profiler.phase_seconds())))
             
             conn.commit()
             conn.close()
@@ -339,20 +557,50 @@ class MathAITrainer:
         except Exception as e:
             logger.error(f"Error updating database: {str(e)}")
             raise
+    
+    @staticmethod
+    def _ensure_metric_columns(cursor):
+        """Add the training summary columns to model_metrics on older databases"""
+        cursor.execute("PRAGMA table_info(model_metrics)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for column, column_type in (('training_duration', 'REAL'),
+                                    ('peak_memory_mb', 'REAL'),
+                                    ('phase_timings', 'TEXT'),
+                                    ('inference_p99_ms', 'REAL'),
+                                    ('evaluated_samples', 'INTEGER')):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE model_metrics ADD COLUMN {column} {column_type}")
 
-def train_ai_model():
-    """Main training function"""
+def train_ai_model(resume=None, distill=False):
+    """Main training function
+    
+    `resume` is a training_id to continue, or 'latest' for the most recent
+    unfinished run. `distill` also trains and saves the lightweight student.
+    """
     try:
         logger.info("🚀 Starting AI model training...")
         logger.info("=" * 50)
-        start_time = datetime.now()
+        
+        resume_state = None
+        if resume:
+            checkpoint_root = TrainingCheckpointer.default_root(os.getenv('MODEL_PATH', 'models'))
+            resume_state = TrainingCheckpointer.find_resumable(
+                checkpoint_root, None if resume == 'latest' else resume
+            )
+            if resume_state is None:
+                logger.error(f"No resumable training run found for '{resume}' in {checkpoint_root}")
+                return False
+            logger.info(f"♻️  Resuming {resume_state['training_id']} from epoch {resume_state['epoch']}")
         
         # Initialize trainer
-        trainer = MathAITrainer()
+        trainer = MathAITrainer(resume_state=resume_state)
+        profiler = trainer.profiler
         
         # Load data
         db_path = '../database/math_tutor.db'
-        problems, solutions, df = trainer.load_training_data(db_path)
+        problems, solutions, df = trainer.load_training_data(
+            db_path, sample_ids=resume_state['sample_ids'] if resume_state else None
+        )
         
         if problems is None or len(problems) == 0:
             logger.error("No valid training data available")
@@ -369,20 +617,42 @@ def train_ai_model():
         history = trainer.train_model(X, y)
         
         # Evaluate model
-        logger.info("📈 Evaluating model...")
-        accuracy = trainer.evaluate_model(X, y)
+        # Score only the test split: the training rows would flatter the metrics, and the
+        # validation rows picked the restored weights
+        logger.info("📈 Evaluating model on held-out data...")
+        X_test, y_test = trainer.test
+        with profiler.phase('evaluate'):
+            accuracy = trainer.evaluate_model(X_test, y_test)
         logger.info(f"✅ Model accuracy: {accuracy:.4f}")
         
         # Save model
         logger.info("💾 Saving model...")
-        trainer.save_model()
+        with profiler.phase('save_model'):
+            trainer.save_model()
+        
+        if distill:
+            logger.info("🧪 Distilling student model...")
+            with profiler.phase('distill'):
+                trainer.distill_student()
         
         # Update database
-        training_duration = (datetime.now() - start_time).total_seconds()
-        trainer.update_database(db_path, df, accuracy, training_duration)
+        training_duration = profiler.total_seconds
+        with profiler.phase('update_database'):
+            trainer.update_database(db_path, df, accuracy, training_duration)
+        
+        if trainer.checkpoint_callback is not None:
+            trainer.checkpointer.mark_completed(trainer.checkpoint_callback.state(
+                trainer.epoch_history[-1]['epoch'] if trainer.epoch_history else 0, fit_finished=True
+            ))
+        elif resume_state:
+            trainer.checkpointer.mark_completed(resume_state)
+        
+        profiler.save(trainer.model_dir)
         
         logger.info("🎉 Model training completed successfully!")
         logger.info(f"⏱️  Training duration: {training_duration:.2f} seconds")
+        for name, seconds in profiler.phase_seconds().items():
+            logger.info(f"   {name:<16} {seconds:>10.2f}s")
         
         return True
         
@@ -393,7 +663,18 @@ def train_ai_model():
         return False
 
 if __name__ == '__main__':
-    success = train_ai_model()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train the Math Mentor AI model')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='TRAINING_ID',
+                        help='resume an interrupted run from its latest checkpoint '
+                             '(defaults to the most recent unfinished run)')
+    parser.add_argument('--distill', action='store_true',
+                        default=os.getenv('DISTILL_STUDENT', 'false').lower() == 'true',
+                        help='also distill a lightweight student model for low-latency serving')
+    args = parser.parse_args()
+    
+    success = train_ai_model(resume=args.resume, distill=args.distill)
     if success:
         logger.info("✅ Training script completed successfully")
     else:
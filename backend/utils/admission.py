@@ -0,0 +1,164 @@
+"""
+Admission control for model inference: concurrency limit, bounded wait queue, per-user rate limits
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Optional
+
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionError(Exception):
+    """A request turned away before running; `status` and `retry_after` go into the response"""
+
+    status = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitedError(AdmissionError):
+    """The user's token bucket is empty"""
+
+    status = 429
+
+
+class OverloadedError(AdmissionError):
+    """Every slot is busy and the wait queue is full, or the wait ran past its deadline"""
+
+    status = 503
+
+
+class AdmissionController:
+    """Bounds how much inference runs at once and how long requests wait for it
+
+    At most `max_concurrent` requests hold a slot; up to `max_queue` more
+    wait for one, each for at most `queue_timeout` seconds. Anything beyond
+    that is shed at once with OverloadedError, or, with `degrade`, admitted
+    in degraded mode (the caller answers without the model). Each user also
+    has a token bucket refilling at `rate` requests per second up to `burst`;
+    an empty bucket raises RateLimitedError. A `rate` of 0 disables it.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 2.0,
+                 rate: float = 1.0, burst: int = 10, degrade: bool = False):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.degrade = degrade
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # An idle bucket is full again after burst / rate seconds, so it can simply expire
+        self._buckets = TTLCache(maxsize=100000, ttl=self.burst / rate if rate > 0 else 1.0)
+        self._service_seconds = 0.1
+        self._stats = {'admitted': 0, 'queued': 0, 'degraded': 0, 'shed_queue_full': 0,
+                       'shed_timeout': 0, 'rate_limited': 0, 'total_wait_ms': 0.0}
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        return cls(
+            max_concurrent=int(os.getenv('ADMISSION_MAX_CONCURRENT', 8)),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 32)),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 2.0)),
+            rate=float(os.getenv('RATE_LIMIT_PER_MINUTE', 60)) / 60.0,
+            burst=int(os.getenv('RATE_LIMIT_BURST', 10)),
+            degrade=os.getenv('ADMISSION_DEGRADE', 'false').lower() == 'true',
+        )
+
+    def check_rate(self, key: Optional[Hashable]):
+        """Take one token from `key`'s bucket; raises RateLimitedError when it is empty"""
+        if self.rate <= 0 or key is None:
+            return
+        now = time.monotonic()
+        with self._cond:
+            tokens, last = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens < 1.0:
+                self._buckets.set(key, (tokens, now))
+                self._stats['rate_limited'] += 1
+                raise RateLimitedError("Too many requests", math.ceil((1.0 - tokens) / self.rate))
+            self._buckets.set(key, (tokens - 1.0, now))
+
+    def _retry_after(self) -> int:
+        # Roughly how long the current backlog takes to drain
+        backlog = (self._active + self._waiting) / self.max_concurrent
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    def _shed(self, reason: str, message: str) -> bool:
+        """Count a shed request; False (run it degraded) in degrade mode, otherwise raises. Call with _cond held"""
+        self._stats[reason] += 1
+        if self.degrade:
+            self._stats['degraded'] += 1
+            return False
+        raise OverloadedError(message, self._retry_after())
+
+    @contextmanager
+    def slot(self):
+        """Hold an inference slot for the with-block; yields False when admitted degraded"""
+        started = time.monotonic()
+        with self._cond:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    admitted = self._shed('shed_queue_full', "Server is busy")
+                else:
+                    self._waiting += 1
+                    self._stats['queued'] += 1
+                    deadline = started + self.queue_timeout
+                    try:
+                        while self._active >= self.max_concurrent:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                    admitted = (self._active < self.max_concurrent or
+                                self._shed('shed_timeout', "Timed out waiting for a free worker"))
+            else:
+                admitted = True
+            if admitted:
+                self._active += 1
+                self._stats['admitted'] += 1
+                self._stats['total_wait_ms'] += (time.monotonic() - started) * 1000
+        if not admitted:
+            yield False
+            return
+        run_started = time.monotonic()
+        try:
+            yield True
+        finally:
+            elapsed = time.monotonic() - run_started
+            with self._cond:
+                self._active -= 1
+                # Smoothed service time, for Retry-After estimates
+                self._service_seconds = 0.9 * self._service_seconds + 0.1 * elapsed
+                self._cond.notify()
+
+    @contextmanager
+    def admit(self, key: Optional[Hashable]):
+        """check_rate(key), then slot()"""
+        self.check_rate(key)
+        with self.slot() as admitted:
+            yield admitted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats, active=self._active, queue_depth=self._waiting)
+            service_ms = self._service_seconds * 1000
+        admitted = stats['admitted']
+        stats['avg_wait_ms'] = round(stats.pop('total_wait_ms') / admitted, 2) if admitted else 0.0
+        stats['shed'] = stats['shed_queue_full'] + stats['shed_timeout']
+        return dict(stats, avg_service_ms=round(service_ms, 2), max_concurrent=self.max_concurrent,
+                    max_queue=self.max_queue, queue_timeout=self.queue_timeout,
+                    rate_per_minute=self.rate * 60, burst=self.burst, degrade=self.degrade)
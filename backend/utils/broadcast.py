@@ -0,0 +1,177 @@
+"""
+Coalescing and rate limiting for high-volume broadcast events
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_ANY_ROOM = object()
+
+
+class Broadcaster:
+    """Batches and throttles events before they are published
+
+    digest(event, item) buffers `item`; each `digest_interval` seconds the
+    buffer goes out as one `event` message: {count, items (the latest
+    `max_items`), first_at, last_at}. throttle(event, payload) publishes at
+    most once per `min_interval` per event and room; payloads arriving in
+    between replace each other and the latest is sent when the interval
+    ends, so the final update is never lost. publish() passes straight
+    through, after any throttled update it would otherwise overtake.
+
+    An interval of 0 publishes every call immediately.
+    """
+
+    def __init__(self, publish: Callable[[str, Any, Optional[str]], None], digest_interval: float = 1.0,
+                 max_items: int = 20, min_interval: float = 0.5):
+        self._publish = publish
+        self.digest_interval = digest_interval
+        self.max_items = max(1, max_items)
+        self.min_interval = min_interval
+        self._digests: Dict[tuple, Dict[str, Any]] = {}
+        self._throttled: Dict[tuple, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls, publish: Callable[[str, Any, Optional[str]], None]) -> 'Broadcaster':
+        max_hz = float(os.getenv('TRAINING_PROGRESS_MAX_HZ', 2))
+        return cls(
+            publish,
+            digest_interval=float(os.getenv('BROADCAST_DIGEST_SECONDS', 1.0)),
+            max_items=int(os.getenv('BROADCAST_DIGEST_MAX_ITEMS', 20)),
+            min_interval=1.0 / max_hz if max_hz > 0 else 0.0,
+        )
+
+    def _count(self, event: str, name: str):
+        counts = self._stats.setdefault(event, {'submitted': 0, 'published': 0})
+        counts[name] += 1
+
+    def _send(self, event: str, payload: Any, room: Optional[str]):
+        with self._cond:
+            self._count(event, 'published')
+        try:
+            self._publish(event, payload, room)
+        except Exception as e:
+            logger.error(f"Failed to publish {event}: {e}")
+
+    def _ensure_started(self):
+        # Per process, and lazily, so forked workers each get their own flusher
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='broadcast-flush', daemon=True)
+            self._thread.start()
+
+    def publish(self, event: str, payload: Any, room: Optional[str] = None):
+        with self._cond:
+            self._count(event, 'submitted')
+            pending = self._take_throttled(time.monotonic(), room, force=True)
+        for args in pending:
+            self._send(*args)
+        self._send(event, payload, room)
+
+    def digest(self, event: str, item: Any, room: Optional[str] = None):
+        now = datetime.now().isoformat()
+        if self.digest_interval <= 0:
+            with self._cond:
+                self._count(event, 'submitted')
+            self._send(event, {'count': 1, 'items': [item], 'first_at': now, 'last_at': now}, room)
+            return
+        with self._cond:
+            self._count(event, 'submitted')
+            buffer = self._digests.get((event, room))
+            if buffer is None:
+                buffer = self._digests[(event, room)] = {
+                    'count': 0, 'items': deque(maxlen=self.max_items), 'first_at': now,
+                    'due': time.monotonic() + self.digest_interval}
+            buffer['count'] += 1
+            buffer['items'].append(item)
+            buffer['last_at'] = now
+            self._ensure_started()
+            self._cond.notify()
+
+    def throttle(self, event: str, payload: Any, room: Optional[str] = None):
+        now = time.monotonic()
+        with self._cond:
+            self._count(event, 'submitted')
+            entry = self._throttled.setdefault((event, room), {'last_sent': None, 'payload': None})
+            if entry['last_sent'] is None or now - entry['last_sent'] >= self.min_interval:
+                entry['last_sent'] = now
+                entry['payload'] = None
+                send = True
+            else:
+                # Callers may keep mutating their dict (e.g. training status); keep a snapshot
+                entry['payload'] = dict(payload) if isinstance(payload, dict) else payload
+                send = False
+                self._ensure_started()
+                self._cond.notify()
+        if send:
+            self._send(event, payload, room)
+
+    def _take_throttled(self, now: float, room: Any = _ANY_ROOM, force: bool = False) -> list:
+        """Pending throttled payloads whose interval is over (all of them with `force`)"""
+        due = []
+        for (event, event_room), entry in self._throttled.items():
+            if entry['payload'] is None or (room is not _ANY_ROOM and event_room != room):
+                continue
+            if not force and now - entry['last_sent'] < self.min_interval:
+                continue
+            due.append((event, entry['payload'], event_room))
+            entry['payload'] = None
+            entry['last_sent'] = now
+        return due
+
+    def _take_due(self, now: float, force: bool = False) -> list:
+        due = self._take_throttled(now, force=force)
+        for key in [key for key, buffer in self._digests.items() if force or buffer['due'] <= now]:
+            buffer = self._digests.pop(key)
+            event, room = key
+            due.append((event, {'count': buffer['count'], 'items': list(buffer['items']),
+                                'first_at': buffer['first_at'], 'last_at': buffer['last_at']}, room))
+        return due
+
+    def _next_wake(self, now: float) -> Optional[float]:
+        times = [buffer['due'] for buffer in self._digests.values()]
+        times += [entry['last_sent'] + self.min_interval for entry in self._throttled.values()
+                  if entry['payload'] is not None]
+        return max(0.0, min(times) - now) if times else None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = self._take_due(now)
+                if not due:
+                    self._cond.wait(self._next_wake(now))
+                    continue
+            for args in due:
+                self._send(*args)
+
+    def flush(self):
+        """Publish everything buffered now"""
+        with self._cond:
+            due = self._take_due(time.monotonic(), force=True)
+        for args in due:
+            self._send(*args)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {event: dict(counts) for event, counts in self._stats.items()}
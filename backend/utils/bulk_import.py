@@ -0,0 +1,247 @@
+"""
+Streaming bulk import of training data from JSON, JSONL and CSV files
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('json', 'jsonl', 'csv')
+DIFFICULTIES = ('Beginner', 'Intermediate', 'Advanced')
+STATUSES = ('pending', 'approved', 'rejected')
+COLUMNS = ('problem_text', 'solution_text', 'step_by_step_explanation', 'mathematical_concepts',
+           'difficulty_level', 'contributed_by', 'user_id', 'validation_status')
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(filename: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot tell the format of '{filename}'; expected one of {', '.join(FORMATS)}")
+    return extension
+
+
+def iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError("JSON input must be an array of records")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Only accept an element once a delimiter follows it: a number cut
+                # off at the end of the buffer may continue in the next chunk
+                if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]'):
+                    yield item
+                    position = end
+                    continue
+        elif eof:
+            if started:
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_records(f: TextIO, fmt: str) -> Iterator[Any]:
+    """Raw records from an open text file, one at a time"""
+    if fmt == 'jsonl':
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    # Reported as an invalid record rather than aborting the import
+                    yield ValueError(f"malformed JSON: {e}")
+    elif fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        yield from iter_json_array(f)
+
+
+def _concepts(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if not value:
+        return []
+    value = str(value).strip()
+    if value.startswith('['):
+        return _concepts(json.loads(value))
+    return [v.strip() for v in re.split(r'[;,|]', value) if v.strip()]
+
+
+def normalize_record(raw: Any, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a training_data or problems.json style record onto training_data columns
+
+    Raises ValueError with the reason when the record cannot be imported.
+    """
+    if isinstance(raw, ValueError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("record is not an object")
+
+    problem = (raw.get('problem_text') or raw.get('description') or '').strip()
+    solution = (raw.get('solution_text') or raw.get('final_answer') or '').strip()
+    steps = raw.get('step_by_step_explanation') or raw.get('solution_steps') or ''
+    if isinstance(steps, list):
+        steps = ' '.join(str(step) for step in steps)
+    difficulty = raw.get('difficulty_level') or raw.get('difficulty') or defaults['difficulty_level']
+    status = raw.get('validation_status') or defaults['validation_status']
+
+    if not problem or not solution:
+        raise ValueError("problem_text and solution_text are required")
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"invalid difficulty_level '{difficulty}'")
+    if status not in STATUSES:
+        raise ValueError(f"invalid validation_status '{status}'")
+
+    return {
+        'problem_text': problem,
+        'solution_text': solution,
+        'step_by_step_explanation': str(steps).strip(),
+        'mathematical_concepts': json.dumps(_concepts(raw.get('mathematical_concepts'))),
+        'difficulty_level': difficulty,
+        'contributed_by': raw.get('contributed_by') or defaults['contributed_by'],
+        'user_id': defaults.get('user_id'),
+        'validation_status': status,
+    }
+
+
+def dedupe_key(problem: str, solution: str) -> int:
+    """64-bit fingerprint of a problem/solution pair, ignoring case and spacing"""
+    text = ' '.join(problem.lower().split()) + '\x1f' + ' '.join(solution.lower().split())
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class BulkImporter:
+    """Validate, deduplicate and insert training data in batches, in one transaction
+
+    With `strict`, records that fail ModelValidator's quality checks are
+    rejected; otherwise only structurally invalid records are. If
+    `user_stats` is given, the importing user's contribution count is
+    updated in the same transaction.
+    """
+
+    def __init__(self, db_manager, batch_size: int = 5000, strict: bool = False, user_stats=None):
+        self.db_manager = db_manager
+        self.batch_size = max(1, batch_size)
+        self.strict = strict
+        self.user_stats = user_stats
+        self.is_postgres = getattr(db_manager, 'is_postgres', False)
+
+    def _existing_keys(self, cursor) -> set:
+        cursor.execute("SELECT problem_text, solution_text FROM training_data")
+        keys = set()
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return keys
+            keys.update(dedupe_key(problem, solution) for problem, solution in rows)
+
+    def _insert_sqlite(self, cursor, rows: List[tuple]):
+        placeholders = ', '.join(['?'] * len(COLUMNS))
+        cursor.executemany(f"INSERT INTO training_data ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def _insert_postgres(self, cursor, rows: List[tuple]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(r'\N' if value is None else value for value in row)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY training_data ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+
+    def run(self, f: TextIO, fmt: str, contributed_by: str = 'Bulk Import', user_id: Optional[int] = None,
+            validation_status: str = 'pending', difficulty_level: str = 'Intermediate') -> Dict[str, Any]:
+        """Import every record in `f`; returns counts, timing and a sample of rejections"""
+        defaults = {'contributed_by': contributed_by, 'user_id': user_id,
+                    'validation_status': validation_status, 'difficulty_level': difficulty_level}
+        summary = {'format': fmt, 'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+        insert = self._insert_postgres if self.is_postgres else self._insert_sqlite
+        if self.strict:
+            # Imported here so the app still starts without numpy when strict imports aren't used
+            from utils.model_validator import ModelValidator
+        start = time.perf_counter()
+
+        def reject(line: int, reason: str):
+            summary['invalid'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'record': line, 'error': reason})
+
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            seen = self._existing_keys(cursor)
+            batch: List[tuple] = []
+            try:
+                for index, raw in enumerate(iter_records(f, fmt), start=1):
+                    summary['read'] += 1
+                    try:
+                        record = normalize_record(raw, defaults)
+                    except (ValueError, TypeError) as e:
+                        reject(index, str(e))
+                        continue
+                    if self.strict:
+                        valid, issues = ModelValidator.validate_training_data(
+                            record['problem_text'], record['solution_text'])
+                        if not valid:
+                            reject(index, '; '.join(issues))
+                            continue
+                    key = dedupe_key(record['problem_text'], record['solution_text'])
+                    if key in seen:
+                        summary['duplicates'] += 1
+                        continue
+                    seen.add(key)
+                    batch.append(tuple(record[column] for column in COLUMNS))
+                    if len(batch) >= self.batch_size:
+                        insert(cursor, batch)
+                        summary['inserted'] += len(batch)
+                        batch = []
+                if batch:
+                    insert(cursor, batch)
+                    summary['inserted'] += len(batch)
+                if self.user_stats is not None:
+                    self.user_stats.record_contributions(cursor, user_id, summary['inserted'])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        summary['rows_per_second'] = round(summary['read'] / summary['seconds']) if summary['seconds'] else 0
+        logger.info(f"Imported {summary['inserted']} of {summary['read']} records "
+                    f"({summary['duplicates']} duplicates, {summary['invalid']} invalid) "
+                    f"in {summary['seconds']:.1f}s")
+        return summary
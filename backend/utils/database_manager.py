@@ -1,59 +1,514 @@
+import itertools
+import logging
 import os
+import re
 import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
 import psycopg2
+import psycopg2.extensions
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+from utils.metrics import FAST_BUCKETS, registry
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
+DB_QUERY_SECONDS = registry.histogram('db_query_seconds', 'Time to execute one SQL statement',
+                                      ['backend'], FAST_BUCKETS)
+DB_ACQUIRE_SECONDS = registry.histogram('db_connection_acquire_seconds',
+                                        'Time to check a connection out of the pool, including waiting and connecting',
+                                        ['pool'], FAST_BUCKETS)
+DB_HELD_SECONDS = registry.histogram('db_connection_held_seconds',
+                                     'Time a connection stays checked out before returning to the pool',
+                                     ['pool'], FAST_BUCKETS)
+_SQLITE_QUERY_SECONDS = DB_QUERY_SECONDS.labels('sqlite')
+_POSTGRES_QUERY_SECONDS = DB_QUERY_SECONDS.labels('postgresql')
+
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+@lru_cache(maxsize=512)
+def _to_sqlite_paramstyle(sql):
+    """Rewrite psycopg2-style %s placeholders (and %% escapes) for sqlite3"""
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else '?', sql)
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    """Cursor accepting the %s placeholders app.py writes for PostgreSQL"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(_to_sqlite_paramstyle(sql), parameters)
+        finally:
+            _SQLITE_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(_to_sqlite_paramstyle(sql), seq_of_parameters)
+        finally:
+            _SQLITE_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+
+class SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=SQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor recording statement execution time"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _POSTGRES_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _POSTGRES_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+
+def sqlite_pragmas_from_env():
+    """Connection pragmas for the SQLite fallback; SQLITE_TUNED=false keeps SQLite's defaults"""
+    if os.getenv('SQLITE_TUNED', 'true').lower() != 'true':
+        return {}
+    return {
+        # WAL lets readers proceed while a writer commits; NORMAL only fsyncs at checkpoints
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE_MB', 256)) * 1024 * 1024,
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'temp_store': 'MEMORY',
+    }
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class PooledConnection:
+    """Connection proxy whose close() hands the connection back to its pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._borrowed_at = time.perf_counter()
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+            self._pool.held_seconds.observe(time.perf_counter() - self._borrowed_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of DB-API connections
+
+    Connections are lent to one thread at a time, so SQLite handles can be
+    shared across request threads safely. Idle connections are reused most
+    recently used first and pinged before reuse once idle longer than
+    `ping_after` seconds.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, ping_after=30.0, name='primary'):
+        self._connect = connect
+        self.name = name
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._warmed = False
+        self._cond = threading.Condition()
+        self._stats = {'checkouts': 0, 'connects': 0, 'waits': 0, 'timeouts': 0,
+                       'wait_seconds': 0.0, 'health_check_failures': 0, 'discarded': 0}
+        self.acquire_seconds = DB_ACQUIRE_SECONDS.labels(name)
+        self.held_seconds = DB_HELD_SECONDS.labels(name)
+
+    def _warm(self):
+        """Open the first `min_size` connections; called on first checkout, not at import"""
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._stats['connects'] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    @staticmethod
+    def _is_closed(conn):
+        # psycopg2 exposes `closed` (non-zero once closed); sqlite3 has no equivalent
+        return bool(getattr(conn, 'closed', 0))
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds (default: the pool's) for a free one
+
+        A timeout of 0 raises PoolTimeoutError at once when the pool is full.
+        """
+        started = time.perf_counter()
+        timeout = self.timeout if timeout is None else timeout
+        if not self._warmed:
+            self._warmed = True
+            self._warm()
+
+        deadline = None
+        with self._cond:
+            self._stats['checkouts'] += 1
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + timeout
+                    wait_started = now
+                    self._stats['waits'] += 1
+                if now >= deadline:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_seconds'] += now - wait_started
+                    raise PoolTimeoutError(
+                        f"No database connection available within {timeout:.1f}s "
+                        f"({self._in_use}/{self.max_size} in use)"
+                    )
+                self._cond.wait(deadline - now)
+            if deadline is not None:
+                self._stats['wait_seconds'] += time.monotonic() - wait_started
+            self._in_use += 1
+
+        # Connecting and health checks happen outside the lock
+        try:
+            if conn is not None and (self._is_closed(conn) or
+                                     (time.monotonic() - last_used > self.ping_after and
+                                      not self._healthy(conn))):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._stats['connects'] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        self.acquire_seconds.observe(time.perf_counter() - started)
+        return conn
+
+    def release(self, conn):
+        # Roll back anything left open so the next borrower starts clean
+        reusable = not self._is_closed(conn)
+        if reusable:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        if not reusable:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats,
+                        size=self._size,
+                        in_use=self._in_use,
+                        idle=len(self._idle),
+                        min_size=self.min_size,
+                        max_size=self.max_size)
+
+
+class Replica:
+    """A read replica's connection pool and health state"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0.0
+        self.failures = 0
+        self.busy = 0
+        self.last_error = None
+
+    def available(self, now):
+        return self.down_until <= now
+
+    def stats(self):
+        return dict(self.pool.stats(), name=self.name,
+                    healthy=self.available(time.monotonic()),
+                    failures=self.failures, busy=self.busy, last_error=self.last_error)
+
+
+def _describe(url):
+    """Log-safe name for a database URL (no credentials)"""
+    if url.startswith('postgresql://'):
+        result = urlparse(url)
+        return f"{result.hostname}:{result.port or 5432}{result.path}"
+    return url.replace('sqlite:///', '')
+
+
 class DatabaseManager:
     def __init__(self):
         self.database_url = os.getenv('DATABASE_URL')
-        self.connection = None
-        
-    def get_connection(self):
-        """Get database connection based on DATABASE_URL"""
-        if self.database_url and self.database_url.startswith('postgresql://'):
-            # Parse PostgreSQL URL
-            result = urlparse(self.database_url)
-            conn = psycopg2.connect(
-                database=result.path[1:],
-                user=result.username,
-                password=result.password,
-                host=result.hostname,
-                port=result.port
-            )
+        self.is_postgres = bool(self.database_url and self.database_url.startswith('postgresql://'))
+        if not self.is_postgres:
+            self.db_path = self.database_url.replace('sqlite:///', '') if self.database_url else 'math_tutor.db'
+        self.sqlite_pragmas = sqlite_pragmas_from_env()
+        self.sqlite_statement_cache = int(os.getenv('SQLITE_STATEMENT_CACHE', 256))
+
+        # URLs are parsed once here rather than on every connection
+        self._connect = self._connector(self.database_url)
+        self.pool = self._make_pool(self._connect, 'primary')
+
+        # Optional read replicas; reads fall back to the primary when none is usable
+        replica_urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+        self.replicas = [Replica(_describe(url), self._make_pool(self._connector(url), _describe(url)))
+                         for url in replica_urls]
+        self.replica_strategy = os.getenv('DB_REPLICA_STRATEGY', 'round_robin')
+        self.replica_retry_after = float(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+        # A replica with no free connection is skipped at once rather than waited on
+        self.replica_acquire_timeout = float(os.getenv('DB_REPLICA_ACQUIRE_TIMEOUT', 0))
+        self._round_robin = itertools.count()
+        # Users who wrote recently read from the primary until replicas have caught up
+        self._recent_writers = TTLCache(maxsize=100000, ttl=float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5)))
+        self._route_lock = threading.Lock()
+        self._routing = {'replica': 0, 'sticky': 0, 'fallback': 0, 'primary': 0}
+
+    def _make_pool(self, connect, name):
+        return ConnectionPool(
+            connect,
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            ping_after=float(os.getenv('DB_POOL_PING_AFTER', 30)),
+            name=name
+        )
+
+    def _connector(self, url):
+        """A zero-argument function opening a new physical connection to `url`"""
+        if url and url.startswith('postgresql://'):
+            result = urlparse(url)
+            params = {
+                'database': result.path[1:],
+                'user': result.username,
+                'password': result.password,
+                'host': result.hostname,
+                'port': result.port,
+                'cursor_factory': TimedCursor
+            }
+            return lambda: psycopg2.connect(**params)
+
+        path = url.replace('sqlite:///', '') if url else 'math_tutor.db'
+
+        def connect():
+            # SQLite fallback; the pool guarantees one thread uses a handle at a time.
+            # cached_statements keeps compiled statements per connection, keyed by SQL text.
+            conn = sqlite3.connect(path, check_same_thread=False, factory=SQLiteConnection,
+                                   cached_statements=self.sqlite_statement_cache)
+            for name, value in self.sqlite_pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
             return conn
-        else:
-            # SQLite fallback
-            db_path = self.database_url.replace('sqlite:///', '') if self.database_url else 'math_tutor.db'
-            return sqlite3.connect(db_path)
-    
-    def execute_query(self, query, params=None):
-        """Execute a query and return results"""
+        return connect
+
+    def get_connection(self):
+        """Borrow a pooled connection; close() returns it to the pool"""
+        return PooledConnection(self.pool, self.pool.acquire())
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with-block"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-                
-            if query.strip().lower().startswith('select'):
-                result = cursor.fetchall()
-                # Convert to list of dicts for PostgreSQL
-                if self.database_url and self.database_url.startswith('postgresql://'):
-                    columns = [desc[0] for desc in cursor.description]
-                    return [dict(zip(columns, row)) for row in result]
-                return result
-            else:
-                conn.commit()
-                return cursor.lastrowid
-                
-        except Exception as e:
-            conn.rollback()
-            raise e
+            yield conn
         finally:
-            cursor.close()
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+    def record_write(self, user_id):
+        """Send `user_id`'s reads to the primary for the read-your-writes window"""
+        if self.replicas and user_id is not None:
+            self._recent_writers.set(user_id, True)
+
+    def _count_route(self, route):
+        with self._route_lock:
+            self._routing[route] += 1
+
+    def _mark_down(self, replica, error):
+        replica.down_until = time.monotonic() + self.replica_retry_after
+        replica.failures += 1
+        replica.last_error = str(error)
+        logger.warning(f"Read replica {replica.name} unavailable, using others for "
+                       f"{self.replica_retry_after:.0f}s: {error}")
+
+    def _replica_order(self):
+        now = time.monotonic()
+        usable = [replica for replica in self.replicas if replica.available(now)]
+        if self.replica_strategy == 'least_connections':
+            return sorted(usable, key=lambda replica: replica.pool.in_use)
+        if usable:
+            start = next(self._round_robin) % len(usable)
+            usable = usable[start:] + usable[:start]
+        return usable
+
+    def get_read_connection(self, user_id=None):
+        """Borrow a connection for read-only work, from a replica when possible
+
+        Falls back to the primary when `user_id` wrote within the
+        read-your-writes window or no replica can hand out a connection.
+        """
+        if not self.replicas:
+            self._count_route('primary')
+            return self.get_connection()
+        if user_id is not None and self._recent_writers.get(user_id):
+            self._count_route('sticky')
+            return self.get_connection()
+        for replica in self._replica_order():
+            try:
+                conn = replica.pool.acquire(timeout=self.replica_acquire_timeout)
+            except PoolTimeoutError:
+                # Busy, not broken: try the next one without taking it out of rotation
+                replica.busy += 1
+                continue
+            except Exception as e:
+                # Connecting failed (the pool's health check discards broken connections first)
+                self._mark_down(replica, e)
+                continue
+            self._count_route('replica')
+            return PooledConnection(replica.pool, conn)
+        self._count_route('fallback')
+        return self.get_connection()
+
+    @contextmanager
+    def read_connection(self, user_id=None):
+        """Borrow a read-only connection for the duration of a with-block"""
+        conn = self.get_read_connection(user_id)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def pool_stats(self):
+        """Pool size, usage and wait/timeout counters"""
+        stats = dict(self.pool.stats(), backend='postgresql' if self.is_postgres else 'sqlite')
+        if self.replicas:
+            with self._route_lock:
+                stats['read_routing'] = dict(self._routing, strategy=self.replica_strategy)
+            stats['replicas'] = [replica.stats() for replica in self.replicas]
+        return stats
+
+    def close(self):
+        """Close all idle pooled connections"""
+        self.pool.close_all()
+        for replica in self.replicas:
+            replica.pool.close_all()
+
+    def execute_query(self, query, params=None, user_id=None):
+        """Execute a query and return results
+
+        SELECTs are routed like read_connection(); everything else goes to the primary.
+        """
+        is_select = query.strip().lower().startswith('select')
+        with (self.read_connection(user_id) if is_select else self.connection()) as conn:
+            cursor = conn.cursor()
+
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                if is_select:
+                    result = cursor.fetchall()
+                    # Convert to list of dicts for PostgreSQL
+                    if self.is_postgres:
+                        columns = [desc[0] for desc in cursor.description]
+                        return [dict(zip(columns, row)) for row in result]
+                    return result
+                else:
+                    conn.commit()
+                    if user_id is not None:
+                        self.record_write(user_id)
+                    return cursor.lastrowid
+
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                cursor.close()
@@ -0,0 +1,140 @@
+"""
+Knowledge distillation of the BiLSTM model into a small parallel student
+"""
+
+import logging
+from typing import Any, Dict
+
+import tensorflow as tf
+from tensorflow.keras.layers import (Conv1D, Dense, Dropout, Embedding,
+                                     GlobalAveragePooling1D, GlobalMaxPooling1D)
+
+from utils.streaming_eval import evaluate_in_chunks
+
+logger = logging.getLogger(__name__)
+
+STUDENT_DIRNAME = 'student'
+STUDENT_ARCHITECTURES = ('conv1d', 'pooled')
+
+
+def build_student(vocab_size: int, max_sequence_length: int, num_classes: int,
+                  architecture: str = 'conv1d', embedding_dim: int = 64, width: int = 128):
+    """Student classifier with no recurrent layers; the last layer returns logits"""
+    if architecture == 'pooled':
+        layers = [
+            Embedding(vocab_size, embedding_dim, input_length=max_sequence_length, mask_zero=True),
+            GlobalAveragePooling1D(),
+        ]
+    else:
+        # Conv1D and GlobalMaxPooling1D don't accept masks, so padding index 0 is embedded like any
+        # other token and can reach the max pool. Inputs are always pre-padded the same way, so the
+        # student learns what the padding vector means rather than relying on it being ignored.
+        layers = [
+            Embedding(vocab_size, embedding_dim, input_length=max_sequence_length),
+            Conv1D(width, 3, padding='same', activation='relu'),
+            GlobalMaxPooling1D(),
+        ]
+    layers += [Dense(width, activation='relu'), Dropout(0.2), Dense(num_classes)]
+    return tf.keras.Sequential(layers, name=f'{architecture}_student')
+
+
+class Distiller(tf.keras.Model):
+    """Trains `student` on a blend of the true labels and the teacher's softened outputs
+
+    Teacher scores are computed per batch, so memory stays bounded for large
+    class counts. Validation reports the student's plain cross-entropy and
+    accuracy against the true labels.
+    """
+
+    def __init__(self, student, teacher, teacher_logits: bool = False,
+                 temperature: float = 4.0, alpha: float = 0.1):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.teacher_logits = teacher_logits
+        self.temperature = temperature
+        self.alpha = alpha
+        self.loss_tracker = tf.keras.metrics.Mean(name='loss')
+        self.accuracy = tf.keras.metrics.SparseCategoricalAccuracy(name='accuracy')
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.accuracy]
+
+    def call(self, inputs, training=False):
+        return self.student(inputs, training=training)
+
+    def _teacher_scores(self, x):
+        scores = self.teacher(x, training=False)
+        if not self.teacher_logits:
+            scores = tf.math.log(tf.clip_by_value(scores, 1e-8, 1.0))
+        return scores
+
+    def train_step(self, data):
+        x, y = data
+        soft_targets = tf.nn.softmax(self._teacher_scores(x) / self.temperature)
+        with tf.GradientTape() as tape:
+            logits = self.student(x, training=True)
+            hard_loss = tf.keras.losses.sparse_categorical_crossentropy(y, logits, from_logits=True)
+            soft_loss = tf.keras.losses.kl_divergence(soft_targets, tf.nn.softmax(logits / self.temperature))
+            # T^2 keeps the soft-target gradients on the same scale as the hard ones
+            loss = tf.reduce_mean(self.alpha * hard_loss +
+                                  (1 - self.alpha) * soft_loss * self.temperature ** 2)
+        self.optimizer.minimize(loss, self.student.trainable_variables, tape=tape)
+        self.loss_tracker.update_state(loss)
+        self.accuracy.update_state(y, logits)
+        return {m.name: m.result() for m in self.metrics}
+
+    def test_step(self, data):
+        x, y = data
+        logits = self.student(x, training=False)
+        self.loss_tracker.update_state(
+            tf.keras.losses.sparse_categorical_crossentropy(y, logits, from_logits=True)
+        )
+        self.accuracy.update_state(y, logits)
+        return {m.name: m.result() for m in self.metrics}
+
+
+def distill(teacher, X_train, y_train, X_val, y_val, num_classes: int, vocab_size: int,
+            teacher_logits: bool = False, architecture: str = 'conv1d', epochs: int = 30,
+            batch_size: int = 32, temperature: float = 4.0, alpha: float = 0.1,
+            learning_rate: float = 0.001, embedding_dim: int = 64, width: int = 128):
+    """Train and return a student model distilled from `teacher`"""
+    student = build_student(vocab_size, X_train.shape[1], num_classes, architecture,
+                            embedding_dim=embedding_dim, width=width)
+    if student.count_params() >= teacher.count_params():
+        logger.warning(f"{architecture} student has {student.count_params():,} parameters, no fewer than "
+                       f"the teacher's {teacher.count_params():,}; lower STUDENT_EMBEDDING_DIM or STUDENT_WIDTH")
+    distiller = Distiller(student, teacher, teacher_logits, temperature, alpha)
+    distiller.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate))
+    distiller.fit(
+        X_train, y_train,
+        epochs=epochs,
+        batch_size=batch_size,
+        validation_data=(X_val, y_val),
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5,
+                                                    restore_best_weights=True, verbose=1)],
+        verbose=1
+    )
+    student.summary(print_fn=logger.info)
+    return student
+
+
+def distillation_report(teacher, student, X_bench, y_bench, num_classes: int,
+                        teacher_logits: bool, requests: int = 200) -> Dict[str, Any]:
+    """Accuracy and latency of teacher vs. student on a fixed benchmark set"""
+    report: Dict[str, Any] = {'benchmark_rows': int(len(X_bench)), 'latency_requests': requests}
+    for name, model, from_logits in (('teacher', teacher, teacher_logits), ('student', student, True)):
+        evaluation = evaluate_in_chunks(model, X_bench, y_bench, num_classes,
+                                        from_logits=from_logits, latency_requests=requests)
+        report[name] = {
+            'accuracy': evaluation['accuracy'],
+            'parameters': int(model.count_params()),
+            'p50_ms': evaluation['latency_p50_ms'],
+            'p99_ms': evaluation['latency_p99_ms'],
+        }
+    report['accuracy_loss'] = report['teacher']['accuracy'] - report['student']['accuracy']
+    report['p50_speedup'] = report['teacher']['p50_ms'] / report['student']['p50_ms']
+    report['p99_speedup'] = report['teacher']['p99_ms'] / report['student']['p99_ms']
+    return report
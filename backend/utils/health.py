@@ -0,0 +1,97 @@
+"""
+Background dependency prober behind the readiness endpoint
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    """Runs dependency checks on a timer and keeps the latest results as a snapshot
+
+    `checks` maps a name to a function returning (ok, details). A check
+    that raises counts as failed. Health endpoints read snapshot(), which is
+    replaced whole after each round and never runs a check itself, so a
+    load balancer polling it costs no database work. A snapshot older than
+    `stale_after` seconds (prober stuck or dead) counts as not ready.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], tuple]], interval: float = 5.0,
+                 stale_after: Optional[float] = None):
+        self.checks = checks
+        self.interval = interval
+        self.stale_after = stale_after if stale_after is not None else interval * 3
+        self._snapshot: Dict[str, Any] = {'ready': False, 'checks': {}, 'reasons': ['starting'],
+                                          'checked_at': None, 'probe_ms': 0.0, 'rounds': 0}
+        self._checked_at = 0.0
+        self._rounds = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, checks: Dict[str, Callable[[], tuple]]) -> 'HealthProber':
+        return cls(checks, interval=float(os.getenv('HEALTH_PROBE_INTERVAL', 5.0)))
+
+    def start(self):
+        """Probe once and start the background prober in this process (no-op once running)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self.probe()
+            self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f"Health probe failed: {e}")
+
+    def probe(self) -> Dict[str, Any]:
+        """Run every check now and publish a new snapshot"""
+        started = time.monotonic()
+        results = {}
+        for name, check in self.checks.items():
+            check_started = time.monotonic()
+            try:
+                ok, details = check()
+            except Exception as e:
+                ok, details = False, {'error': str(e)}
+            results[name] = dict(details, ok=bool(ok),
+                                 ms=round((time.monotonic() - check_started) * 1000, 2))
+        self._rounds += 1
+        reasons = [name for name, result in results.items() if not result['ok']]
+        self._snapshot = {
+            'ready': not reasons,
+            'reasons': reasons,
+            'checks': results,
+            'checked_at': datetime.now().isoformat(),
+            'probe_ms': round((time.monotonic() - started) * 1000, 2),
+            'rounds': self._rounds,
+        }
+        self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest results; `ready` is False if they are stale"""
+        snapshot = self._snapshot
+        age = time.monotonic() - self._checked_at if self._checked_at else None
+        if age is not None and age > self.stale_after:
+            return dict(snapshot, ready=False, reasons=snapshot['reasons'] + ['stale'], age_seconds=round(age, 1))
+        return dict(snapshot, age_seconds=round(age, 1) if age is not None else None)
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,173 @@
+"""
+Model inference off the request path, with a bounded queue per client
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('drop_oldest', 'reject')
+
+
+class _Job:
+    __slots__ = ('key', 'payload', 'request_ids', 'queued_at')
+
+    def __init__(self, key, payload, request_id):
+        self.key = key
+        self.payload = payload
+        self.request_ids = [request_id]
+        self.queued_at = time.monotonic()
+
+
+class _ClientQueue:
+    __slots__ = ('pending', 'running')
+
+    def __init__(self):
+        self.pending: 'OrderedDict[Any, _Job]' = OrderedDict()
+        self.running = False
+
+
+class InferenceExecutor:
+    """Runs `handler(payload)` on worker threads, one job at a time per client
+
+    Each client has at most `max_pending` queued jobs behind the one
+    running. A job whose key matches one already queued is coalesced into
+    it, so one inference answers both request ids. When a client's queue is
+    full, policy 'drop_oldest' discards its stalest job and 'reject' refuses
+    the new one; either way `on_drop(client_id, request_ids)` is called.
+    `on_result(client_id, request_ids, payload, result, error)` runs on the
+    worker thread once a job finishes.
+
+    `spawn(fn, *args)` starts a drain task and `call(fn, *args)` runs the
+    blocking handler. The defaults use a thread pool of `workers`. Under
+    eventlet, pass a green spawn; a handler that waits on green locks must
+    stay on the hub, so hand only its blocking part to eventlet.tpool.
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], on_result: Callable, on_drop: Optional[Callable] = None,
+                 workers: int = 2, max_pending: int = 4, policy: str = 'drop_oldest',
+                 spawn: Optional[Callable] = None, call: Optional[Callable] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r} (expected one of {POLICIES})")
+        self.handler = handler
+        self.on_result = on_result
+        self.on_drop = on_drop
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.policy = policy
+        self._pool = None
+        self._spawn = spawn
+        self._call = call or (lambda fn, *args: fn(*args))
+        self._clients: Dict[Any, _ClientQueue] = {}
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'coalesced': 0, 'dropped': 0, 'completed': 0, 'failed': 0,
+                       'running': 0, 'total_wait_ms': 0.0, 'total_run_ms': 0.0}
+
+    @classmethod
+    def from_env(cls, handler: Callable[[Any], Any], on_result: Callable, on_drop: Optional[Callable] = None,
+                 spawn: Optional[Callable] = None, call: Optional[Callable] = None) -> 'InferenceExecutor':
+        return cls(
+            handler, on_result, on_drop,
+            workers=int(os.getenv('INFERENCE_WORKERS', 2)),
+            max_pending=int(os.getenv('CHAT_MAX_PENDING', 4)),
+            policy=os.getenv('CHAT_BACKPRESSURE_POLICY', 'drop_oldest'),
+            spawn=spawn, call=call,
+        )
+
+    def _start(self, client_id):
+        if self._spawn is not None:
+            self._spawn(self._drain, client_id)
+            return
+        if self._pool is None:
+            # Created lazily so importing the app (or forking workers) doesn't spawn threads
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+        self._pool.submit(self._drain, client_id)
+
+    def submit(self, client_id, key, payload, request_id) -> str:
+        """Queue a job for `client_id`; returns 'queued', 'coalesced' or 'rejected'"""
+        dropped: List[str] = []
+        start = False
+        with self._lock:
+            self._stats['submitted'] += 1
+            client = self._clients.setdefault(client_id, _ClientQueue())
+            job = client.pending.get(key)
+            if job is not None:
+                job.request_ids.append(request_id)
+                self._stats['coalesced'] += 1
+                return 'coalesced'
+            rejected = len(client.pending) >= self.max_pending and self.policy == 'reject'
+            if rejected:
+                dropped = [request_id]
+            else:
+                if len(client.pending) >= self.max_pending:
+                    _, stale = client.pending.popitem(last=False)
+                    dropped = stale.request_ids
+                client.pending[key] = _Job(key, payload, request_id)
+                start = not client.running
+                client.running = True
+            self._stats['dropped'] += len(dropped)
+        if dropped and self.on_drop is not None:
+            self.on_drop(client_id, dropped)
+        if start:
+            self._start(client_id)
+        return 'rejected' if rejected else 'queued'
+
+    def _drain(self, client_id):
+        while True:
+            with self._lock:
+                client = self._clients.get(client_id)
+                if client is None or not client.pending:
+                    if client is not None:
+                        client.running = False
+                        del self._clients[client_id]
+                    return
+                _, job = client.pending.popitem(last=False)
+                self._stats['running'] += 1
+                self._stats['total_wait_ms'] += (time.monotonic() - job.queued_at) * 1000
+            started = time.monotonic()
+            result, error = None, None
+            try:
+                result = self._call(self.handler, job.payload)
+            except Exception as e:
+                error = e
+            with self._lock:
+                self._stats['running'] -= 1
+                self._stats['total_run_ms'] += (time.monotonic() - started) * 1000
+                self._stats['failed' if error else 'completed'] += 1
+            try:
+                self.on_result(client_id, job.request_ids, job.payload, result, error)
+            except Exception as e:
+                logger.error(f"Inference result callback failed: {e}")
+
+    def discard(self, client_id) -> int:
+        """Drop a client's queued jobs (e.g. on disconnect); returns how many"""
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is None:
+                return 0
+            count = len(client.pending)
+            client.pending.clear()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            queued = sum(len(client.pending) for client in self._clients.values())
+            clients = len(self._clients)
+        finished = stats['completed'] + stats['failed']
+        stats['avg_wait_ms'] = round(stats.pop('total_wait_ms') / finished, 2) if finished else 0.0
+        stats['avg_run_ms'] = round(stats.pop('total_run_ms') / finished, 2) if finished else 0.0
+        return dict(stats, queued=queued, active_clients=clients, workers=self.workers,
+                    max_pending=self.max_pending, policy=self.policy)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
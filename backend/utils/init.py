@@ -3,6 +3,8 @@ Math Mentor AI Utilities Package
 """
 from .database_manager import DatabaseManager
 from .math_processor import MathProcessor
+from .model_bundle import ModelBundle
 from .model_validator import ModelValidator
+from .training_profiler import TrainingProfiler
 
-__all__ = ['DatabaseManager', 'MathProcessor', 'ModelValidator']
\ No newline at end of file
+__all__ = ['DatabaseManager', 'MathProcessor', 'ModelValidator', 'ModelBundle', 'TrainingProfiler']
\ No newline at end of file
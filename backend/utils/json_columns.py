@@ -0,0 +1,167 @@
+"""
+Native JSON storage and concept indexes for JSON-valued columns
+"""
+
+import json
+import logging
+import threading
+from typing import Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columns holding JSON documents (stored as json.dumps text before this migration)
+JSON_COLUMNS = (
+    ('training_data', 'mathematical_concepts'),
+    ('problems', 'mathematical_concepts'),
+    ('problems', 'solution_steps'),
+    ('solution_requests', 'solution_data'),
+)
+
+# Tables filterable by concept: SQLite side table and its foreign-key column
+CONCEPT_TABLES = {
+    'training_data': ('training_data_concepts', 'training_data_id'),
+    'problems': ('problem_concepts', 'problem_id'),
+}
+
+
+def _sqlite_concept_ddl(table: str) -> list:
+    side_table, key = CONCEPT_TABLES[table]
+    concepts = ("json_each(CASE WHEN json_valid(NEW.mathematical_concepts) "
+                "THEN NEW.mathematical_concepts ELSE '[]' END)")
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {side_table} (
+            concept TEXT NOT NULL,
+            {key} INTEGER NOT NULL,
+            PRIMARY KEY (concept, {key})
+        ) WITHOUT ROWID""",
+        f"CREATE INDEX IF NOT EXISTS idx_{side_table}_row ON {side_table}({key})",
+        f"""CREATE TRIGGER IF NOT EXISTS {side_table}_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT OR IGNORE INTO {side_table} (concept, {key})
+            SELECT value, NEW.id FROM {concepts} WHERE type = 'text';
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {side_table}_update AFTER UPDATE OF mathematical_concepts ON {table}
+        BEGIN
+            DELETE FROM {side_table} WHERE {key} = OLD.id;
+            INSERT OR IGNORE INTO {side_table} (concept, {key})
+            SELECT value, NEW.id FROM {concepts} WHERE type = 'text';
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {side_table}_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {side_table} WHERE {key} = OLD.id;
+        END""",
+    ]
+
+
+def _sqlite_backfill_sql(table: str) -> str:
+    side_table, key = CONCEPT_TABLES[table]
+    return (f"INSERT OR IGNORE INTO {side_table} (concept, {key}) "
+            f"SELECT j.value, t.id FROM {table} t, json_each(CASE WHEN json_valid(t.mathematical_concepts) "
+            f"THEN t.mathematical_concepts ELSE '[]' END) j WHERE j.type = 'text'")
+
+
+def _existing_tables(cursor, is_postgres: bool) -> set:
+    if is_postgres:
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")
+    else:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db_manager) -> dict:
+    """Move JSON columns to native storage and build the concept indexes; idempotent
+
+    PostgreSQL: TEXT columns become JSONB (rewriting the table once) and
+    concept columns get GIN (jsonb_path_ops) indexes for @> containment.
+    SQLite: concepts go into a side table kept in sync by triggers, backfilled
+    the first time.
+    """
+    is_postgres = getattr(db_manager, 'is_postgres', False)
+    report = {'converted': [], 'indexed': []}
+    with db_manager.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            tables = _existing_tables(cursor, is_postgres)
+            if is_postgres:
+                for table, column in JSON_COLUMNS:
+                    if table not in tables:
+                        continue
+                    cursor.execute("SELECT data_type FROM information_schema.columns "
+                                   "WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+                                   (table, column))
+                    row = cursor.fetchone()
+                    if row and row[0] in ('text', 'character varying', 'json'):
+                        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB "
+                                       f"USING COALESCE(NULLIF({column}::text, ''), '[]')::jsonb")
+                        report['converted'].append(f"{table}.{column}")
+                for table in CONCEPT_TABLES:
+                    if table in tables:
+                        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_concepts_gin ON {table} "
+                                       "USING GIN (mathematical_concepts jsonb_path_ops)")
+                        report['indexed'].append(table)
+            else:
+                for table, (side_table, _) in CONCEPT_TABLES.items():
+                    if table not in tables:
+                        continue
+                    for statement in _sqlite_concept_ddl(table):
+                        cursor.execute(statement)
+                    if side_table not in tables:
+                        cursor.execute(_sqlite_backfill_sql(table))
+                    report['indexed'].append(table)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    logger.info(f"JSON column migration: converted {report['converted'] or 'nothing'}, "
+                f"concept indexes on {report['indexed'] or 'nothing'}")
+    return report
+
+
+_sqlite_ready = set()
+_sqlite_lock = threading.Lock()
+
+
+def ensure_concept_index(db_manager):
+    """Create the SQLite concept side tables on first use
+
+    PostgreSQL's JSONB conversion rewrites tables, so it only runs through
+    scripts/migrate_json_columns.py.
+    """
+    if getattr(db_manager, 'is_postgres', False) or id(db_manager) in _sqlite_ready:
+        return
+    with _sqlite_lock:
+        if id(db_manager) not in _sqlite_ready:
+            migrate(db_manager)
+            _sqlite_ready.add(id(db_manager))
+
+
+def concept_condition(table: str, is_postgres: bool, concept: str) -> Tuple[str, list]:
+    """Index-backed WHERE fragment matching rows tagged with `concept`"""
+    if is_postgres:
+        return "mathematical_concepts @> %s::jsonb", [json.dumps([concept])]
+    side_table, key = CONCEPT_TABLES[table]
+    return f"id IN (SELECT {key} FROM {side_table} WHERE concept = %s)", [concept]
+
+
+def json_object_sql(fields: Sequence[Tuple[str, str, str]], is_postgres: bool) -> str:
+    """SQL expression rendering each row as JSON text, so rows can be sent without decoding
+
+    `fields` are (key, column, kind) with kind 'value', 'json' (a JSON
+    document column, [] when empty) or 'bool'.
+    """
+    parts = []
+    for key, column, kind in fields:
+        if kind == 'json':
+            value = (f"COALESCE({column}::jsonb, '[]'::jsonb)" if is_postgres else
+                     f"json(CASE WHEN json_valid({column}) THEN {column} ELSE '[]' END)")
+        elif kind == 'bool' and not is_postgres:
+            value = f"json(CASE WHEN {column} THEN 'true' ELSE 'false' END)"
+        else:
+            value = column
+        parts.append(f"'{key}', {value}")
+    if is_postgres:
+        # ::text stops psycopg2 from parsing the document back into Python objects
+        return f"json_build_object({', '.join(parts)})::text"
+    return f"json_object({', '.join(parts)})"
@@ -0,0 +1,294 @@
+"""
+Versioned, memory-mappable model artifact bundle
+
+A bundle is a single file holding the model weights, the tokenizer vocabulary
+as a flat string table, the class-label string table and the model config:
+
+    [8s magic][u32 format version][u32 reserved][u64 header length]
+    [header JSON][padding to 64 bytes][payload arrays, each 64-byte aligned]
+
+The header lists every array (dtype, shape, offset) and the SHA-256 of the
+payload. Arrays are read with np.frombuffer over a read-only mmap, so worker
+processes that open the same file share its pages instead of each holding a
+private copy, and nothing is unpickled.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FILENAME = 'math_model.bundle'
+MAGIC = b'MMAIBNDL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sIIQ')
+
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+
+class BundleError(Exception):
+    """Raised when a bundle is missing, corrupt or of an unsupported version"""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_strings(strings: Iterable[str]):
+    """Pack strings into (int64 offsets, uint8 data) arrays"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+class StringTable(Sequence):
+    """Read-only string table backed by offset and byte arrays"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._data[start:end].tobytes().decode('utf-8')
+
+
+class BundleTokenizer:
+    """Minimal tokenizer compatible with Keras `Tokenizer.texts_to_sequences`"""
+
+    def __init__(self, vocabulary: StringTable, config: Dict[str, Any]):
+        self.num_words = config.get('num_words')
+        self.oov_token = config.get('oov_token')
+        self.lower = config.get('lower', True)
+        self.split = config.get('split', ' ')
+        self._translation = str.maketrans({c: self.split for c in config.get('filters', DEFAULT_FILTERS)})
+        # Index 0 is reserved for padding, so vocabulary[i] has index i + 1
+        self.word_index = {word: i + 1 for i, word in enumerate(vocabulary)}
+        self._oov_index = self.word_index.get(self.oov_token) if self.oov_token else None
+
+    def _words(self, text: str) -> List[str]:
+        if self.lower:
+            text = text.lower()
+        return [w for w in text.translate(self._translation).split(self.split) if w]
+
+    def texts_to_sequences(self, texts: Iterable[str]) -> List[List[int]]:
+        sequences = []
+        for text in texts:
+            sequence = []
+            for word in self._words(text):
+                index = self.word_index.get(word)
+                if index is not None and (not self.num_words or index < self.num_words):
+                    sequence.append(index)
+                elif self._oov_index is not None:
+                    sequence.append(self._oov_index)
+            sequences.append(sequence)
+        return sequences
+
+
+class BundleLabelEncoder:
+    """Maps class indices back to solution strings, like `LabelEncoder.inverse_transform`"""
+
+    def __init__(self, classes: StringTable):
+        self.classes_ = classes
+
+    def inverse_transform(self, indices: Iterable[int]) -> List[str]:
+        return [self.classes_[i] for i in indices]
+
+
+def write_bundle(path: str, model, tokenizer, label_encoder, config: Dict[str, Any]) -> str:
+    """Write model weights, vocabulary, labels and config to a single bundle file"""
+    num_words = getattr(tokenizer, 'num_words', None)
+    index_word = tokenizer.index_word
+    last_index = max(index_word) if index_word else 0
+    if num_words:
+        last_index = min(last_index, num_words - 1)
+    vocabulary = [index_word[i] for i in range(1, last_index + 1)]
+
+    weights = model.get_weights()
+    arrays: Dict[str, np.ndarray] = {}
+    for i, weight in enumerate(weights):
+        arrays[f'weights/{i}'] = np.ascontiguousarray(weight)
+    arrays['vocab/offsets'], arrays['vocab/data'] = _encode_strings(vocabulary)
+    arrays['labels/offsets'], arrays['labels/data'] = _encode_strings(str(c) for c in label_encoder.classes_)
+
+    bundle_config = dict(config)
+    bundle_config['model_json'] = model.to_json()
+    bundle_config['num_weights'] = len(weights)
+    bundle_config['tokenizer'] = {
+        'num_words': num_words,
+        'oov_token': getattr(tokenizer, 'oov_token', None),
+        'filters': getattr(tokenizer, 'filters', DEFAULT_FILTERS),
+        'lower': getattr(tokenizer, 'lower', True),
+        'split': getattr(tokenizer, 'split', ' '),
+    }
+
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                       'offset': offset, 'nbytes': int(array.nbytes)}
+        offset += array.nbytes
+
+    # The digest is filled in after the payload is streamed; the placeholder
+    # has the same length so the header can be rewritten in place.
+    header = {'format_version': FORMAT_VERSION, 'config': bundle_config, 'arrays': table,
+              'payload_size': offset, 'payload_sha256': '0' * 64}
+    header_bytes = json.dumps(header).encode('utf-8')
+    payload_offset = _align(_PREAMBLE.size + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * (payload_offset - _PREAMBLE.size - len(header_bytes)))
+
+            # The checksum covers the payload exactly as laid out on disk, padding included
+            digest = hashlib.sha256()
+            position = 0
+            for name, array in arrays.items():
+                chunks = (b'\0' * (table[name]['offset'] - position), array.tobytes())
+                for chunk in chunks:
+                    f.write(chunk)
+                    digest.update(chunk)
+                position = table[name]['offset'] + table[name]['nbytes']
+
+            header['payload_sha256'] = digest.hexdigest()
+            f.seek(_PREAMBLE.size)
+            f.write(json.dumps(header).encode('utf-8'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.info(f"Model bundle saved to {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+    return path
+
+
+class ModelBundle:
+    """Read-only view over a memory-mapped bundle file"""
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        if not os.path.exists(path):
+            raise BundleError(f"Bundle not found: {path}")
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _PREAMBLE.size:
+            raise BundleError(f"Truncated bundle: {path}")
+        magic, version, _, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise BundleError(f"Not a model bundle: {path}")
+        if version > FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle version {version} (max {FORMAT_VERSION})")
+
+        header_end = _PREAMBLE.size + header_len
+        self.header = json.loads(self._mmap[_PREAMBLE.size:header_end].decode('utf-8'))
+        self.payload_offset = _align(header_end)
+        self.config: Dict[str, Any] = self.header['config']
+
+        if self.payload_offset + self.header['payload_size'] > len(self._mmap):
+            raise BundleError(f"Truncated bundle payload: {path}")
+        if verify:
+            self.verify()
+
+    def verify(self):
+        """Check the payload against the SHA-256 recorded in the header"""
+        payload = memoryview(self._mmap)[self.payload_offset:self.payload_offset + self.header['payload_size']]
+        try:
+            actual = hashlib.sha256(payload).hexdigest()
+        finally:
+            payload.release()
+        if actual != self.header['payload_sha256']:
+            raise BundleError(f"Checksum mismatch for {self.path}")
+
+    def array(self, name: str) -> np.ndarray:
+        """Zero-copy, read-only array view into the mapped file"""
+        entry = self.header['arrays'][name]
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64)) if entry['shape'] else 1
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                              offset=self.payload_offset + entry['offset'])
+        return array.reshape(entry['shape'])
+
+    @property
+    def weights(self) -> List[np.ndarray]:
+        return [self.array(f'weights/{i}') for i in range(self.config['num_weights'])]
+
+    @property
+    def vocabulary(self) -> StringTable:
+        return StringTable(self.array('vocab/offsets'), self.array('vocab/data'))
+
+    @property
+    def labels(self) -> StringTable:
+        return StringTable(self.array('labels/offsets'), self.array('labels/data'))
+
+    def tokenizer(self) -> BundleTokenizer:
+        return BundleTokenizer(self.vocabulary, self.config['tokenizer'])
+
+    def label_encoder(self) -> BundleLabelEncoder:
+        return BundleLabelEncoder(self.labels)
+
+    def build_model(self, custom_objects: Optional[Dict[str, Any]] = None):
+        """Rebuild the Keras model from the stored architecture and weights"""
+        import tensorflow as tf
+
+        model = tf.keras.models.model_from_json(self.config['model_json'], custom_objects=custom_objects)
+        model.set_weights(self.weights)
+        return model
+
+    @property
+    def model_config(self) -> Dict[str, Any]:
+        """Config without the bulky serialized architecture"""
+        return {k: v for k, v in self.config.items() if k not in ('model_json', 'tokenizer')}
+
+
+def convert_legacy_artifacts(model_dir: str, output_path: Optional[str] = None) -> str:
+    """Build a bundle from math_model.h5, tokenizer.pkl and label_encoder.pkl
+
+    Only run this on artifacts you trust: the legacy files are unpickled.
+    """
+    import pickle
+    from tensorflow.keras.models import load_model
+
+    model = load_model(os.path.join(model_dir, 'math_model.h5'))
+    with open(os.path.join(model_dir, 'tokenizer.pkl'), 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open(os.path.join(model_dir, 'label_encoder.pkl'), 'rb') as f:
+        label_encoder = pickle.load(f)
+    config_path = os.path.join(model_dir, 'model_config.json')
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+
+    return write_bundle(output_path or os.path.join(model_dir, BUNDLE_FILENAME),
+                        model, tokenizer, label_encoder, config)
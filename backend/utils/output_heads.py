@@ -0,0 +1,133 @@
+"""
+Classification heads that scale to large solution-class spaces
+"""
+
+import logging
+
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+
+@tf.keras.utils.register_keras_serializable(package='MathMentor')
+class SampledSoftmaxHead(tf.keras.layers.Layer):
+    """Output layer trained with sampled softmax that returns logits at inference
+
+    Training only scores the true class plus `num_sampled` random negatives per
+    batch instead of every class, so its cost no longer grows with the number
+    of classes. Inference computes exact logits over all classes.
+    """
+
+    def __init__(self, num_classes: int, num_sampled: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self.num_classes = num_classes
+        self.num_sampled = min(num_sampled, num_classes)
+
+    def build(self, input_shape):
+        dim = int(input_shape[-1])
+        # [num_classes, dim], the layout tf.nn.sampled_softmax_loss expects
+        self.kernel = self.add_weight(name='kernel', shape=(self.num_classes, dim),
+                                      initializer='glorot_uniform', trainable=True)
+        self.bias = self.add_weight(name='bias', shape=(self.num_classes,),
+                                    initializer='zeros', trainable=True)
+        super().build(input_shape)
+
+    def call(self, inputs):
+        return tf.matmul(inputs, self.kernel, transpose_b=True) + self.bias
+
+    def sampled_loss(self, hidden, labels):
+        labels = tf.reshape(tf.cast(labels, tf.int64), (-1, 1))
+        # Labels come from LabelEncoder (alphabetical), not frequency order, so sample uniformly
+        sampled = tf.random.uniform_candidate_sampler(
+            true_classes=labels, num_true=1, num_sampled=self.num_sampled,
+            unique=True, range_max=self.num_classes
+        )
+        return tf.reduce_mean(tf.nn.sampled_softmax_loss(
+            weights=self.kernel, biases=self.bias, labels=labels, inputs=hidden,
+            num_sampled=self.num_sampled, num_classes=self.num_classes,
+            sampled_values=sampled
+        ))
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({'num_classes': self.num_classes, 'num_sampled': self.num_sampled})
+        return config
+
+
+@tf.keras.utils.register_keras_serializable(package='MathMentor')
+class SampledSoftmaxSequential(tf.keras.Sequential):
+    """Sequential model ending in a SampledSoftmaxHead
+
+    train_step skips the full output projection and uses the sampled loss.
+    Validation and inference use the exact logits, so compile it with
+    SparseCategoricalCrossentropy(from_logits=True).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sampled_loss_tracker = tf.keras.metrics.Mean(name='sampled_loss')
+
+    @property
+    def metrics(self):
+        return super().metrics + [self.sampled_loss_tracker]
+
+    def train_step(self, data):
+        x, y = data[:2]
+        head = self.layers[-1]
+        with tf.GradientTape() as tape:
+            hidden = x
+            # Calling layers one by one still propagates the embedding mask via _keras_mask
+            for layer in self.layers[:-1]:
+                hidden = layer(hidden, training=True)
+            loss = head.sampled_loss(hidden, y)
+            if self.losses:
+                loss += tf.add_n(self.losses)
+        self.optimizer.minimize(loss, self.trainable_variables, tape=tape)
+        self.sampled_loss_tracker.update_state(loss)
+        return {'loss': self.sampled_loss_tracker.result()}
+
+    def test_step(self, data):
+        logs = super().test_step(data)
+        logs.pop('sampled_loss', None)
+        return logs
+
+
+# model.to_json() records bare class names while .keras files use the registered ones
+CUSTOM_OBJECTS = {
+    'SampledSoftmaxHead': SampledSoftmaxHead,
+    'SampledSoftmaxSequential': SampledSoftmaxSequential,
+    'MathMentor>SampledSoftmaxHead': SampledSoftmaxHead,
+    'MathMentor>SampledSoftmaxSequential': SampledSoftmaxSequential,
+}
+
+
+def build_classifier(layers, num_classes: int, head: str = 'softmax', num_sampled: int = 64):
+    """Append the requested output head to `layers` and return (model, loss)"""
+    if head == 'sampled':
+        model = SampledSoftmaxSequential(layers + [SampledSoftmaxHead(num_classes, num_sampled)])
+        return model, tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+    if head != 'softmax':
+        logger.warning(f"Unknown output head '{head}', using softmax")
+    model = tf.keras.Sequential(layers + [tf.keras.layers.Dense(num_classes, activation='softmax')])
+    return model, 'sparse_categorical_crossentropy'
+
+
+def make_top_k_scorer(model, k: int = 1, from_logits: bool = False):
+    """Compiled function returning only the top-k class indices and probabilities
+
+    Runs the model and top-k selection in one graph so a request transfers k
+    values back to Python instead of a full num_classes probability vector.
+    With logit outputs the probabilities come from a logsumexp normaliser
+    rather than a materialised softmax.
+    """
+    k = max(1, min(k, int(model.output_shape[-1])))
+
+    @tf.function(reduce_retracing=True)
+    def score(inputs):
+        scores = model(inputs, training=False)
+        values, indices = tf.math.top_k(scores, k=k)
+        if from_logits:
+            values = tf.exp(values - tf.reduce_logsumexp(scores, axis=-1, keepdims=True))
+        return indices, values
+
+    return score
@@ -0,0 +1,215 @@
+"""
+Retention and archival for solution_requests
+"""
+
+import datetime
+import gzip
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'problem_text', 'solution_data', 'processing_time', 'created_at')
+
+DAILY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS solution_request_daily (
+    day DATE NOT NULL,
+    user_id INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    total_processing_time REAL NOT NULL DEFAULT 0,
+    max_processing_time REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id)
+)
+"""
+
+UPSERT_DAILY_SQL = """
+INSERT INTO solution_request_daily (day, user_id, requests, total_processing_time, max_processing_time)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (day, user_id) DO UPDATE SET
+    requests = solution_request_daily.requests + excluded.requests,
+    total_processing_time = solution_request_daily.total_processing_time + excluded.total_processing_time,
+    max_processing_time = CASE WHEN excluded.max_processing_time > solution_request_daily.max_processing_time
+                               THEN excluded.max_processing_time
+                               ELSE solution_request_daily.max_processing_time END
+"""
+
+
+def _day(created_at) -> str:
+    # SQLite hands back text, PostgreSQL a datetime
+    if isinstance(created_at, (datetime.date, datetime.datetime)):
+        return created_at.strftime('%Y-%m-%d')
+    return str(created_at)[:10]
+
+
+def _archive_record(row) -> Dict[str, Any]:
+    record = dict(zip(ARCHIVE_COLUMNS, row))
+    try:
+        record['solution_data'] = json.loads(record['solution_data'])
+    except (TypeError, ValueError):
+        pass
+    if isinstance(record['created_at'], datetime.datetime):
+        record['created_at'] = record['created_at'].isoformat(sep=' ')
+    return record
+
+
+class SolutionArchiver:
+    """Move solution_requests older than `retention_days` into gzip JSONL partitions
+
+    Rows are archived oldest first, `batch_size` at a time. Each batch is
+    written to archive_dir/solution_requests/date=YYYY-MM-DD/part-<first id>-<last id>.jsonl.gz.
+    Then, in one transaction, its per-day, per-user totals are added to
+    solution_request_daily and the rows are deleted. A batch interrupted
+    before its commit is rewritten under the same file name on the next
+    run, so a rerun neither duplicates archive files nor double-counts
+    totals.
+    """
+
+    def __init__(self, db_manager, archive_dir: str, retention_days: int = 90, batch_size: int = 2000,
+                 pause: float = 0.05):
+        self.db_manager = db_manager
+        self.archive_dir = Path(archive_dir) / 'solution_requests'
+        self.retention_days = retention_days
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self._schema_ready = False
+
+    @classmethod
+    def from_env(cls, db_manager) -> 'SolutionArchiver':
+        return cls(
+            db_manager,
+            archive_dir=os.getenv('SOLUTION_ARCHIVE_DIR', '../archive'),
+            retention_days=int(os.getenv('SOLUTION_RETENTION_DAYS', 90)),
+            batch_size=int(os.getenv('SOLUTION_ARCHIVE_BATCH_SIZE', 2000)),
+        )
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(DAILY_TABLE_SQL)
+            conn.commit()
+            cursor.close()
+        self._schema_ready = True
+
+    def cutoff(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        # created_at is stored in UTC (CURRENT_TIMESTAMP / datetime.utcnow())
+        return (now or datetime.datetime.utcnow()) - datetime.timedelta(days=self.retention_days)
+
+    def _write_partitions(self, rows: List[tuple]) -> Dict[str, int]:
+        by_day: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_day.setdefault(_day(row[5]), []).append(row)
+        written = {}
+        for day, day_rows in by_day.items():
+            directory = self.archive_dir / f'date={day}'
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'part-{day_rows[0][0]:012d}-{day_rows[-1][0]:012d}.jsonl.gz'
+            partial = path.with_name(path.name + '.partial')
+            with gzip.open(partial, 'wt', encoding='utf-8') as f:
+                for row in day_rows:
+                    f.write(json.dumps(_archive_record(row), default=str) + '\n')
+            os.replace(partial, path)
+            written[day] = len(day_rows)
+        return written
+
+    @staticmethod
+    def _daily_totals(rows: List[tuple]) -> List[tuple]:
+        totals: Dict[tuple, List[float]] = {}
+        for row in rows:
+            key = (_day(row[5]), row[1] or 0)
+            processing_time = row[4] or 0.0
+            entry = totals.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += processing_time
+            entry[2] = max(entry[2], processing_time)
+        return [key + tuple(values) for key, values in totals.items()]
+
+    def run(self, dry_run: bool = False, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        """Archive every expired row; returns counts per day and timing"""
+        cutoff = self.cutoff(now)
+        summary = {'cutoff': cutoff.isoformat(sep=' '), 'archived': 0, 'batches': 0, 'days': {},
+                   'dry_run': dry_run}
+        start = time.perf_counter()
+        select_sql = (f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM solution_requests "
+                      "WHERE created_at < %s ORDER BY created_at, id LIMIT %s")
+
+        if dry_run:
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM solution_requests WHERE created_at < %s", (cutoff,))
+                summary['archived'] = cursor.fetchone()[0]
+                cursor.close()
+            return summary
+
+        self.ensure_schema()
+        while True:
+            # Each batch is its own short transaction so the solve path's
+            # inserts are never held up behind a long archival run
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(select_sql, (cutoff, self.batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    written = self._write_partitions(rows)
+                    cursor.executemany(UPSERT_DAILY_SQL, self._daily_totals(rows))
+                    ids = [row[0] for row in rows]
+                    cursor.execute(
+                        f"DELETE FROM solution_requests WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            summary['archived'] += len(rows)
+            summary['batches'] += 1
+            for day, count in written.items():
+                summary['days'][day] = summary['days'].get(day, 0) + count
+            if len(rows) < self.batch_size:
+                break
+            time.sleep(self.pause)
+
+        if summary['archived']:
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                # Refresh planner statistics now that the hot table shrank
+                cursor.execute("ANALYZE solution_requests")
+                conn.commit()
+                cursor.close()
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(f"Archived {summary['archived']} solution requests older than {summary['cutoff']} "
+                    f"in {summary['batches']} batches ({summary['seconds']:.1f}s)")
+        return summary
+
+    def daily_totals(self, since: datetime.date, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-day request counts since `since`, from archived totals plus the hot table"""
+        user_sql = " AND user_id = %s" if user_id is not None else ""
+        params = [since.isoformat()] + ([user_id] if user_id is not None else [])
+        days: Dict[str, Dict[str, Any]] = {}
+        self.ensure_schema()
+        with self.db_manager.read_connection(user_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT day, SUM(requests), SUM(total_processing_time) FROM solution_request_daily "
+                f"WHERE day >= %s{user_sql} GROUP BY day", params)
+            archived = cursor.fetchall()
+            cursor.execute(
+                "SELECT DATE(created_at), COUNT(*), SUM(processing_time) FROM solution_requests "
+                f"WHERE created_at >= %s{user_sql} GROUP BY DATE(created_at)", params)
+            live = cursor.fetchall()
+            cursor.close()
+        for day, requests, total_time in archived + live:
+            entry = days.setdefault(_day(day), {'day': _day(day), 'requests': 0, 'total_processing_time': 0.0})
+            entry['requests'] += requests
+            entry['total_processing_time'] += total_time or 0.0
+        for entry in days.values():
+            entry['avg_processing_time'] = (entry['total_processing_time'] / entry['requests']
+                                            if entry['requests'] else 0.0)
+        return [days[day] for day in sorted(days)]
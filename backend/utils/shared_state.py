@@ -0,0 +1,416 @@
+"""
+Cross-process application state and event fan-out for multi-worker deployments
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS shared_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    owner TEXT,
+    expires_at {time_column},
+    updated_at {time_column} NOT NULL
+)
+"""
+
+EVENTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS shared_events (
+    id {id_column},
+    origin TEXT NOT NULL,
+    event TEXT NOT NULL,
+    room TEXT,
+    payload TEXT NOT NULL,
+    created_at {time_column} NOT NULL
+)
+"""
+
+# Takes the lease when nobody holds it or the holder's lease ran out
+ACQUIRE_SQL = """
+INSERT INTO shared_state (name, value, owner, expires_at, updated_at) VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (name) DO UPDATE SET
+    value = excluded.value, owner = excluded.owner,
+    expires_at = excluded.expires_at, updated_at = excluded.updated_at
+WHERE shared_state.owner IS NULL OR shared_state.expires_at < excluded.updated_at
+"""
+
+SET_SQL = """
+INSERT INTO shared_state (name, value, updated_at) VALUES (%s, %s, %s)
+ON CONFLICT (name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+
+def _time_column(db_manager) -> str:
+    # Epoch seconds need a double: PostgreSQL's REAL is float4, which rounds them to ~2 minute steps
+    return 'DOUBLE PRECISION' if getattr(db_manager, 'is_postgres', False) else 'REAL'
+
+
+def _widen_time_columns(cursor, table: str):
+    """On PostgreSQL, convert `table`'s float4 columns left by earlier versions to double precision"""
+    cursor.execute("SELECT column_name FROM information_schema.columns "
+                   "WHERE table_name = %s AND data_type = 'real'", (table,))
+    for (column,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE DOUBLE PRECISION")
+
+
+def node_name() -> str:
+    """Identifies this worker process in leases and published events"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MemoryStateStore:
+    """State kept in this process only: each worker sees its own copy
+
+    Same interface as DatabaseStateStore; for single-process deployments
+    and as the fallback when no database is available.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Any, Optional[str], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.lease(name, default)[0]
+
+    def lease(self, name: str, default: Any = None) -> Tuple[Any, Optional[str]]:
+        """(value, owner); owner is None unless a lease on `name` is currently held"""
+        with self._lock:
+            value, owner, expires_at = self._values.get(name, (default, None, None))
+        if owner is not None and expires_at < time.time():
+            owner = None
+        return value, owner
+
+    def set(self, name: str, value: Any, owner: Optional[str] = None, ttl: Optional[float] = None) -> bool:
+        """Store `value`; with `owner`, only while that owner holds the lease (and extend it by `ttl`)"""
+        with self._lock:
+            _, held_by, expires_at = self._values.get(name, (None, None, None))
+            if owner is None:
+                self._values[name] = (value, held_by, expires_at)
+                return True
+            if held_by != owner:
+                return False
+            self._values[name] = (value, owner, time.time() + ttl if ttl else expires_at)
+            return True
+
+    def acquire(self, name: str, owner: str, value: Any, ttl: float) -> bool:
+        """Take the lease on `name` and store `value`; False if someone else holds it"""
+        now = time.time()
+        with self._lock:
+            _, held_by, expires_at = self._values.get(name, (None, None, None))
+            if held_by is not None and expires_at >= now:
+                return False
+            self._values[name] = (value, owner, now + ttl)
+            return True
+
+    def release(self, name: str, owner: str, value: Any) -> bool:
+        """Store the final `value` and give up the lease"""
+        with self._lock:
+            if self._values.get(name, (None, None, None))[1] != owner:
+                return False
+            self._values[name] = (value, None, None)
+            return True
+
+
+class DatabaseStateStore:
+    """State in the shared_state table, visible to every worker using the database
+
+    Values are JSON documents keyed by name. A lease (owner + expiry) makes a
+    key single-writer across processes, e.g. so only one worker trains at a
+    time; a crashed holder's lease simply runs out.
+    """
+
+    shared = True
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(STATE_TABLE_SQL.format(time_column=_time_column(self.db_manager)))
+            if getattr(self.db_manager, 'is_postgres', False):
+                _widen_time_columns(cursor, 'shared_state')
+            conn.commit()
+            cursor.close()
+        self._schema_ready = True
+
+    def _write(self, sql: str, params: tuple) -> bool:
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                changed = cursor.rowcount > 0
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return changed
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value, _ = self.lease(name, default)
+        return value
+
+    def lease(self, name: str, default: Any = None) -> Tuple[Any, Optional[str]]:
+        """(value, owner); owner is None unless a lease on `name` is currently held"""
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value, owner, expires_at FROM shared_state WHERE name = %s", (name,))
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        if row is None:
+            return default, None
+        value, owner, expires_at = row
+        if owner is not None and (expires_at is None or expires_at < time.time()):
+            owner = None
+        return json.loads(value), owner
+
+    def set(self, name: str, value: Any, owner: Optional[str] = None, ttl: Optional[float] = None) -> bool:
+        """Store `value`; with `owner`, only while that owner holds the lease (and extend it by `ttl`)"""
+        now = time.time()
+        document = json.dumps(value, default=str)
+        if owner is None:
+            return self._write(SET_SQL, (name, document, now))
+        if ttl:
+            return self._write("UPDATE shared_state SET value = %s, expires_at = %s, updated_at = %s "
+                               "WHERE name = %s AND owner = %s AND expires_at >= %s",
+                               (document, now + ttl, now, name, owner, now))
+        return self._write("UPDATE shared_state SET value = %s, updated_at = %s "
+                           "WHERE name = %s AND owner = %s AND expires_at >= %s",
+                           (document, now, name, owner, now))
+
+    def acquire(self, name: str, owner: str, value: Any, ttl: float) -> bool:
+        """Take the lease on `name` and store `value`; False if someone else holds it"""
+        now = time.time()
+        return self._write(ACQUIRE_SQL, (name, json.dumps(value, default=str), owner, now + ttl, now))
+
+    def release(self, name: str, owner: str, value: Any) -> bool:
+        """Store the final `value` and give up the lease"""
+        return self._write("UPDATE shared_state SET value = %s, owner = NULL, expires_at = NULL, updated_at = %s "
+                           "WHERE name = %s AND owner = %s",
+                           (json.dumps(value, default=str), time.time(), name, owner))
+
+
+class LocalEventBus:
+    """Delivers published events to this process's subscribers only
+
+    The message-queue interface: publish(event, payload, room) and
+    subscribe(handler), where handler(event, payload, room) runs once per
+    event in every worker. Another broker only needs to implement these.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._handlers: List[Callable] = []
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'delivered': 0, 'received': 0, 'handler_errors': 0}
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def subscribe(self, handler: Callable):
+        self._handlers.append(handler)
+
+    def _deliver(self, event: str, payload: Any, room: Optional[str]):
+        for handler in self._handlers:
+            try:
+                handler(event, payload, room)
+                self._count('delivered')
+            except Exception as e:
+                self._count('handler_errors')
+                logger.error(f"Event handler failed for {event}: {e}")
+
+    def publish(self, event: str, payload: Any, room: Optional[str] = None):
+        self._count('published')
+        self._deliver(event, payload, room)
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, backend='local')
+
+
+class DatabaseEventBus(LocalEventBus):
+    """Fans events out to every worker through the shared_events table
+
+    The publishing worker delivers its own events immediately; the others
+    pick them up by polling for new rows every `poll_interval` seconds.
+    Rows older than `retention` seconds are deleted as they are polled past.
+    """
+
+    shared = True
+
+    # An id skipped by the poll may still belong to an open transaction (PostgreSQL
+    # sequences hand out ids before commit); keep looking for it this long
+    GAP_TIMEOUT = 5.0
+
+    def __init__(self, db_manager, poll_interval: float = 0.5, retention: float = 300.0, batch_size: int = 500):
+        super().__init__()
+        self.db_manager = db_manager
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self._schema_ready = False
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._last_id = 0
+        self._gaps: Dict[int, float] = {}
+        self._last_prune = 0.0
+        self._stats.update(polls=0, poll_errors=0, pruned=0)
+
+    @classmethod
+    def from_env(cls, db_manager) -> 'DatabaseEventBus':
+        return cls(
+            db_manager,
+            poll_interval=float(os.getenv('SHARED_EVENTS_POLL_SECONDS', 0.5)),
+            retention=float(os.getenv('SHARED_EVENTS_RETENTION_SECONDS', 300)),
+        )
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        is_postgres = getattr(self.db_manager, 'is_postgres', False)
+        id_column = 'BIGSERIAL PRIMARY KEY' if is_postgres else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(EVENTS_TABLE_SQL.format(id_column=id_column, time_column=_time_column(self.db_manager)))
+            if is_postgres:
+                _widen_time_columns(cursor, 'shared_events')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_shared_events_created ON shared_events(created_at)")
+            conn.commit()
+            cursor.close()
+        self._schema_ready = True
+
+    def start(self):
+        """Start polling in this process; a forked worker gets its own poller"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.ensure_schema()
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                # Only events published from now on; nothing is replayed to a new worker
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM shared_events")
+                self._last_id = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
+            self._gaps = {}
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='shared-events', daemon=True)
+            self._thread.start()
+
+    def publish(self, event: str, payload: Any, room: Optional[str] = None):
+        self.start()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("INSERT INTO shared_events (origin, event, room, payload, created_at) "
+                               "VALUES (%s, %s, %s, %s, %s)",
+                               (node_name(), event, room, json.dumps(payload, default=str), time.time()))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._count('published')
+        self._deliver(event, payload, room)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self._count('poll_errors')
+                logger.error(f"Shared event poll failed: {e}")
+
+    def poll(self) -> int:
+        """Deliver events other workers published since the last poll; returns how many"""
+        now = time.time()
+        self._gaps = {event_id: until for event_id, until in self._gaps.items() if until > now}
+        sql = "SELECT id, origin, event, room, payload FROM shared_events WHERE id > %s"
+        params: list = [self._last_id]
+        if self._gaps:
+            sql += f" OR id IN ({', '.join(['%s'] * len(self._gaps))})"
+            params.extend(self._gaps)
+        sql += " ORDER BY id LIMIT %s"
+        params.append(self.batch_size)
+
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            if now - self._last_prune > self.retention / 10:
+                cursor.execute("DELETE FROM shared_events WHERE created_at < %s", (now - self.retention,))
+                self._count('pruned', max(cursor.rowcount, 0))
+                self._last_prune = now
+            conn.commit()
+            cursor.close()
+        self._count('polls')
+
+        me = node_name()
+        received = 0
+        for event_id, origin, event, room, payload in rows:
+            if event_id in self._gaps:
+                del self._gaps[event_id]
+            elif event_id > self._last_id:
+                for missing in range(self._last_id + 1, event_id):
+                    self._gaps[missing] = now + self.GAP_TIMEOUT
+                self._last_id = event_id
+            if origin == me:
+                continue
+            received += 1
+            self._deliver(event, json.loads(payload), room)
+        self._count('received', received)
+        return received
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, backend='database', last_id=self._last_id, pending_gaps=len(self._gaps))
+
+
+def shared_backends_from_env(db_manager):
+    """(state store, event bus) chosen by SHARED_STATE_BACKEND: database (default) or memory
+
+    'database' shares state and events between all workers on the same
+    database; 'memory' keeps both per process, as a single worker needs.
+    """
+    backend = os.getenv('SHARED_STATE_BACKEND', 'database').lower()
+    if backend == 'database' and hasattr(db_manager, 'connection'):
+        return DatabaseStateStore(db_manager), DatabaseEventBus.from_env(db_manager)
+    if backend == 'database':
+        logger.warning("No database available; training state and events are per-process")
+    return MemoryStateStore(), LocalEventBus()
@@ -0,0 +1,80 @@
+"""
+Single-flight call deduplication: concurrent identical calls share one execution
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FlightTimeoutError(TimeoutError):
+    """Raised to a caller that gave up waiting on another caller's execution"""
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time
+
+    The first caller for a key (the leader) runs `fn`; callers arriving
+    while it runs wait for it and get the same result, or the same
+    exception re-raised, instead of running `fn` again. A waiter gives up
+    after `timeout` seconds with FlightTimeoutError; the leader carries on.
+    Nothing is cached: once the leader finishes, the next call runs again.
+    Results are shared objects, so callers must not mutate them.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'executions': 0, 'coalesced': 0, 'errors': 0, 'timeouts': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['executions'] += 1
+            else:
+                flight.waiters += 1
+                self._stats['coalesced'] += 1
+
+        if leader:
+            try:
+                flight.result = fn()
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+        if not flight.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise FlightTimeoutError("Timed out waiting for an identical request in progress")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._flights)
+            waiting = sum(flight.waiters for flight in self._flights.values())
+            stats = dict(self._stats)
+        calls = stats['executions'] + stats['coalesced']
+        return dict(stats, in_flight=in_flight, waiting=waiting,
+                    coalesced_rate=stats['coalesced'] / calls if calls else 0.0)
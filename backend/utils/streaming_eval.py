@@ -0,0 +1,99 @@
+"""
+Chunked model evaluation with incremental classification metrics
+"""
+
+import logging
+import time
+from typing import Any, Dict
+
+import numpy as np
+import tensorflow as tf
+
+from utils.output_heads import make_top_k_scorer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingClassificationMetrics:
+    """Accuracy and precision/recall/F1 accumulated one chunk at a time
+
+    Keeps per-class true-positive, predicted and actual counts (O(classes)
+    memory) instead of the full prediction vector or a confusion matrix.
+    """
+
+    def __init__(self, num_classes: int):
+        self.num_classes = num_classes
+        self.true_positives = np.zeros(num_classes, dtype=np.int64)
+        self.predicted = np.zeros(num_classes, dtype=np.int64)
+        self.support = np.zeros(num_classes, dtype=np.int64)
+        self.count = 0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray):
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        self.true_positives += np.bincount(y_true[y_true == y_pred], minlength=self.num_classes)
+        self.predicted += np.bincount(y_pred, minlength=self.num_classes)
+        self.support += np.bincount(y_true, minlength=self.num_classes)
+        self.count += len(y_true)
+
+    def result(self) -> Dict[str, float]:
+        if self.count == 0:
+            return {'accuracy': 0.0, 'precision': 0.0, 'recall': 0.0, 'f1_score': 0.0, 'samples': 0}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.nan_to_num(self.true_positives / self.predicted)
+            recall = np.nan_to_num(self.true_positives / self.support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        # Support-weighted averages, matching classification_report's 'weighted avg'
+        weights = self.support / self.count
+        return {
+            'accuracy': float(self.true_positives.sum() / self.count),
+            'precision': float(np.dot(weights, precision)),
+            'recall': float(np.dot(weights, recall)),
+            'f1_score': float(np.dot(weights, f1)),
+            'samples': int(self.count),
+        }
+
+
+def row_latencies_ms(model, X: np.ndarray, from_logits: bool = False,
+                     requests: int = 200, warmup: int = 10) -> Dict[str, float]:
+    """Single-row latency percentiles through the serving top-k path, cycling over `X`"""
+    scorer = make_top_k_scorer(model, 1, from_logits)
+    latencies = []
+    for i in range(requests + warmup):
+        row = tf.constant(np.asarray(X[i % len(X):i % len(X) + 1]))
+        start = time.perf_counter()
+        indices, _ = scorer(row)
+        indices.numpy()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies[warmup:])
+    return {
+        'latency_mean_ms': float(latencies.mean()),
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'latency_requests': int(requests),
+    }
+
+
+def evaluate_in_chunks(model, X: np.ndarray, y: np.ndarray, num_classes: int,
+                       chunk_size: int = 1024, from_logits: bool = False,
+                       latency_requests: int = 200) -> Dict[str, Any]:
+    """Score `X` in fixed-size chunks, then time single-row requests
+
+    At most `chunk_size` x `num_classes` scores are held at once, and `X` may
+    be a memory-mapped array.
+    """
+    metrics = StreamingClassificationMetrics(num_classes)
+    start = time.perf_counter()
+    for offset in range(0, len(X), chunk_size):
+        chunk = np.asarray(X[offset:offset + chunk_size])
+        scores = model.predict_on_batch(chunk)
+        metrics.update(y[offset:offset + chunk_size], np.argmax(scores, axis=1))
+    elapsed = time.perf_counter() - start
+
+    result: Dict[str, Any] = metrics.result()
+    result['chunk_size'] = chunk_size
+    result['throughput_rows_per_s'] = metrics.count / elapsed if elapsed > 0 else 0.0
+    if len(X) and latency_requests:
+        result.update(row_latencies_ms(model, X, from_logits, latency_requests))
+    return result
@@ -0,0 +1,197 @@
+"""
+JWT verification with a verified-claims cache and a revocation list
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import jwt
+
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REVOKED_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    digest TEXT PRIMARY KEY,
+    expires_at {time_column} NOT NULL
+)
+"""
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    """Raised for a token that has been revoked (e.g. by logging out)"""
+
+
+def token_digest(token: str) -> str:
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RevocationStore:
+    """Revoked token digests in the revoked_tokens table, shared by every worker"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        # Epoch seconds need a double; PostgreSQL's REAL is float4
+        time_column = 'DOUBLE PRECISION' if getattr(self.db_manager, 'is_postgres', False) else 'REAL'
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(REVOKED_TABLE_SQL.format(time_column=time_column))
+            conn.commit()
+            cursor.close()
+        self._schema_ready = True
+
+    def add(self, digest: str, expires_at: float):
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("INSERT INTO revoked_tokens (digest, expires_at) VALUES (%s, %s) "
+                               "ON CONFLICT (digest) DO NOTHING", (digest, expires_at))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def revoked_until(self, digest: str) -> Optional[float]:
+        """When `digest`'s revocation lapses, or None if it isn't revoked"""
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT expires_at FROM revoked_tokens WHERE digest = %s", (digest,))
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        return row[0] if row else None
+
+    def prune(self, now: float) -> int:
+        """Delete revocations of tokens that have expired anyway"""
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM revoked_tokens WHERE expires_at < %s", (now,))
+            pruned = max(cursor.rowcount, 0)
+            conn.commit()
+            cursor.close()
+        return pruned
+
+
+class TokenVerifier:
+    """Verify JWTs once, then serve their claims from a bounded cache
+
+    Entries are keyed by a digest of the token and expire at the token's
+    `exp` (or after `max_ttl` seconds, whichever is sooner), so a cached
+    token is never accepted past its expiry. Revoked digests are kept until
+    the token would have expired anyway and are checked before the cache.
+
+    With a RevocationStore, revocations are shared between workers: a
+    token missing from the cache is checked against the store before it is
+    verified, and revocations made by other workers are applied to this
+    one's deny list and cache through deny(), e.g. from an event bus.
+    """
+
+    def __init__(self, secret: str, algorithms: Sequence[str] = ('HS256',), maxsize: int = 10000,
+                 max_ttl: float = 300.0, store: Optional[RevocationStore] = None, prune_interval: float = 60.0):
+        self.secret = secret
+        self.algorithms = list(algorithms)
+        self.max_ttl = max_ttl
+        self.store = store
+        self.prune_interval = prune_interval
+        self._claims = TTLCache(maxsize=maxsize, ttl=max_ttl)
+        self._revoked: Dict[str, float] = {}
+        self._last_prune = time.time()
+        self._lock = threading.Lock()
+        self._stats = {'verified': 0, 'rejected': 0, 'revoked_hits': 0}
+
+    def _reject_revoked(self):
+        with self._lock:
+            self._stats['revoked_hits'] += 1
+        raise TokenRevokedError("Token has been revoked")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises jwt.InvalidTokenError otherwise"""
+        digest = token_digest(token)
+        now = time.time()
+        revoked_until = self._revoked.get(digest)
+        if revoked_until is not None and revoked_until > now:
+            self._reject_revoked()
+
+        claims = self._claims.get(digest)
+        if claims is not None:
+            return claims
+
+        if self.store is not None:
+            revoked_until = self.store.revoked_until(digest)
+            if revoked_until is not None and revoked_until > now:
+                self.deny(digest, revoked_until)
+                self._reject_revoked()
+
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=self.algorithms)
+        except jwt.InvalidTokenError:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise
+        ttl = self.max_ttl
+        if 'exp' in claims:
+            ttl = min(ttl, float(claims['exp']) - now)
+        if ttl > 0:
+            self._claims.set(digest, claims, ttl=ttl)
+        with self._lock:
+            self._stats['verified'] += 1
+        return claims
+
+    def revoke(self, token: str, expires_at: Optional[float] = None) -> Tuple[str, float]:
+        """Reject `token` from now on, in O(1) per check; returns (digest, expires_at) for deny() elsewhere"""
+        if expires_at is None:
+            try:
+                expires_at = float(jwt.decode(token, options={'verify_signature': False}).get('exp', 0))
+            except jwt.InvalidTokenError:
+                expires_at = 0
+        if not expires_at:
+            # No usable exp: remember it for as long as a signed token could plausibly live
+            expires_at = time.time() + 30 * 24 * 3600
+        digest = token_digest(token)
+        if self.store is not None:
+            self.store.add(digest, expires_at)
+        self.deny(digest, expires_at)
+        return digest, expires_at
+
+    def deny(self, digest: str, expires_at: float):
+        """Reject the token with this digest until `expires_at`, e.g. one revoked by another worker"""
+        with self._lock:
+            self._revoked[digest] = expires_at
+        self._claims.pop(digest)
+        self._prune_revoked()
+
+    def _prune_revoked(self):
+        # Expired tokens fail verification on their own; drop them from the deny lists
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+            for digest in [d for d, until in self._revoked.items() if until <= now]:
+                del self._revoked[digest]
+        if self.store is not None:
+            try:
+                self.store.prune(now)
+            except Exception as e:
+                logger.warning(f"Pruning revoked tokens failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        cache = self._claims.stats()
+        with self._lock:
+            return dict(self._stats, cache_size=cache['size'], cache_maxsize=cache['maxsize'],
+                        hits=cache['hits'], misses=cache['misses'], hit_rate=cache['hit_rate'],
+                        revoked=len(self._revoked))
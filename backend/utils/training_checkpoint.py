@@ -0,0 +1,223 @@
+"""
+Full training-state checkpoints so interrupted runs can resume
+"""
+
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = 'state.json'
+# Callback attributes that Keras resets in on_train_begin and that must survive a resume
+_CALLBACK_STATE = {
+    'EarlyStopping': ('wait', 'best', 'best_epoch', 'stopped_epoch'),
+    'ReduceLROnPlateau': ('wait', 'best', 'cooldown_counter'),
+}
+
+
+def _to_jsonable(value):
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return str(value)
+    return value
+
+
+def _from_jsonable(value):
+    if value in ('inf', '-inf', 'nan'):
+        return float(value)
+    return value
+
+
+class TrainingCheckpointer:
+    """Save and restore model weights, optimizer state and run metadata"""
+
+    def __init__(self, checkpoint_root: str, training_id: str,
+                 every_epochs: int = 5, every_minutes: float = 10.0, max_to_keep: int = 2):
+        self.root = checkpoint_root
+        self.training_id = training_id
+        self.run_dir = os.path.join(checkpoint_root, training_id)
+        self.every_epochs = max(1, every_epochs)
+        self.every_seconds = every_minutes * 60
+        self.max_to_keep = max_to_keep
+        self._manager = None
+
+    @staticmethod
+    def default_root(model_dir: str) -> str:
+        return os.getenv('CHECKPOINT_DIR', os.path.join(model_dir, 'checkpoints'))
+
+    @classmethod
+    def from_env(cls, model_dir: str, training_id: str) -> 'TrainingCheckpointer':
+        return cls(
+            cls.default_root(model_dir),
+            training_id,
+            every_epochs=int(os.getenv('CHECKPOINT_EVERY_EPOCHS', 5)),
+            every_minutes=float(os.getenv('CHECKPOINT_EVERY_MINUTES', 10)),
+        )
+
+    @staticmethod
+    def find_resumable(checkpoint_root: str, training_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """State of the given run, or of the most recently updated unfinished run"""
+        if not os.path.isdir(checkpoint_root):
+            return None
+        candidates = [training_id] if training_id else os.listdir(checkpoint_root)
+        latest = None
+        for run in candidates:
+            path = os.path.join(checkpoint_root, run, STATE_FILENAME)
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('completed'):
+                continue
+            if latest is None or state['updated_at'] > latest['updated_at']:
+                latest = state
+        return latest
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.run_dir, STATE_FILENAME)
+
+    def _checkpoint_manager(self, model) -> tf.train.CheckpointManager:
+        if self._manager is None:
+            checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+            self._manager = tf.train.CheckpointManager(checkpoint, self.run_dir, max_to_keep=self.max_to_keep)
+        return self._manager
+
+    def write_state(self, state: Dict[str, Any]):
+        """Atomically replace state.json for this run"""
+        os.makedirs(self.run_dir, exist_ok=True)
+        state = dict(state, training_id=self.training_id, updated_at=datetime.now().isoformat())
+        fd, tmp_path = tempfile.mkstemp(dir=self.run_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=2, default=_to_jsonable)
+        os.replace(tmp_path, self.state_path)
+
+    def save(self, model, state: Dict[str, Any]) -> str:
+        """Checkpoint weights and optimizer, then record the run state pointing at it"""
+        checkpoint_path = self._checkpoint_manager(model).save(checkpoint_number=state['epoch'])
+        self.write_state(dict(state, checkpoint=checkpoint_path))
+        logger.info(f"Training checkpoint saved at epoch {state['epoch']}: {checkpoint_path}")
+        return checkpoint_path
+
+    def restore(self, model, state: Dict[str, Any]):
+        """Restore weights and optimizer slots from the checkpoint referenced by `state`"""
+        # Optimizer slot variables must exist before they can be restored into
+        model.optimizer.build(model.trainable_variables)
+        checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+        checkpoint.restore(state['checkpoint']).assert_existing_objects_matched()
+        if state.get('learning_rate') is not None:
+            model.optimizer.learning_rate.assign(state['learning_rate'])
+        logger.info(f"Restored training state from {state['checkpoint']} (epoch {state['epoch']})")
+
+    @staticmethod
+    def best_weights_filename(name: str, epoch: int) -> str:
+        return f"{name}-best-{epoch}.npz"
+
+    def save_best_weights(self, name: str, epoch: int, weights: List[np.ndarray]) -> str:
+        """Write a callback's best weights into the run directory; returns the file name"""
+        os.makedirs(self.run_dir, exist_ok=True)
+        filename = self.best_weights_filename(name, epoch)
+        fd, tmp_path = tempfile.mkstemp(dir=self.run_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, *weights)
+        os.replace(tmp_path, os.path.join(self.run_dir, filename))
+        return filename
+
+    def load_best_weights(self, filename: str) -> List[np.ndarray]:
+        with np.load(os.path.join(self.run_dir, filename)) as data:
+            return [data[f'arr_{i}'] for i in range(len(data.files))]
+
+    def prune_best_weights(self, keep: List[str]):
+        """Delete best-weights files the current state no longer references"""
+        for path in glob.glob(os.path.join(self.run_dir, '*-best-*.npz')):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+    def mark_completed(self, state: Dict[str, Any]):
+        self.write_state(dict(state, completed=True))
+
+    def callback(self, base_state: Dict[str, Any], tracked_callbacks: List[tf.keras.callbacks.Callback],
+                 resume_state: Optional[Dict[str, Any]] = None) -> tf.keras.callbacks.Callback:
+        """Keras callback that checkpoints every N epochs or M minutes, whichever comes first
+
+        It should be last in the callback list so that, on resume, it restores
+        the tracked callbacks' counters after their own on_train_begin resets.
+        EarlyStopping's best weights are saved alongside (rewritten only when
+        the best epoch changes), so restore_best_weights still rolls back to
+        an epoch from before the interruption.
+        """
+        checkpointer = self
+
+        class PeriodicTrainingCheckpoint(tf.keras.callbacks.Callback):
+            def __init__(self):
+                super().__init__()
+                self.history = list((resume_state or {}).get('history', []))
+                self._last_epoch = (resume_state or {}).get('epoch', 0)
+                self._last_time = time.monotonic()
+                # Callback name -> best-weights file in the run directory
+                self.best_weights = dict((resume_state or {}).get('best_weights', {}))
+
+            def on_train_begin(self, logs=None):
+                saved = (resume_state or {}).get('callbacks', {})
+                for cb in tracked_callbacks:
+                    name = type(cb).__name__
+                    for attr, value in saved.get(name, {}).items():
+                        setattr(cb, attr, _from_jsonable(value))
+                    if getattr(cb, 'restore_best_weights', False) and name in self.best_weights:
+                        cb.best_weights = checkpointer.load_best_weights(self.best_weights[name])
+
+            def on_epoch_end(self, epoch, logs=None):
+                completed = epoch + 1
+                self.history.append({'epoch': completed,
+                                     **{k: float(v) for k, v in (logs or {}).items()}})
+                due = (completed - self._last_epoch >= checkpointer.every_epochs or
+                       time.monotonic() - self._last_time >= checkpointer.every_seconds)
+                if due:
+                    self.save(completed)
+
+            def on_train_end(self, logs=None):
+                # Final weights (best weights, if EarlyStopping restored them) so a crash
+                # during evaluation or saving does not repeat any training
+                completed = self.history[-1]['epoch'] if self.history else self._last_epoch
+                self.save(completed, fit_finished=True)
+
+            def save(self, completed_epochs: int, fit_finished: bool = False):
+                for cb in tracked_callbacks:
+                    name = type(cb).__name__
+                    weights = getattr(cb, 'best_weights', None)
+                    if weights is None:
+                        continue
+                    best_epoch = getattr(cb, 'best_epoch', 0)
+                    if self.best_weights.get(name) != checkpointer.best_weights_filename(name, best_epoch):
+                        self.best_weights[name] = checkpointer.save_best_weights(name, best_epoch, weights)
+                checkpointer.save(self.model, self.state(completed_epochs, fit_finished))
+                checkpointer.prune_best_weights(list(self.best_weights.values()))
+                self._last_epoch = completed_epochs
+                self._last_time = time.monotonic()
+
+            def state(self, completed_epochs: int, fit_finished: bool = False) -> Dict[str, Any]:
+                callback_state = {
+                    type(cb).__name__: {attr: _to_jsonable(getattr(cb, attr))
+                                        for attr in _CALLBACK_STATE.get(type(cb).__name__, ())
+                                        if hasattr(cb, attr)}
+                    for cb in tracked_callbacks
+                }
+                return dict(base_state,
+                            epoch=completed_epochs,
+                            fit_finished=fit_finished,
+                            learning_rate=float(tf.keras.backend.get_value(self.model.optimizer.learning_rate)),
+                            callbacks=callback_state,
+                            best_weights=dict(self.best_weights),
+                            history=self.history)
+
+        return PeriodicTrainingCheckpoint()
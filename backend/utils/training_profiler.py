@@ -0,0 +1,202 @@
+"""
+Training pipeline profiling utilities
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: memory figures are left out of the profile
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where it can't be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MB, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _round_mb(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def parse_epoch_range(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse an epoch range such as '3', '2-4' or '2:4' into (start, end)"""
+    if not value:
+        return None
+    value = value.strip().replace(':', '-')
+    try:
+        if '-' in value:
+            start, end = (int(part) for part in value.split('-', 1))
+        else:
+            start = end = int(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid profile epoch range: {value!r}")
+        return None
+    if start < 0 or end < start:
+        logger.warning(f"Ignoring invalid profile epoch range: {value!r}")
+        return None
+    return start, end
+
+
+class TrainingProfiler:
+    """Record wall time, CPU time and memory for each training phase"""
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or f"train_{int(datetime.now().timestamp())}"
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.epochs: List[Dict[str, Any]] = []
+        self.trace_dir: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of the pipeline and record it under `name`"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = _current_rss_mb()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            rss_end = _current_rss_mb()
+            peak = max((value for value in (_peak_rss_mb(), rss_end) if value is not None), default=None)
+            record = {
+                'name': name,
+                'status': status,
+                'wall_seconds': round(time.perf_counter() - wall_start, 4),
+                'cpu_seconds': round(time.process_time() - cpu_start, 4),
+                'rss_start_mb': _round_mb(rss_start),
+                'rss_end_mb': _round_mb(rss_end),
+                'peak_rss_mb': _round_mb(peak),
+            }
+            self.phases.append(record)
+            memory = f", peak {peak:.0f} MB" if peak is not None else ''
+            logger.info(f"⏱️  {name}: {record['wall_seconds']:.2f}s "
+                        f"(cpu {record['cpu_seconds']:.2f}s{memory})")
+
+    def record_epoch(self, epoch: int, seconds: float, logs: Optional[Dict[str, Any]] = None):
+        """Record the duration and metrics of a single training epoch"""
+        entry = {'epoch': epoch, 'seconds': round(seconds, 4)}
+        for key, value in (logs or {}).items():
+            try:
+                entry[key] = float(value)
+            except (TypeError, ValueError):
+                continue
+        self.epochs.append(entry)
+
+    def phase_seconds(self) -> Dict[str, float]:
+        """Total wall time per phase name"""
+        totals: Dict[str, float] = {}
+        for record in self.phases:
+            totals[record['name']] = round(totals.get(record['name'], 0.0) + record['wall_seconds'], 4)
+        return totals
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._start
+
+    def report(self) -> Dict[str, Any]:
+        """Build the machine-readable profile report"""
+        epoch_times = [entry['seconds'] for entry in self.epochs]
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'total_seconds': round(self.total_seconds, 4),
+            'peak_rss_mb': _round_mb(_peak_rss_mb()),
+            'phase_seconds': self.phase_seconds(),
+            'phases': self.phases,
+            'epochs': self.epochs,
+            'epoch_summary': {
+                'count': len(epoch_times),
+                'mean_seconds': round(sum(epoch_times) / len(epoch_times), 4) if epoch_times else 0.0,
+                'max_seconds': round(max(epoch_times), 4) if epoch_times else 0.0,
+            },
+            'tensorflow_trace_dir': self.trace_dir,
+        }
+
+    def save(self, model_dir: str, filename: str = 'training_profile.json') -> str:
+        """Write the report next to the other training artifacts"""
+        os.makedirs(model_dir, exist_ok=True)
+        path = os.path.join(model_dir, filename)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Training profile saved to {path}")
+        return path
+
+    def keras_callbacks(self, trace_epochs: Optional[Tuple[int, int]] = None,
+                        trace_dir: Optional[str] = None) -> list:
+        """Keras callbacks recording epoch timings and an optional TF profiler trace"""
+        import tensorflow as tf
+
+        profiler = self
+
+        class EpochTimer(tf.keras.callbacks.Callback):
+            def on_epoch_begin(self, epoch, logs=None):
+                self._epoch_start = time.perf_counter()
+
+            def on_epoch_end(self, epoch, logs=None):
+                profiler.record_epoch(epoch, time.perf_counter() - self._epoch_start, logs)
+
+        class EpochRangeProfiler(tf.keras.callbacks.Callback):
+            """Capture a TensorFlow profiler trace for epochs [start, end] (0-based)"""
+
+            def __init__(self, start: int, end: int, logdir: str):
+                super().__init__()
+                self.start, self.end, self.logdir = start, end, logdir
+                self.active = False
+
+            def on_epoch_begin(self, epoch, logs=None):
+                # A resumed run begins at initial_epoch, which may already be inside the range
+                if self.start <= epoch <= self.end and not self.active:
+                    tf.profiler.experimental.start(self.logdir)
+                    self.active = True
+                    logger.info(f"TensorFlow profiler started at epoch {epoch} -> {self.logdir}")
+
+            def on_epoch_end(self, epoch, logs=None):
+                if self.active and epoch >= self.end:
+                    self._stop()
+
+            def on_train_end(self, logs=None):
+                if self.active:
+                    self._stop()
+
+            def _stop(self):
+                tf.profiler.experimental.stop()
+                self.active = False
+                logger.info("TensorFlow profiler stopped")
+
+        callbacks = [EpochTimer()]
+        if trace_epochs:
+            self.trace_dir = trace_dir or os.path.join('logs', 'profile', self.run_id)
+            callbacks.append(EpochRangeProfiler(trace_epochs[0], trace_epochs[1], self.trace_dir))
+        return callbacks
@@ -0,0 +1,195 @@
+"""
+Per-user activity counters kept up to date by the write path
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from utils.retention import DAILY_TABLE_SQL
+
+logger = logging.getLogger(__name__)
+
+USER_STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    solutions_requested INTEGER NOT NULL DEFAULT 0,
+    training_data_contributed INTEGER NOT NULL DEFAULT 0,
+    last_solution_at TIMESTAMP
+)
+"""
+
+# Dashboards keep reading user_activity; it is now a primary-key join
+# instead of a GROUP BY over solution_requests x training_data
+USER_ACTIVITY_VIEW_SQL = """
+CREATE VIEW user_activity AS
+SELECT
+    u.id,
+    u.username,
+    u.email,
+    u.created_at,
+    u.last_login,
+    COALESCE(s.solutions_requested, 0) as solutions_requested,
+    COALESCE(s.training_data_contributed, 0) as training_data_contributed
+FROM users u
+LEFT JOIN user_stats s ON s.user_id = u.id
+"""
+
+UPSERT_SOLUTIONS_SQL = """
+INSERT INTO user_stats (user_id, solutions_requested, last_solution_at) VALUES (%s, %s, %s)
+ON CONFLICT (user_id) DO UPDATE SET
+    solutions_requested = user_stats.solutions_requested + excluded.solutions_requested,
+    last_solution_at = CASE WHEN user_stats.last_solution_at IS NULL
+                              OR excluded.last_solution_at > user_stats.last_solution_at
+                            THEN excluded.last_solution_at ELSE user_stats.last_solution_at END
+"""
+
+UPSERT_CONTRIBUTIONS_SQL = """
+INSERT INTO user_stats (user_id, training_data_contributed) VALUES (%s, %s)
+ON CONFLICT (user_id) DO UPDATE SET
+    training_data_contributed = user_stats.training_data_contributed + excluded.training_data_contributed
+"""
+
+# Recounts from the source tables, one grouped scan each (no row-multiplying join).
+# Solve logs already moved to the archive are counted from solution_request_daily.
+RECOUNT_SQL = """
+SELECT user_id, SUM(solutions), SUM(contributions), MAX(last_solution_at) FROM (
+    SELECT user_id, COUNT(*) AS solutions, 0 AS contributions, MAX(created_at) AS last_solution_at
+    FROM solution_requests WHERE user_id IS NOT NULL GROUP BY user_id
+    UNION ALL
+    SELECT user_id, SUM(requests), 0, NULL
+    FROM solution_request_daily WHERE user_id <> 0 GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 0, COUNT(*), NULL
+    FROM training_data WHERE user_id IS NOT NULL GROUP BY user_id
+) counts
+GROUP BY user_id
+"""
+
+
+class UserStats:
+    """Reads and incremental updates of the user_stats counters
+
+    Updates take the caller's cursor, so a counter changes in the same
+    transaction as the rows it counts.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._schema_ready = False
+
+    def ensure_schema(self, cursor=None):
+        if self._schema_ready:
+            return
+        if cursor is None:
+            with self.db_manager.connection() as conn:
+                self.ensure_schema(conn.cursor())
+                conn.commit()
+            return
+        cursor.execute(USER_STATS_TABLE_SQL)
+        self._schema_ready = True
+
+    def record_solutions(self, cursor, rows: Iterable[Sequence[Any]], columns: Sequence[str]):
+        """Add a batch of solution_requests rows to their users' counters
+
+        Meant as the solve logger's `on_batch` hook: one upsert per user in the batch.
+        """
+        self.ensure_schema(cursor)
+        user_index = columns.index('user_id')
+        time_index = columns.index('created_at') if 'created_at' in columns else None
+        deltas: Dict[int, List[Any]] = {}
+        for row in rows:
+            user_id = row[user_index]
+            if user_id is None:
+                continue
+            created_at = row[time_index] if time_index is not None else None
+            entry = deltas.setdefault(user_id, [0, created_at])
+            entry[0] += 1
+            if created_at is not None and (entry[1] is None or created_at > entry[1]):
+                entry[1] = created_at
+        if deltas:
+            cursor.executemany(UPSERT_SOLUTIONS_SQL,
+                               [(user_id, count, last) for user_id, (count, last) in deltas.items()])
+
+    def record_contributions(self, cursor, user_id: Optional[int], count: int = 1):
+        if user_id is None or count <= 0:
+            return
+        self.ensure_schema(cursor)
+        cursor.execute(UPSERT_CONTRIBUTIONS_SQL, (user_id, count))
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """One user's profile and counters: two primary-key lookups"""
+        self.ensure_schema()
+        with self.db_manager.read_connection(user_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT u.id, u.username, u.email, u.created_at, u.last_login,
+                          COALESCE(s.solutions_requested, 0), COALESCE(s.training_data_contributed, 0),
+                          s.last_solution_at
+                   FROM users u LEFT JOIN user_stats s ON s.user_id = u.id
+                   WHERE u.id = %s""", (user_id,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return None
+        keys = ('id', 'username', 'email', 'created_at', 'last_login',
+                'solutions_requested', 'training_data_contributed', 'last_solution_at')
+        return dict(zip(keys, row))
+
+    def _recount(self, cursor) -> Dict[int, tuple]:
+        cursor.execute(DAILY_TABLE_SQL)
+        cursor.execute(RECOUNT_SQL)
+        return {user_id: (int(solutions or 0), int(contributions or 0), last)
+                for user_id, solutions, contributions, last in cursor.fetchall()}
+
+    def rebuild(self, replace_view: bool = True) -> int:
+        """Recount every user's counters from the source tables; returns users counted
+
+        Runs in one transaction that holds off counter updates until it
+        commits, so no solve batch is counted twice or lost. With
+        `replace_view`, user_activity is redefined on top of user_stats.
+        """
+        self.ensure_schema()
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if getattr(self.db_manager, 'is_postgres', False):
+                    cursor.execute("LOCK TABLE user_stats IN EXCLUSIVE MODE")
+                else:
+                    cursor.execute("BEGIN IMMEDIATE")
+                counts = self._recount(cursor)
+                cursor.execute("DELETE FROM user_stats")
+                cursor.executemany(
+                    "INSERT INTO user_stats (user_id, solutions_requested, training_data_contributed, "
+                    "last_solution_at) VALUES (%s, %s, %s, %s)",
+                    [(user_id,) + values for user_id, values in counts.items()])
+                if replace_view:
+                    cursor.execute("DROP VIEW IF EXISTS user_activity")
+                    cursor.execute(USER_ACTIVITY_VIEW_SQL)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        logger.info(f"Rebuilt user_stats for {len(counts)} users")
+        return len(counts)
+
+    def verify(self) -> Dict[str, Any]:
+        """Compare user_stats with a fresh recount; returns the users that differ"""
+        with self.db_manager.connection() as conn:
+            cursor = conn.cursor()
+            self.ensure_schema(cursor)
+            expected = self._recount(cursor)
+            cursor.execute("SELECT user_id, solutions_requested, training_data_contributed FROM user_stats")
+            actual = {user_id: (solutions, contributions) for user_id, solutions, contributions in cursor.fetchall()}
+            conn.commit()
+            cursor.close()
+        mismatches = []
+        for user_id in sorted(set(expected) | set(actual)):
+            want = expected.get(user_id, (0, 0, None))[:2]
+            have = actual.get(user_id, (0, 0))
+            if tuple(want) != tuple(have):
+                mismatches.append({'user_id': user_id,
+                                   'expected': {'solutions_requested': want[0], 'training_data_contributed': want[1]},
+                                   'actual': {'solutions_requested': have[0], 'training_data_contributed': have[1]}})
+        return {'users': len(expected), 'mismatches': mismatches, 'ok': not mismatches}
@@ -0,0 +1,158 @@
+"""
+Write-behind buffer for append-only logging tables
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """Queues rows in memory and inserts them in batches from a background thread
+
+    A batch is written once it holds `batch_size` rows or its oldest row has
+    waited `flush_interval` seconds. The queue holds at most `max_queue` rows.
+    When it is full, policy 'drop' discards the new row, and policy 'block'
+    waits up to `block_timeout` seconds first. Dropped and failed rows are
+    counted in stats(), not raised to the caller.
+
+    `on_batch(cursor, rows, columns)`, if given, runs inside each batch's
+    transaction. Use it to maintain derived tables from the same rows.
+    """
+
+    def __init__(self, db_manager, table: str, columns: Sequence[str], batch_size: int = 100,
+                 flush_interval: float = 1.0, max_queue: int = 10000, policy: str = 'drop',
+                 block_timeout: float = 0.05, on_batch: Optional[Callable] = None):
+        self.db_manager = db_manager
+        self.table = table
+        self.columns = tuple(columns)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.on_batch = on_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._row_sql = '(' + ', '.join(['%s'] * len(self.columns)) + ')'
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'failed': 0,
+                       'batches': 0, 'last_flush_ms': 0.0}
+
+    @classmethod
+    def from_env(cls, db_manager, table: str, columns: Sequence[str],
+                 on_batch: Optional[Callable] = None) -> 'WriteBehindWriter':
+        return cls(
+            db_manager, table, columns,
+            batch_size=int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100)),
+            flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_SECONDS', 1.0)),
+            max_queue=int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000)),
+            policy=os.getenv('WRITE_BEHIND_POLICY', 'drop'),
+            on_batch=on_batch,
+        )
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _ensure_started(self):
+        # Started lazily so importing the app (or forking workers) doesn't spawn threads
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.table}',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def submit(self, row: Sequence[Any]) -> bool:
+        """Queue one row for insertion; returns False if it was dropped"""
+        if self._closed:
+            self._count('dropped')
+            return False
+        self._ensure_started()
+        try:
+            if self.policy == 'block':
+                self._queue.put(tuple(row), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(tuple(row))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('submitted')
+        return True
+
+    def _run(self):
+        batch = []
+        deadline = 0.0
+        stopping = False
+        while not stopping:
+            try:
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+            # item is None means the oldest queued row has waited flush_interval
+            if batch and (stopping or item is None or len(batch) >= self.batch_size):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+        self._queue.task_done()
+
+    def _write(self, batch):
+        sql = (f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES "
+               + ', '.join([self._row_sql] * len(batch)))
+        params = [value for row in batch for value in row]
+        start = time.perf_counter()
+        try:
+            with self.db_manager.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                if self.on_batch is not None:
+                    self.on_batch(cursor, batch, self.columns)
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Could not write {len(batch)} {self.table} rows: {e}")
+            self._count('failed', len(batch))
+            return
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = (time.perf_counter() - start) * 1000
+
+    def flush(self):
+        """Block until every row queued so far has been written (or failed)"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting rows, write what is queued and stop the thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning(f"Write-behind queue for {self.table} still full at shutdown")
+                return
+            self._thread.join(timeout)
+        logger.info(f"Write-behind writer for {self.table} closed: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize(), policy=self.policy)
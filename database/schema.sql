@@ -92,6 +92,51 @@ CREATE TABLE IF NOT EXISTS solution_requests (
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
+-- Per-user activity counters, maintained by the write path (see utils/user_stats.py)
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    solutions_requested INTEGER NOT NULL DEFAULT 0,
+    training_data_contributed INTEGER NOT NULL DEFAULT 0,
+    last_solution_at TIMESTAMP
+);
+
+-- Per-day, per-user totals of archived solution requests (user_id 0 = anonymous)
+CREATE TABLE IF NOT EXISTS solution_request_daily (
+    day DATE NOT NULL,
+    user_id INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    total_processing_time REAL NOT NULL DEFAULT 0,
+    max_processing_time REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id)
+);
+
+-- State shared by all backend workers (training status, active model version);
+-- owner/expires_at form a lease so only one worker trains at a time
+CREATE TABLE IF NOT EXISTS shared_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    owner TEXT,
+    expires_at REAL,
+    updated_at REAL NOT NULL
+);
+
+-- Events fanned out to every worker's Socket.IO clients (see backend/utils/shared_state.py)
+CREATE TABLE IF NOT EXISTS shared_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    event TEXT NOT NULL,
+    room TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shared_events_created ON shared_events(created_at);
+
+-- Tokens revoked by logout, until they would have expired anyway (see backend/utils/token_cache.py)
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    digest TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+
 -- Model metrics table
 CREATE TABLE IF NOT EXISTS model_metrics (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -101,6 +146,11 @@ CREATE TABLE IF NOT EXISTS model_metrics (
     recall REAL,
     f1_score REAL,
     inference_time REAL,
+    training_duration REAL,
+    peak_memory_mb REAL,
+    phase_timings TEXT,
+    inference_p99_ms REAL,
+    evaluated_samples INTEGER,
     evaluated_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -111,6 +161,10 @@ CREATE INDEX IF NOT EXISTS idx_problems_topic ON problems(topic);
 CREATE INDEX IF NOT EXISTS idx_problems_difficulty ON problems(difficulty);
 CREATE INDEX IF NOT EXISTS idx_training_data_status ON training_data(validation_status);
 CREATE INDEX IF NOT EXISTS idx_training_data_used ON training_data(used_in_training);
+-- Keyset pagination on (created_at, id), optionally filtered by status or difficulty
+CREATE INDEX IF NOT EXISTS idx_training_data_created_id ON training_data(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_training_data_status_created ON training_data(validation_status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_training_data_difficulty_created ON training_data(difficulty_level, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_feedback_reviewed ON feedback(reviewed);
 CREATE INDEX IF NOT EXISTS idx_feedback_user ON feedback(user_id);
 CREATE INDEX IF NOT EXISTS idx_solution_requests_user ON solution_requests(user_id);
@@ -118,6 +172,58 @@ CREATE INDEX IF NOT EXISTS idx_solution_requests_date ON solution_requests(creat
 CREATE INDEX IF NOT EXISTS idx_training_progress_id ON training_progress(training_id);
 CREATE INDEX IF NOT EXISTS idx_ai_models_active ON ai_models(is_active);
 
+-- Concept side tables for indexed concept filters (PostgreSQL uses JSONB + GIN instead;
+-- see backend/utils/json_columns.py). Triggers keep them in sync with mathematical_concepts.
+CREATE TABLE IF NOT EXISTS training_data_concepts (
+    concept TEXT NOT NULL,
+    training_data_id INTEGER NOT NULL,
+    PRIMARY KEY (concept, training_data_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_training_data_concepts_row ON training_data_concepts(training_data_id);
+
+CREATE TABLE IF NOT EXISTS problem_concepts (
+    concept TEXT NOT NULL,
+    problem_id INTEGER NOT NULL,
+    PRIMARY KEY (concept, problem_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_problem_concepts_row ON problem_concepts(problem_id);
+
+CREATE TRIGGER IF NOT EXISTS training_data_concepts_insert AFTER INSERT ON training_data
+BEGIN
+    INSERT OR IGNORE INTO training_data_concepts (concept, training_data_id)
+    SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.mathematical_concepts) THEN NEW.mathematical_concepts ELSE '[]' END) WHERE type = 'text';
+END;
+
+CREATE TRIGGER IF NOT EXISTS training_data_concepts_update AFTER UPDATE OF mathematical_concepts ON training_data
+BEGIN
+    DELETE FROM training_data_concepts WHERE training_data_id = OLD.id;
+    INSERT OR IGNORE INTO training_data_concepts (concept, training_data_id)
+    SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.mathematical_concepts) THEN NEW.mathematical_concepts ELSE '[]' END) WHERE type = 'text';
+END;
+
+CREATE TRIGGER IF NOT EXISTS training_data_concepts_delete AFTER DELETE ON training_data
+BEGIN
+    DELETE FROM training_data_concepts WHERE training_data_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS problem_concepts_insert AFTER INSERT ON problems
+BEGIN
+    INSERT OR IGNORE INTO problem_concepts (concept, problem_id)
+    SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.mathematical_concepts) THEN NEW.mathematical_concepts ELSE '[]' END) WHERE type = 'text';
+END;
+
+CREATE TRIGGER IF NOT EXISTS problem_concepts_update AFTER UPDATE OF mathematical_concepts ON problems
+BEGIN
+    DELETE FROM problem_concepts WHERE problem_id = OLD.id;
+    INSERT OR IGNORE INTO problem_concepts (concept, problem_id)
+    SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.mathematical_concepts) THEN NEW.mathematical_concepts ELSE '[]' END) WHERE type = 'text';
+END;
+
+CREATE TRIGGER IF NOT EXISTS problem_concepts_delete AFTER DELETE ON problems
+BEGIN
+    DELETE FROM problem_concepts WHERE problem_id = OLD.id;
+END;
+
 -- Insert sample problems
 INSERT INTO problems (title, description, difficulty, topic, solution_steps, final_answer, verified, mathematical_concepts)
 VALUES 
@@ -190,12 +296,10 @@ SELECT
     u.email,
     u.created_at,
     u.last_login,
-    COUNT(sr.id) as solutions_requested,
-    COUNT(DISTINCT td.id) as training_data_contributed
+    COALESCE(s.solutions_requested, 0) as solutions_requested,
+    COALESCE(s.training_data_contributed, 0) as training_data_contributed
 FROM users u
-LEFT JOIN solution_requests sr ON u.id = sr.user_id
-LEFT JOIN training_data td ON u.id = td.user_id
-GROUP BY u.id;
+LEFT JOIN user_stats s ON s.user_id = u.id;
 
 -- Insert admin user (password: admin123)
 INSERT INTO users (username, email, password, created_at, is_active)
@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { authAPI } from '../services/auth';
 import { auth } from '../services/api';
+import { webSocketService } from '../services/websocket';
 
 const AuthContext = createContext();
 
@@ -52,6 +53,8 @@ export const AuthProvider = ({ children }) => {
         
         // Set default auth header
         auth.setAuthToken(token);
+        // Sockets authenticate on connect, so open a new one with this token
+        webSocketService.reconnect();
         
         setUser(userData);
         return { success: true };
@@ -84,6 +87,8 @@ export const AuthProvider = ({ children }) => {
         
         // Set default auth header
         auth.setAuthToken(token);
+        // Sockets authenticate on connect, so open a new one with this token
+        webSocketService.reconnect();
         
         setUser(userData);
         return { success: true };
@@ -101,9 +106,11 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    authAPI.logout();
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     auth.setAuthToken(null);
+    webSocketService.disconnect();
     setUser(null);
     setError('');
   };
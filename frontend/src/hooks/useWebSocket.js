@@ -57,11 +57,14 @@ export const useWebSocket = () => {
         'training_failed'
       ];
 
+      // Training events are only sent to clients in the training room
+      webSocketService.subscribe('training');
       events.forEach(event => {
         webSocketService.on(event, callback);
       });
 
       return () => {
+        webSocketService.unsubscribe('training');
         events.forEach(event => {
           webSocketService.off(event, callback);
         });
@@ -12,10 +12,17 @@ export const authAPI = {
   },
 
   logout: async () => {
+    const token = localStorage.getItem('token');
     // Clear local storage
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     delete api.defaults.headers.common['Authorization'];
+    if (token) {
+      // Revoke the token server-side; logging out locally doesn't wait on it
+      await api.post('/auth/logout', null, {
+        headers: { Authorization: `Bearer ${token}` }
+      }).catch(() => {});
+    }
   },
 
   getProfile: async () => {
@@ -4,6 +4,7 @@ class WebSocketService {
   constructor() {
     this.socket = null;
     this.listeners = new Map();
+    this.rooms = new Set();
     this.isConnected = false;
   }
 
@@ -21,12 +22,17 @@ class WebSocketService {
 
     this.socket.on('connect', () => {
       this.isConnected = true;
+      // Rooms don't survive a reconnect; join them again
+      if (this.rooms.size > 0) {
+        this.socket.emit('subscribe', { rooms: [...this.rooms] });
+      }
       this.emit('connected');
       console.log('WebSocket connected');
     });
 
     this.socket.on('disconnect', () => {
       this.isConnected = false;
+      this.emit('disconnect');
       console.log('WebSocket disconnected');
     });
 
@@ -51,8 +57,8 @@ class WebSocketService {
       this.emit('training_failed', data);
     });
 
-    this.socket.on('training_data_added', (data) => {
-      this.emit('training_data_added', data);
+    this.socket.on('training_data_digest', (data) => {
+      this.emit('training_data_digest', data);
     });
 
     this.socket.on('chat_response', (data) => {
@@ -62,6 +68,10 @@ class WebSocketService {
     this.socket.on('chat_error', (data) => {
       this.emit('chat_error', data);
     });
+
+    this.socket.on('chat_dropped', (data) => {
+      this.emit('chat_dropped', data);
+    });
   }
 
   disconnect() {
@@ -69,9 +79,16 @@ class WebSocketService {
       this.socket.disconnect();
       this.socket = null;
       this.isConnected = false;
+      this.emit('disconnect');
     }
   }
 
+  // The token is sent once, when the socket connects; call this after it changes (login)
+  reconnect() {
+    this.disconnect();
+    this.connect();
+  }
+
   on(event, callback) {
     if (!this.listeners.has(event)) {
       this.listeners.set(event, new Set());
@@ -93,6 +110,20 @@ class WebSocketService {
     }
   }
 
+  subscribe(room) {
+    this.rooms.add(room);
+    if (this.socket && this.isConnected) {
+      this.socket.emit('subscribe', { rooms: [room] });
+    }
+  }
+
+  unsubscribe(room) {
+    this.rooms.delete(room);
+    if (this.socket && this.isConnected) {
+      this.socket.emit('unsubscribe', { rooms: [room] });
+    }
+  }
+
   sendChatMessage(message) {
     if (this.socket && this.isConnected) {
       this.socket.emit('chat_message', message);
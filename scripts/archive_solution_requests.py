@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Archive solution_requests older than the retention window.
+
+Expired rows are written to gzip JSONL files partitioned by day
+(archive/solution_requests/date=YYYY-MM-DD/), their per-day, per-user
+totals are added to solution_request_daily, and they are deleted from the
+hot table in bounded batches.
+
+    python scripts/archive_solution_requests.py --days 90
+    python scripts/archive_solution_requests.py --dry-run
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=int(os.getenv('SOLUTION_RETENTION_DAYS', 90)),
+                        help='keep this many days of requests in the hot table')
+    parser.add_argument('--archive-dir', default=os.getenv('SOLUTION_ARCHIVE_DIR', str(ROOT_DIR / 'archive')))
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('SOLUTION_ARCHIVE_BATCH_SIZE', 2000)))
+    parser.add_argument('--database-url', help='overrides DATABASE_URL')
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows that would be archived')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from utils.database_manager import DatabaseManager
+    from utils.retention import SolutionArchiver
+
+    archiver = SolutionArchiver(DatabaseManager(), args.archive_dir, retention_days=args.days,
+                                batch_size=args.batch_size)
+    print(json.dumps(archiver.run(dry_run=args.dry_run), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,346 @@
 #!/usr/bin/env python3
-import sqlite3
-import shutil
+"""
+Online database backup with compression, incremental snapshots and rotation.
+
+SQLite is copied with the backup API a few pages at a time, so request
+threads keep writing while it runs. In WAL mode the copy reads from one
+pinned snapshot, so concurrent commits neither block it nor force it to
+restart. The snapshot is then streamed into a gzip file. With
+--incremental, only pages that changed since the previous snapshot are
+stored, and a new full backup is taken every --full-every runs.
+
+PostgreSQL is dumped with pg_dump (a consistent, non-blocking snapshot),
+and its output is gzip-compressed as it streams. Incremental mode does not
+apply there; use WAL archiving for point-in-time recovery.
+
+    python scripts/backup_database.py                 # full backup of DATABASE_URL
+    python scripts/backup_database.py --incremental   # changed pages only, when possible
+    python scripts/backup_database.py --cleanup       # apply retention only
+    python scripts/backup_database.py --restore backups/math_tutor-20240101_020000-incr.delta.gz -o restored.db
+"""
+import argparse
 import datetime
+import gzip
+import hashlib
+import json
+import logging
 import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import time
 from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+DEFAULT_SQLITE_PATH = ROOT_DIR / 'database' / 'math_tutor.db'
+
+DIGEST_SIZE = 8
+PAGE_RECORD = struct.Struct('>I')
+CHUNK_SIZE = 1 << 20
+
+logger = logging.getLogger('backup_database')
+
+
+def database_url():
+    """DATABASE_URL from the environment or backend/.env, as the app resolves it"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(BACKEND_DIR / '.env')
+    except ImportError:
+        pass
+    return os.getenv('DATABASE_URL')
+
+
+def sqlite_path(url):
+    if not url:
+        return DEFAULT_SQLITE_PATH
+    path = Path(url.replace('sqlite:///', ''))
+    # Relative SQLite URLs are relative to backend/, where the app runs
+    return path if path.is_absolute() else (BACKEND_DIR / path).resolve()
+
+
+def page_digest(page):
+    return hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+
+
+class BackupSet:
+    """Backup files in one directory: full snapshots and the incrementals chained on them
+
+    Every SQLite backup `<name>` has a `<name>.json` manifest and a
+    `<name>.pages` file of per-page digests used to compute the next delta.
+    """
+
+    def __init__(self, directory, prefix):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def manifests(self):
+        """Manifests of this database's backups, oldest first"""
+        found = []
+        for path in self.directory.glob(f'{self.prefix}-*.json'):
+            with open(path) as f:
+                found.append(json.load(f))
+        return sorted(found, key=lambda m: m['created_at'])
+
+    def latest_chain(self):
+        """The most recent full backup followed by its incrementals"""
+        chain = []
+        for manifest in self.manifests():
+            if manifest['kind'] == 'full':
+                chain = [manifest]
+            elif chain and manifest['parent'] == chain[-1]['name']:
+                chain.append(manifest)
+        return chain
+
+    def chain_for(self, name):
+        by_name = {m['name']: m for m in self.manifests()}
+        if name not in by_name:
+            raise FileNotFoundError(f"No manifest for backup '{name}' in {self.directory}")
+        chain = [by_name[name]]
+        while chain[0]['kind'] != 'full':
+            parent = by_name.get(chain[0]['parent'])
+            if parent is None:
+                raise FileNotFoundError(f"Backup chain is broken: '{chain[0]['parent']}' is missing")
+            chain.insert(0, parent)
+        return chain
+
+    def path(self, name, suffix=''):
+        return self.directory / (name + suffix)
+
+    def rotate(self, keep):
+        """Keep the newest `keep` full backups and everything chained on them"""
+        manifests = self.manifests()
+        fulls = [m['name'] for m in manifests if m['kind'] == 'full']
+        expired = set(fulls[:-keep] if keep > 0 else fulls)
+        removed = 0
+        for manifest in manifests:
+            if manifest['base'] in expired:
+                for suffix in ('', '.json', '.pages'):
+                    path = self.path(manifest['name'], suffix)
+                    if path.exists():
+                        path.unlink()
+                removed += 1
+        # Postgres dumps have no manifest; rotate them by name, which sorts by time
+        dumps = sorted(self.directory.glob(f'{self.prefix}-*-full.sql.gz'))
+        for path in dumps[:-keep] if keep > 0 else dumps:
+            path.unlink()
+            removed += 1
+        if removed:
+            logger.info(f"Rotation removed {removed} backup(s), keeping the newest {keep} full backup(s)")
+        return removed
+
+
+def snapshot_sqlite(source, target, pages_per_step, step_sleep):
+    """Consistent copy of a live SQLite database via the backup API, in page steps"""
+    src = sqlite3.connect(f'file:{source}?mode=ro', uri=True, isolation_level=None)
+    dst = sqlite3.connect(target)
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    try:
+        wal = src.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+        if wal:
+            # Pin one read snapshot for the whole copy: WAL writers carry on, and
+            # their commits no longer make every step restart from page one
+            src.execute('BEGIN')
+            src.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        # Outside WAL mode the shared lock is only held during each step,
+        # so writers get in between steps (at the cost of possible restarts)
+        src.backup(dst, pages=pages_per_step, progress=progress, sleep=step_sleep)
+        if wal:
+            src.execute('COMMIT')
+        page_size = dst.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    return page_size, steps
+
+
+def write_atomic(path, write):
+    """Write through a temporary name so a crash never leaves a truncated backup"""
+    partial = path.with_name(path.name + '.partial')
+    try:
+        write(partial)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+
+def backup_sqlite(source, backups, incremental, full_every, pages_per_step, step_sleep, level):
+    source = Path(source)
+    if not source.exists():
+        raise FileNotFoundError(f"SQLite database not found: {source}")
+
+    chain = backups.latest_chain() if incremental else []
+    parent = chain[-1] if chain and len(chain) <= full_every else None
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    kind = 'incr' if parent else 'full'
+    name = f'{backups.prefix}-{stamp}-{kind}' + ('.delta.gz' if parent else '.db.gz')
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=backups.directory) as tmp:
+        snapshot = Path(tmp) / 'snapshot.db'
+        page_size, steps = snapshot_sqlite(source, snapshot, pages_per_step, step_sleep)
+        previous = b''
+        if parent:
+            previous = backups.path(parent['name'], '.pages').read_bytes()
+
+        digests = bytearray()
+        changed = 0
+
+        def write(path):
+            nonlocal changed
+            with open(snapshot, 'rb') as db, gzip.open(path, 'wb', compresslevel=level) as out:
+                page_number = 0
+                while True:
+                    page = db.read(page_size)
+                    if not page:
+                        break
+                    digest = page_digest(page)
+                    digests.extend(digest)
+                    offset = page_number * DIGEST_SIZE
+                    if not parent:
+                        out.write(page)
+                    elif previous[offset:offset + DIGEST_SIZE] != digest:
+                        out.write(PAGE_RECORD.pack(page_number))
+                        out.write(page)
+                        changed += 1
+                    page_number += 1
+
+        write_atomic(backups.path(name), write)
+        page_count = len(digests) // DIGEST_SIZE
+
+    backups.path(name, '.pages').write_bytes(bytes(digests))
+    manifest = {
+        'name': name,
+        'kind': 'incremental' if parent else 'full',
+        'source': str(source),
+        'created_at': datetime.datetime.now().isoformat(),
+        'page_size': page_size,
+        'page_count': page_count,
+        'changed_pages': changed if parent else page_count,
+        'parent': parent['name'] if parent else None,
+        'base': chain[0]['name'] if parent else name,
+        'backup_steps': steps,
+        'bytes': backups.path(name).stat().st_size,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(backups.path(name, '.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"{manifest['kind'].capitalize()} backup {name}: {manifest['changed_pages']}/{page_count} pages, "
+                f"{manifest['bytes'] / 1024:.0f} KB in {manifest['seconds']:.2f}s")
+    return manifest
+
+
+def backup_postgres(url, backups, level):
+    """Stream pg_dump output through gzip without buffering the dump"""
+    result = urlparse(url)
+    env = dict(os.environ)
+    if result.password:
+        env['PGPASSWORD'] = result.password
+    command = ['pg_dump', '--no-owner', '--dbname', result.path[1:],
+               '--host', result.hostname or 'localhost', '--port', str(result.port or 5432)]
+    if result.username:
+        command += ['--username', result.username]
+
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = backups.path(f'{backups.prefix}-{stamp}-full.sql.gz')
+    start = time.perf_counter()
+
+    def write(partial):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, env=env)
+        with gzip.open(partial, 'wb', compresslevel=level) as out:
+            shutil.copyfileobj(process.stdout, out, CHUNK_SIZE)
+        if process.wait() != 0:
+            raise RuntimeError(f"pg_dump exited with status {process.returncode}")
+
+    write_atomic(path, write)
+    logger.info(f"PostgreSQL backup {path.name}: {path.stat().st_size / 1024:.0f} KB "
+                f"in {time.perf_counter() - start:.2f}s")
+    return {'name': path.name, 'kind': 'full', 'bytes': path.stat().st_size}
+
+
+def restore_sqlite(backups, name, output):
+    """Rebuild a database file from a full backup and the incrementals leading to `name`"""
+    chain = backups.chain_for(name)
+    output = Path(output)
+    with gzip.open(backups.path(chain[0]['name']), 'rb') as src, open(output, 'wb') as out:
+        shutil.copyfileobj(src, out, CHUNK_SIZE)
+    for manifest in chain[1:]:
+        page_size = manifest['page_size']
+        with gzip.open(backups.path(manifest['name']), 'rb') as delta, open(output, 'r+b') as out:
+            while True:
+                header = delta.read(PAGE_RECORD.size)
+                if not header:
+                    break
+                (page_number,) = PAGE_RECORD.unpack(header)
+                out.seek(page_number * page_size)
+                out.write(delta.read(page_size))
+            out.truncate(manifest['page_count'] * page_size)
+    result = sqlite3.connect(output).execute('PRAGMA integrity_check').fetchone()[0]
+    if result != 'ok':
+        raise RuntimeError(f"Restored database failed the integrity check: {result}")
+    logger.info(f"Restored {output} from {len(chain)} backup file(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='overrides DATABASE_URL')
+    parser.add_argument('--backup-dir', default=os.getenv('BACKUP_DIR', str(ROOT_DIR / 'backups')))
+    parser.add_argument('--incremental', action='store_true',
+                        help='store only pages changed since the last SQLite backup')
+    parser.add_argument('--full-every', type=int, default=int(os.getenv('BACKUP_FULL_EVERY', 6)),
+                        help='incremental backups between full ones')
+    parser.add_argument('--keep', type=int, default=int(os.getenv('BACKUP_KEEP', 7)),
+                        help='full backups (with their incrementals) to keep')
+    parser.add_argument('--cleanup', action='store_true', help='only apply the retention policy')
+    parser.add_argument('--pages-per-step', type=int, default=int(os.getenv('BACKUP_PAGES_PER_STEP', 1024)))
+    parser.add_argument('--step-sleep-ms', type=float, default=float(os.getenv('BACKUP_STEP_SLEEP_MS', 5)),
+                        help='pause between backup steps so writers get the lock')
+    parser.add_argument('--level', type=int, default=6, help='gzip compression level')
+    parser.add_argument('--restore', metavar='BACKUP', help='restore a SQLite backup file')
+    parser.add_argument('-o', '--output', help='database file to restore into')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    url = args.database_url or database_url()
+    is_postgres = bool(url and url.startswith('postgresql://'))
+    prefix = urlparse(url).path[1:] if is_postgres else sqlite_path(url).stem
+
+    if args.restore:
+        restore = Path(args.restore)
+        if not args.output:
+            parser.error('--restore needs --output')
+        backups = BackupSet(restore.parent if restore.parent != Path('.') else args.backup_dir,
+                            restore.name.rsplit('-', 2)[0])
+        restore_sqlite(backups, restore.name, args.output)
+        return
+
+    backups = BackupSet(args.backup_dir, prefix)
+    try:
+        if not args.cleanup:
+            if is_postgres:
+                if args.incremental:
+                    logger.info("Incremental mode applies to SQLite only; taking a full pg_dump")
+                backup_postgres(url, backups, args.level)
+            else:
+                backup_sqlite(sqlite_path(url), backups, args.incremental, args.full_every,
+                              args.pages_per_step, args.step_sleep_ms / 1000, args.level)
+        backups.rotate(args.keep)
+    except Exception as e:
+        logger.error(f"Backup failed: {e}")
+        sys.exit(1)
+
 
-def backup_database():
-    db_path = Path("backend/data/math_mentor.db")
-    backups_dir = Path("backups")
-    backups_dir.mkdir(exist_ok=True)
-    
-    if db_path.exists():
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = backups_dir / f"math_mentor_backup_{timestamp}.db"
-        shutil.copy2(db_path, backup_path)
-        print(f"Database backed up to {backup_path}")
-    else:
-        print("Database file not found.")
-
-if __name__ == "__main__":
-    backup_database()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
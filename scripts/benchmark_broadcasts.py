@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Count the Socket.IO messages training events send to connected clients.
+
+Connects --clients Socket.IO test clients, of which --subscribers join the
+training room. It then posts --inserts training examples through
+/api/train and publishes --progress training_progress updates, and counts
+the messages each client receives, under two setups:
+
+    legacy     every insert and progress update sent at once to every client
+               (BROADCAST_DIGEST_SECONDS=0, TRAINING_EVENTS_ROOM='',
+               TRAINING_PROGRESS_MAX_HZ=0: the old behaviour)
+    coalesced  inserts sent as digests, progress rate-limited, training room only
+
+    python scripts/benchmark_broadcasts.py --clients 200 --subscribers 20 --inserts 500
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+
+PROFILES = {
+    'legacy': {'BROADCAST_DIGEST_SECONDS': '0', 'TRAINING_EVENTS_ROOM': '', 'TRAINING_PROGRESS_MAX_HZ': '0'},
+    'coalesced': {},
+}
+
+
+def run_profile(args):
+    """Runs in a child process, since the app reads its settings at import"""
+    sys.path.append(str(BACKEND_DIR))
+    import jwt
+    import app as backend
+
+    token = jwt.encode({'user_id': 1, 'exp': time.time() + 3600}, backend.app.config['JWT_SECRET_KEY'],
+                       algorithm='HS256')
+    clients = [backend.socketio.test_client(backend.app, auth={'token': token}) for _ in range(args.clients)]
+    for client in clients[:args.subscribers]:
+        client.emit('subscribe', {'rooms': ['training']})
+    for client in clients:
+        client.get_received()
+
+    http = backend.app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    started = time.perf_counter()
+
+    def progress():
+        for step in range(args.progress):
+            backend.broadcaster.throttle('training_progress', {'progress': step * 100 // args.progress},
+                                         room=backend.TRAINING_EVENTS_ROOM)
+            time.sleep(args.seconds / args.progress)
+
+    progress_thread = threading.Thread(target=progress)
+    progress_thread.start()
+    for i in range(args.inserts):
+        http.post('/api/train', headers=headers, json={
+            'problem_text': f'Solve for x: {i}x + 3 = {i + 7}',
+            'solution_text': f'x = {4 / (i or 1):.3f}',
+            'mathematical_concepts': ['algebra']})
+        time.sleep(args.seconds / args.inserts)
+    progress_thread.join()
+    backend.broadcaster.flush()
+    time.sleep(0.2)
+
+    received = {}
+    for client in clients:
+        for message in client.get_received():
+            received[message['name']] = received.get(message['name'], 0) + 1
+    return {
+        'messages': sum(received.values()),
+        'by_event': received,
+        'broadcaster': backend.broadcaster.stats(),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--subscribers', type=int, default=20, help='clients that join the training room')
+    parser.add_argument('--inserts', type=int, default=500)
+    parser.add_argument('--progress', type=int, default=200, help='training_progress updates to publish')
+    parser.add_argument('--seconds', type=float, default=5, help='spread the traffic over this long')
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            path = os.path.join(tmp, f'{profile}.db')
+            conn = sqlite3.connect(path)
+            conn.executescript((ROOT_DIR / 'database' / 'schema.sql').read_text())
+            conn.close()
+            env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', SHARED_STATE_BACKEND='memory',
+                       **PROFILES[profile])
+            output = subprocess.run([sys.executable, __file__, '--worker', profile] + sys.argv[1:], env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(dict(json.loads(output.strip().splitlines()[-1]), profile=profile))
+            print(json.dumps(results[-1]), flush=True)
+
+    print(f"\n{'profile':<10} {'messages':>9} {'per insert':>11}  by event")
+    for r in results:
+        print(f"{r['profile']:<10} {r['messages']:>9} {r['messages'] / max(args.inserts, 1):>11.2f}  "
+              f"{json.dumps(r['by_event'])}")
+
+
+if __name__ == '__main__':
+    main()
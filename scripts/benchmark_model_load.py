@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark model loading: legacy h5/pickle artifacts vs. the mmap bundle.
+
+Each trial runs in a fresh interpreter so import caches and already-built
+TensorFlow graphs don't flatter the second format measured.
+
+    python scripts/benchmark_model_load.py --model-dir backend/models --trials 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def load_legacy(model_dir):
+    import pickle
+    from tensorflow.keras.models import load_model
+    from utils.output_heads import CUSTOM_OBJECTS
+
+    model = load_model(os.path.join(model_dir, 'math_model.h5'), custom_objects=CUSTOM_OBJECTS)
+    with open(os.path.join(model_dir, 'tokenizer.pkl'), 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open(os.path.join(model_dir, 'label_encoder.pkl'), 'rb') as f:
+        label_encoder = pickle.load(f)
+    return model, tokenizer, label_encoder
+
+
+def load_bundle(model_dir):
+    from utils.model_bundle import BUNDLE_FILENAME, ModelBundle
+    from utils.output_heads import CUSTOM_OBJECTS
+
+    bundle = ModelBundle(os.path.join(model_dir, BUNDLE_FILENAME))
+    return bundle.build_model(custom_objects=CUSTOM_OBJECTS), bundle.tokenizer(), bundle.label_encoder()
+
+
+def run_single(fmt, model_dir):
+    """Measure one load in this process and print the result as JSON"""
+    import tensorflow  # noqa: F401  (exclude the TF import itself from the timing)
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    _, tokenizer, label_encoder = (load_legacy if fmt == 'legacy' else load_bundle)(model_dir)
+    artifacts_ready = time.perf_counter() - start
+    tokenizer.texts_to_sequences(['solve for x: 2x + 5 = 15'])
+    label_encoder.inverse_transform([0])
+    print(json.dumps({
+        'format': fmt,
+        'load_seconds': artifacts_ready,
+        'rss_delta_mb': _rss_mb() - rss_before,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=str(BACKEND_DIR / 'models'))
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--convert', action='store_true',
+                        help='build the bundle from the legacy files before benchmarking')
+    parser.add_argument('--single', choices=['legacy', 'bundle'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single, args.model_dir)
+        return
+
+    if args.convert:
+        from utils.model_bundle import convert_legacy_artifacts
+        convert_legacy_artifacts(args.model_dir)
+
+    sizes = {
+        'legacy': sum(os.path.getsize(os.path.join(args.model_dir, name))
+                      for name in ('math_model.h5', 'tokenizer.pkl', 'label_encoder.pkl')),
+        'bundle': os.path.getsize(os.path.join(args.model_dir, 'math_model.bundle')),
+    }
+
+    results = {}
+    for fmt in ('legacy', 'bundle'):
+        runs = []
+        for _ in range(args.trials):
+            output = subprocess.run(
+                [sys.executable, __file__, '--single', fmt, '--model-dir', args.model_dir],
+                check=True, capture_output=True, text=True,
+                env=dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+            ).stdout.strip().splitlines()[-1]
+            runs.append(json.loads(output))
+        results[fmt] = {
+            'median_load_seconds': statistics.median(r['load_seconds'] for r in runs),
+            'median_rss_delta_mb': statistics.median(r['rss_delta_mb'] for r in runs),
+            'size_kb': sizes[fmt] / 1024,
+        }
+
+    print(f"{'format':<8} {'load (s)':>10} {'RSS delta (MB)':>16} {'size (KB)':>12}")
+    for fmt, r in results.items():
+        print(f"{fmt:<8} {r['median_load_seconds']:>10.3f} {r['median_rss_delta_mb']:>16.1f} {r['size_kb']:>12.1f}")
+    speedup = results['legacy']['median_load_seconds'] / results['bundle']['median_load_seconds']
+    print(f"bundle load speedup: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
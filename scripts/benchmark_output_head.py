@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the softmax and sampled-softmax output heads as the class count grows.
+
+Uses the production architecture from MathAITrainer on synthetic token data,
+so no database or trained model is needed. For each class count it reports
+training throughput and single-request latency, comparing the previous
+full-probability path (model.predict + argmax) with the top-k scorer.
+
+    python scripts/benchmark_output_head.py --classes 1000,10000,100000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.append(str(BACKEND_DIR))
+# train_ai logs to ../logs relative to the backend directory
+os.chdir(BACKEND_DIR)
+os.makedirs('../logs', exist_ok=True)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def synthetic_data(num_samples, seq_len, vocab_size, num_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(1, vocab_size, size=(num_samples, seq_len), dtype=np.int32)
+    y = rng.integers(0, num_classes, size=num_samples, dtype=np.int32)
+    return X, y
+
+
+def training_throughput(model, X, y, batch_size, steps):
+    """Samples per second over `steps` batches, after one warm-up batch"""
+    model.train_on_batch(X[:batch_size], y[:batch_size])
+    start = time.perf_counter()
+    for step in range(steps):
+        batch = slice((step * batch_size) % len(X), (step * batch_size) % len(X) + batch_size)
+        model.train_on_batch(X[batch], y[batch])
+    return steps * batch_size / (time.perf_counter() - start)
+
+
+def request_latencies(fn, X, requests, warmup=5):
+    latencies = []
+    for i in range(requests + warmup):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        fn(row)
+        latencies.append(time.perf_counter() - start)
+    return latencies[warmup:]
+
+
+def benchmark(num_classes, head, args):
+    import tensorflow as tf
+    from train_ai import MathAITrainer
+    from utils.output_heads import make_top_k_scorer
+
+    trainer = MathAITrainer(hyperparameters={
+        'output_head': head,
+        'max_sequence_length': args.seq_len,
+        'batch_size': args.batch_size,
+    })
+    model = trainer.build_model(num_classes)
+    X, y = synthetic_data(args.batch_size * 8, args.seq_len, trainer.vocab_size, num_classes)
+
+    throughput = training_throughput(model, X, y, args.batch_size, args.steps)
+
+    def full_path(row):
+        scores = model.predict(row, verbose=0)
+        return int(np.argmax(scores[0]))
+
+    scorer = make_top_k_scorer(model, args.top_k, from_logits=head == 'sampled')
+
+    def top_k_path(row):
+        indices, probabilities = scorer(tf.constant(row))
+        return indices.numpy()[0], probabilities.numpy()[0]
+
+    full = request_latencies(full_path, X, args.requests)
+    top_k = request_latencies(top_k_path, X, args.requests)
+    tf.keras.backend.clear_session()
+    return {
+        'classes': num_classes,
+        'head': head,
+        'train_samples_per_s': throughput,
+        'full_p50_ms': _percentile(full, 50) * 1000,
+        'full_p99_ms': _percentile(full, 99) * 1000,
+        'topk_p50_ms': _percentile(top_k, 50) * 1000,
+        'topk_p99_ms': _percentile(top_k, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--classes', default='1000,10000,100000',
+                        help='comma-separated class counts')
+    parser.add_argument('--heads', default='softmax,sampled')
+    parser.add_argument('--seq-len', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=20, help='timed training batches')
+    parser.add_argument('--requests', type=int, default=100, help='timed single-row predictions')
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for num_classes in (int(c) for c in args.classes.split(',')):
+        for head in args.heads.split(','):
+            results.append(benchmark(num_classes, head, args))
+            r = results[-1]
+            print(f"done: {r['classes']} classes / {r['head']}", file=sys.stderr)
+
+    print(f"{'classes':>8} {'head':<8} {'train (samples/s)':>18} "
+          f"{'predict p50/p99 (ms)':>22} {'top-k p50/p99 (ms)':>20}")
+    for r in results:
+        print(f"{r['classes']:>8} {r['head']:<8} {r['train_samples_per_s']:>18.1f} "
+              f"{r['full_p50_ms']:>10.2f} / {r['full_p99_ms']:<9.2f} "
+              f"{r['topk_p50_ms']:>8.2f} / {r['topk_p99_ms']:<9.2f}")
+
+
+if __name__ == '__main__':
+    main()
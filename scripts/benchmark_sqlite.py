@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SQLite fallback under concurrent mixed traffic.
+
+Threads issue a mix of solve-style inserts (one row per transaction, firing
+the update_last_login trigger), batched request-log inserts and keyset page
+reads of training_data, against three setups:
+
+    legacy   new connection per operation, SQLite defaults (the old behaviour)
+    pooled   pooled connections, SQLite defaults
+    tuned    pooled connections with WAL, synchronous=NORMAL, cache, mmap,
+             busy timeout and the statement cache
+
+    python scripts/benchmark_sqlite.py --threads 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+PROFILES = ('legacy', 'pooled', 'tuned')
+MIX = (('solve', 0.3), ('log', 0.1), ('read', 0.6))
+
+
+def create_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript((ROOT_DIR / 'database' / 'schema.sql').read_text())
+    conn.executemany(
+        "INSERT INTO training_data (problem_text, solution_text, mathematical_concepts, difficulty_level, "
+        "validation_status) VALUES (?, ?, ?, ?, ?)",
+        ((f"Solve for x: {i}x + 3 = {i + 7}", f"x = {4 / (i or 1):.3f}", '["algebra"]',
+          random.choice(['Beginner', 'Intermediate', 'Advanced']),
+          random.choice(['pending', 'approved'])) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def make_manager(path, profile, pool_size):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_TUNED'] = 'true' if profile == 'tuned' else 'false'
+    os.environ['SQLITE_STATEMENT_CACHE'] = '256' if profile == 'tuned' else '0'
+    os.environ['DB_POOL_MAX_SIZE'] = str(pool_size)
+    os.environ['DB_POOL_TIMEOUT'] = '30'
+    from utils.database_manager import DatabaseManager
+    return DatabaseManager()
+
+
+def solve(conn, rng):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO solution_requests (user_id, problem_text, solution_data, processing_time) "
+        "VALUES (%s, %s, %s, %s)",
+        (1, f"Solve {rng.randint(1, 99)}x = {rng.randint(1, 999)}", json.dumps({'answer': 'x'}), 0.01))
+    conn.commit()
+
+
+def log(conn, rng, batch=20):
+    values = ', '.join(['(%s, %s, %s, %s)'] * batch)
+    params = []
+    for _ in range(batch):
+        params += [None, f"log {rng.random()}", '{}', 0.002]
+    cursor = conn.cursor()
+    cursor.execute(
+        f"INSERT INTO solution_requests (user_id, problem_text, solution_data, processing_time) VALUES {values}",
+        params)
+    conn.commit()
+
+
+def read(conn, rng):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, problem_text, solution_text, difficulty_level, created_at FROM training_data "
+        "WHERE id < %s ORDER BY id DESC LIMIT 20", (rng.randint(100, 100000),))
+    cursor.fetchall()
+    conn.commit()
+
+
+OPERATIONS = {'solve': solve, 'log': log, 'read': read}
+
+
+def run_profile(path, profile, threads, seconds):
+    manager = make_manager(path, profile, threads)
+    latencies = {name: [] for name, _ in MIX}
+    errors = []
+    stop = time.monotonic() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        names = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        while time.monotonic() < stop:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                if profile == 'legacy':
+                    conn = manager._connect()
+                    try:
+                        OPERATIONS[name](conn, rng)
+                    finally:
+                        conn.close()
+                else:
+                    with manager.connection() as conn:
+                        OPERATIONS[name](conn, rng)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+                continue
+            latencies[name].append((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    manager.close()
+
+    report = {'profile': profile, 'errors': len(errors)}
+    total = 0
+    for name, values in latencies.items():
+        total += len(values)
+        values.sort()
+        report[name] = {
+            'ops': len(values),
+            'p50_ms': round(statistics.median(values), 2) if values else None,
+            'p99_ms': round(values[int(len(values) * 0.99) - 1], 2) if values else None,
+        }
+    report['ops_per_second'] = round(total / seconds)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100000, help='training_data rows to seed')
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            # A fresh file per profile: WAL mode persists in the database header
+            path = os.path.join(tmp, f'{profile}.db')
+            create_database(path, args.rows)
+            results.append(run_profile(path, profile, args.threads, args.seconds))
+            print(json.dumps(results[-1]), flush=True)
+
+    print(f"\n{'profile':<8} {'ops/s':>8} {'errors':>7} " +
+          ' '.join(f"{name + ' p50/p99 ms':>22}" for name, _ in MIX))
+    for r in results:
+        print(f"{r['profile']:<8} {r['ops_per_second']:>8} {r['errors']:>7} " +
+              ' '.join(f"{str(r[name]['p50_ms']) + ' / ' + str(r[name]['p99_ms']):>22}" for name, _ in MIX))
+
+
+if __name__ == '__main__':
+    main()
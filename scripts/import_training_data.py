@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Bulk-import training data from JSON, JSONL or CSV files.
+
+Records may use the training_data field names (problem_text, solution_text,
+...) or the problems.json ones (description, final_answer, solution_steps,
+difficulty). Duplicates of existing or earlier rows are skipped, and
+everything is inserted in one transaction.
+
+    python scripts/import_training_data.py backend/data/training_data/sample_training.json
+    python scripts/import_training_data.py contributions.jsonl --status approved --database-url sqlite:///database/math_tutor.db
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='files to import')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'csv'],
+                        help='input format (default: from the file extension)')
+    parser.add_argument('--database-url', help='overrides DATABASE_URL')
+    parser.add_argument('--status', default='pending', choices=['pending', 'approved', 'rejected'],
+                        help='validation_status for records that do not set one')
+    parser.add_argument('--difficulty', default='Intermediate', choices=['Beginner', 'Intermediate', 'Advanced'],
+                        help='difficulty_level for records that do not set one')
+    parser.add_argument('--contributed-by', default='Bulk Import')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--strict', action='store_true',
+                        help="also reject records that fail ModelValidator's quality checks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from utils.bulk_import import BulkImporter, detect_format
+    from utils.database_manager import DatabaseManager
+
+    importer = BulkImporter(DatabaseManager(), batch_size=args.batch_size, strict=args.strict)
+    failed = False
+    for path in args.files:
+        with open(path, encoding='utf-8', newline='') as f:
+            summary = importer.run(f, args.format or detect_format(path),
+                                   contributed_by=args.contributed_by,
+                                   validation_status=args.status,
+                                   difficulty_level=args.difficulty)
+        print(json.dumps(dict(summary, file=path), indent=2))
+        failed = failed or summary['inserted'] == 0 and summary['invalid'] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Move JSON-in-TEXT columns to native JSON storage and index concepts.
+
+PostgreSQL: mathematical_concepts, solution_steps and solution_data become
+JSONB (each table is rewritten once) and concept columns get GIN indexes.
+SQLite: concept side tables and their sync triggers are created and
+backfilled. Safe to run repeatedly.
+
+    python scripts/migrate_json_columns.py
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='overrides DATABASE_URL')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from utils.database_manager import DatabaseManager
+    from utils.json_columns import migrate
+
+    print(json.dumps(migrate(DatabaseManager()), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Backfill or check the user_stats activity counters.
+
+--rebuild recounts every user from solution_requests (plus archived daily
+totals) and training_data, and points the user_activity view at
+user_stats. --verify compares the stored counters with a fresh recount
+and exits non-zero on any difference.
+
+    python scripts/rebuild_user_stats.py --rebuild
+    python scripts/rebuild_user_stats.py --verify
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.append(str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='recount all users and replace user_activity')
+    parser.add_argument('--verify', action='store_true', help='compare user_stats with a fresh recount')
+    parser.add_argument('--database-url', help='overrides DATABASE_URL')
+    args = parser.parse_args()
+    if not (args.rebuild or args.verify):
+        parser.error('pass --rebuild and/or --verify')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from utils.database_manager import DatabaseManager
+    from utils.user_stats import UserStats
+
+    stats = UserStats(DatabaseManager())
+    if args.rebuild:
+        stats.rebuild()
+    if args.verify:
+        report = stats.verify()
+        print(json.dumps(report, indent=2, default=str))
+        sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()